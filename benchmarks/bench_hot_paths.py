@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the local CPU hot paths, with stored baselines
+
+Covers process_image (crop/resize/enhance) and its batched form, tensor_to_pil, encode_image, the
+vision node's PNG+base64 path, the Workflow Helper's JSON extraction and the
+legacy LLM node's history parsing, across realistic sizes (512x512 to 8K,
+batches of 1-64).
+
+Each case is timed until it has run for --min-time seconds (at least
+--min-rounds rounds). The best round is compared with the baseline file, so
+scheduling noise only ever makes a run look slower, never faster. A case
+slower than its baseline by more than --tolerance fails the run (exit 1).
+
+Usage:
+    python benchmarks/bench_hot_paths.py                     # compare with the baseline
+    python benchmarks/bench_hot_paths.py --quick -k vision   # small sizes, matching cases
+    python benchmarks/bench_hot_paths.py --save-baseline     # record this machine's numbers
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+
+# (label, width, height)
+IMAGE_SIZES = [
+    ("512", 512, 512),
+    ("1024", 1024, 1024),
+    ("2048", 2048, 2048),
+    ("4K", 3840, 2160),
+    ("8K", 7680, 4320),
+]
+QUICK_SIZES = {"512", "1024"}
+BATCH_SIZES = [1, 4, 16, 64]
+# Model output sizes for the workflow extraction (approximate characters)
+OUTPUT_SIZES = [("10KB", 10_000), ("100KB", 100_000), ("1MB", 1_000_000)]
+HISTORY_TURNS = [10, 100, 1000, 10000]
+
+CASES = []
+
+def case(name, params, quick=None):
+    """Register a benchmark; setup(param) returns the zero-argument callable that is timed"""
+    def decorator(setup):
+        for param in params:
+            label = param[0] if isinstance(param, tuple) else str(param)
+            CASES.append({
+                "id": f"{name}[{label}]",
+                "setup": setup,
+                "param": param,
+                "quick": quick(param) if quick else True,
+            })
+        return setup
+    return decorator
+
+def quick_size(param):
+    return param[0] in QUICK_SIZES
+
+# Inputs
+
+def photo_tensor(width, height, batch=1):
+    """Deterministic smooth image with mild noise; pure noise would make PNG timings unrealistically slow"""
+    import torch
+
+    generator = torch.Generator().manual_seed(0)
+    y = torch.linspace(0, 1, height).view(1, height, 1, 1)
+    x = torch.linspace(0, 1, width).view(1, 1, width, 1)
+    channels = torch.tensor([0.9, 0.6, 0.3]).view(1, 1, 1, 3)
+    image = (0.5 + 0.35 * torch.sin(6.0 * x + 4.0 * y + channels * 3.0)).expand(batch, height, width, 3).clone()
+    image += 0.03 * torch.rand((batch, height, width, 3), generator=generator)
+    return image.clamp_(0, 1)
+
+def workflow_response(size, fenced=True):
+    """A model answer with prose around a ComfyUI workflow of roughly size characters"""
+    def sampler(node_id):
+        return {
+            "class_type": "KSampler",
+            "inputs": {"model": [str(max(node_id - 1, 1)), 0], "seed": node_id, "steps": 30, "cfg": 7.0,
+                       "sampler_name": "dpmpp_2m", "scheduler": "karras", "denoise": 1.0},
+        }
+    count = max(1, size // len(json.dumps(sampler(1), indent=2)))
+    nodes = {str(node_id): sampler(node_id) for node_id in range(1, count + 1)}
+    workflow = json.dumps(nodes, indent=2)
+    prose = "Here is the workflow you asked for. It chains the samplers in order.\n\n"
+    if fenced:
+        return f"{prose}```json\n{workflow}\n```\n\nLoad it with the Load button. {{Tip: adjust steps}}"
+    return f"{prose}{workflow}\n\nLoad it with the Load button."
+
+def conversation_history(turns):
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"Describe scene {turn} in more detail, with lighting and mood."})
+        messages.append({"role": "assistant", "content": f"Scene {turn}: a misty harbor at dawn, soft rim light, " * 3})
+    return json.dumps(messages)
+
+# Cases
+
+@case("process_image.crop", IMAGE_SIZES, quick=quick_size)
+def bench_crop(param):
+    from nodes.utils.base_node import process_image
+
+    _, width, height = param
+    image = photo_tensor(width, height)
+    region = (width // 4, height // 4, width * 3 // 4, height * 3 // 4)
+    return lambda: process_image(image, crop_region=region)
+
+@case("process_image.resize", IMAGE_SIZES, quick=quick_size)
+def bench_resize(param):
+    from nodes.utils.base_node import process_image
+
+    _, width, height = param
+    image = photo_tensor(width, height)
+    return lambda: process_image(image, resize_dims=(1024, 1024))
+
+@case("process_image.enhance", IMAGE_SIZES, quick=quick_size)
+def bench_enhance(param):
+    from nodes.utils.base_node import process_image
+
+    _, width, height = param
+    image = photo_tensor(width, height)
+    return lambda: process_image(image, enhance=True)
+
+@case("process_image_batch.resize_enhance", [(f"1024x{batch}", 1024, 1024, batch) for batch in BATCH_SIZES[:3]]
+      + [(f"4Kx{batch}", 3840, 2160, batch) for batch in BATCH_SIZES[:2]],
+      quick=lambda param: param[1] == 1024 and param[3] <= 4)
+def bench_batch_resize_enhance(param):
+    from nodes.utils.base_node import process_image_batch
+
+    _, width, height, batch = param
+    images = photo_tensor(width, height, batch)
+    return lambda: process_image_batch(images, resize_dims=(768, 768), enhance=True)
+
+@case("tensor_to_pil", IMAGE_SIZES, quick=quick_size)
+def bench_tensor_to_pil(param):
+    from nodes.utils.base_node import GroqNode
+
+    _, width, height = param
+    image = photo_tensor(width, height)
+    node = GroqNode()
+    return lambda: node.tensor_to_pil(image)
+
+@case("tensor_to_pil_batch", [(f"512x{batch}", 512, 512, batch) for batch in BATCH_SIZES]
+      + [(f"1024x{batch}", 1024, 1024, batch) for batch in BATCH_SIZES[:3]],
+      quick=lambda param: param[3] <= 4)
+def bench_tensor_to_pil_batch(param):
+    from nodes.utils.base_node import GroqNode
+
+    _, width, height, batch = param
+    images = photo_tensor(width, height, batch)
+    node = GroqNode()
+    return lambda: node.tensor_to_pil_batch(images)
+
+@case("encode_image.jpeg", IMAGE_SIZES, quick=quick_size)
+def bench_encode_jpeg(param):
+    from nodes.utils.base_node import GroqNode
+
+    _, width, height = param
+    node = GroqNode()
+    image = node.tensor_to_pil(photo_tensor(width, height))
+    return lambda: node.encode_image(image)
+
+@case("vision.png_base64", IMAGE_SIZES, quick=quick_size)
+def bench_vision_png(param):
+    from nodes.vision_node import GroqArtPromptGenerator
+
+    _, width, height = param
+    image = photo_tensor(width, height)
+    node = GroqArtPromptGenerator()
+
+    def run():
+        # The vision node's image path up to the request body
+        pil_image = node.tensor_to_pil(image)
+        if pil_image.mode != 'RGB':
+            pil_image = pil_image.convert('RGB')
+        return f"data:image/png;base64,{node.encode_image(pil_image, 'PNG')}"
+    return run
+
+@case("workflow.extract_fenced", OUTPUT_SIZES)
+def bench_extract_fenced(param):
+    from nodes.code_assistant_node import GroqWorkflowHelper
+
+    content = workflow_response(param[1])
+    return lambda: GroqWorkflowHelper.extract_workflow_json(content)
+
+@case("workflow.extract_braces", OUTPUT_SIZES)
+def bench_extract_braces(param):
+    from nodes.code_assistant_node import GroqWorkflowHelper
+
+    content = workflow_response(param[1], fenced=False)
+    return lambda: GroqWorkflowHelper.extract_workflow_json(content)
+
+@case("legacy.parse_history", HISTORY_TURNS, quick=lambda turns: turns <= 100)
+def bench_parse_history(turns):
+    from nodes.legacy_node import GroqLLMNode
+
+    history = conversation_history(turns)
+    return lambda: GroqLLMNode.parse_history(history)
+
+# Runner
+
+def measure(func, min_time, min_rounds, max_rounds):
+    func()  # warm-up: lazy imports, allocator, caches
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or (time.perf_counter() - started < min_time and len(timings) < max_rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "rounds": len(timings),
+    }
+
+def machine_info():
+    import torch
+    import PIL
+
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "pillow": PIL.__version__,
+    }
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.3f} s "
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local hot paths against stored baselines")
+    parser.add_argument("-k", "--filter", default="", help="Only run cases whose id matches this regular expression")
+    parser.add_argument("--quick", action="store_true", help="Only the small sizes (512/1024, batch <= 4)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a case fails (0.25 = 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend timing each case")
+    parser.add_argument("--min-rounds", type=int, default=3)
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--json", default="", help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    machine = machine_info()
+    if baseline and not args.save_baseline and baseline.get("machine", {}).get("platform") != machine["platform"]:
+        print(f"Note: baseline was recorded on {baseline['machine'].get('platform')}, comparisons are only indicative")
+    baseline_results = baseline.get("results", {})
+
+    selected = [c for c in CASES if (c["quick"] or not args.quick) and re.search(args.filter, c["id"])]
+    results = {}
+    regressions = []
+    print(f"{'case':<46} {'best':>11} {'median':>11} {'rounds':>7}  vs baseline")
+    for bench in selected:
+        func = bench["setup"](bench["param"])
+        result = measure(func, args.min_time, args.min_rounds, args.max_rounds)
+        del func
+        gc.collect()
+        results[bench["id"]] = result
+
+        previous = baseline_results.get(bench["id"])
+        if previous is None:
+            verdict = "new"
+        else:
+            change = result["min"] / previous["min"] - 1.0
+            verdict = f"{change:+7.1%}"
+            if change > args.tolerance:
+                verdict += "  REGRESSION"
+                regressions.append((bench["id"], change))
+        print(f"{bench['id']:<46} {format_time(result['min'])} {format_time(result['median'])} {result['rounds']:>7}  {verdict}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine, "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        # Merge so a filtered run only replaces the cases it measured
+        merged = dict(baseline_results, **{case_id: {name: round(value, 9) if isinstance(value, float) else value
+                                                     for name, value in result.items()}
+                                           for case_id, result in results.items()})
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine, "recorded_at": time.strftime("%Y-%m-%d"), "results": dict(sorted(merged.items()))},
+                      f, indent=2)
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}:")
+        for case_id, change in regressions:
+            print(f"  {case_id}: {change:+.1%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
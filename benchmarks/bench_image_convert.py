@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for tensor-to-image conversion
+
+Compares the previous per-image float conversion against the batched uint8
+path in nodes/utils/image_convert.py. Each case runs in a fresh process so the
+peak RSS numbers are not polluted by earlier allocations.
+
+Usage:
+    python benchmarks/bench_image_convert.py [--batch 4] [--width 3840] [--height 2160]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "nodes", "utils"))
+
+
+def legacy_convert(batch):
+    """The conversion the nodes used before image_convert existed"""
+    import numpy as np
+    from PIL import Image
+
+    images = []
+    for image in batch:
+        image_np = 255.0 * image.cpu().numpy()
+        images.append(Image.fromarray(np.clip(image_np, 0, 255).astype(np.uint8)))
+    return images
+
+
+def batched_convert(batch):
+    from image_convert import tensor_to_pil_list
+    return tensor_to_pil_list(batch)
+
+
+CASES = {
+    "legacy": legacy_convert,
+    "batched": batched_convert,
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_case(name, batch_size, height, width, repeats, queue):
+    import torch
+
+    torch.manual_seed(0)
+    batch = torch.rand((batch_size, height, width, 3), dtype=torch.float32)
+    baseline = peak_rss_mb()
+
+    convert = CASES[name]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        images = convert(batch)
+        timings.append(time.perf_counter() - start)
+        del images
+
+    queue.put((name, min(timings), peak_rss_mb() - baseline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tensor-to-PIL conversion")
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    results = {}
+    for name in CASES:
+        process = context.Process(target=run_case, args=(name, args.batch, args.height, args.width, args.repeats, queue))
+        process.start()
+        process.join()
+        case, seconds, peak = queue.get()
+        results[case] = (seconds, peak)
+
+    print(f"Batch {args.batch} x {args.width}x{args.height} RGB ({args.repeats} repeats, best time)")
+    for name, (seconds, peak) in results.items():
+        print(f"  {name:<8} {seconds * 1000:9.1f} ms   peak +{peak:8.1f} MB")
+
+    legacy_time, legacy_peak = results["legacy"]
+    batched_time, batched_peak = results["batched"]
+    print(f"  saved    {(legacy_time - batched_time) * 1000:9.1f} ms   peak -{legacy_peak - batched_peak:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,10 @@ NODE_FILES = [
     'document_analyzer_node',  # GROQ Style Transfer Prompter
     'code_assistant_node',     # GROQ Workflow Helper
     'audio_processor_node',    # GROQ Music-to-Art Prompter
+    'pipeline_node',      # GROQ Prompt Pipeline
+    'batch_node',         # GROQ Batch Prompt Processor
+    'caption_node',       # GROQ Dataset Captioner
+    'translate_node',     # GROQ Prompt Translator
     'legacy_node',        # Legacy GroqLLMNode for backward compatibility
 ]
 
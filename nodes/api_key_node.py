@@ -1,7 +1,11 @@
 import os
+import re
 import json
 from typing import Dict, List, Optional, Any
-from groq import Groq
+
+from .utils.groq_client import POOL_KEY
+from .utils.key_pool import get_key_pool, mask_key
+from .utils.key_validation import get_validation_cache
 
 class GroqAPIKeyManager:
     """GROQ API Key Manager - Set and validate your GROQ API key within ComfyUI"""
@@ -17,100 +21,94 @@ class GroqAPIKeyManager:
             "required": {
                 "api_key": ("STRING", {
                     "default": "", 
-                    "multiline": False, 
-                    "tooltip": "Enter your GROQ API key here. Get one from https://console.groq.com/keys"
+                    "multiline": True, 
+                    "tooltip": "Enter your GROQ API key here. Get one from https://console.groq.com/keys\n\nAdd several keys (one per line or comma-separated) to build a key pool: requests are routed to the key with the most quota left."
                 }),
                 "action": (["set_and_validate", "validate_only", "clear_key"], {
                     "default": "set_and_validate",
-                    "tooltip": "What to do with the API key"
+                    "tooltip": "What to do with the API key.\n\nset_and_validate adds the keys to the in-process key pool.\nclear_key removes the given keys from the pool (or all keys if empty)."
                 }),
                 "test_connection": ("BOOLEAN", {
                     "default": True,
-                    "tooltip": "Test the API key with a simple request"
+                    "tooltip": "Test the API key against the /models endpoint. Results are cached per key for 5 minutes and refreshed in the background, so repeated runs return instantly."
                 }),
             },
             "optional": {
                 "test_model": (["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "llama3-8b-8192"], {
                     "default": "llama-3.1-8b-instant",
-                    "tooltip": "Model to use for testing (faster models = quicker validation)"
+                    "tooltip": "Model the key is checked for availability (no tokens are spent on validation)"
                 }),
             }
         }
     
+    @staticmethod
+    def parse_keys(api_key):
+        """Split the api_key input into individual keys (newline or comma separated)"""
+        return [key.strip() for key in re.split(r"[,\s]+", api_key or "") if key.strip()]
+    
     def manage_api_key(self, api_key, action, test_connection, test_model="llama-3.1-8b-instant", **kwargs):
-        """Manage GROQ API key - set, validate, or clear"""
+        """Manage GROQ API keys - add to the key pool, validate, or clear"""
         
-        # Get current environment key
-        current_env_key = os.getenv('GROQ_API_KEY', '')
+        pool = get_key_pool()
+        provided_keys = self.parse_keys(api_key)
         
         if action == "clear_key":
-            # Clear the environment variable
-            if 'GROQ_API_KEY' in os.environ:
-                del os.environ['GROQ_API_KEY']
-            return ("✅ API key cleared from environment", False, "")
+            # Keys live in the in-process pool; the environment is never modified
+            if provided_keys:
+                removed = pool.remove_keys(provided_keys)
+                return (f"✅ Removed {removed} key(s) from the key pool ({len(pool)} remaining)", False, "")
+            pool.clear()
+            return ("✅ Key pool cleared", False, "")
         
-        # Use provided key or fall back to environment
-        working_key = api_key.strip() if api_key.strip() else current_env_key
+        # Use provided keys or fall back to environment
+        env_key = os.getenv('GROQ_API_KEY', '').strip()
+        working_keys = provided_keys or ([env_key] if env_key else [])
         
-        if not working_key:
+        if not working_keys:
             return ("❌ No API key provided. Please enter your GROQ API key.", False, "")
         
         # Basic format validation
-        if not working_key.startswith('gsk_'):
-            return ("⚠️ Warning: GROQ API keys typically start with 'gsk_'. Key may be invalid.", False, f"{working_key[:8]}...{working_key[-4:]}")
+        malformed = [key for key in working_keys if not key.startswith('gsk_')]
+        if malformed:
+            return (f"⚠️ Warning: GROQ API keys typically start with 'gsk_'. {len(malformed)} key(s) may be invalid.", False, ", ".join(mask_key(key) for key in malformed))
         
-        # Set in environment if requested
-        if action == "set_and_validate" and api_key.strip():
-            os.environ['GROQ_API_KEY'] = working_key
-            status_msg = "✅ API key set in environment"
+        # Add to the key pool if requested
+        if action == "set_and_validate" and provided_keys:
+            added = pool.add_keys(provided_keys)
+            status_msg = f"✅ {added} key(s) added to key pool ({len(pool)} total)"
         else:
-            status_msg = "🔍 Using existing environment key" if not api_key.strip() else "🔍 Key provided"
+            status_msg = "🔍 Using existing environment key" if not provided_keys else f"🔍 {len(provided_keys)} key(s) provided"
         
         # Create masked version for display
-        masked_key = f"{working_key[:8]}...{working_key[-4:]}" if len(working_key) > 12 else "KEY_TOO_SHORT"
+        masked_key = ", ".join(mask_key(key) for key in working_keys)
         
         # Test connection if requested
         if test_connection:
-            is_valid, test_msg = self._test_api_key(working_key, test_model)
-            status_msg += f" | {test_msg}"
+            results = [self._test_api_key(key, test_model) for key in working_keys]
+            is_valid = all(valid is not False for valid, _ in results)
+            if len(results) == 1:
+                status_msg += f" | {results[0][1]}"
+            else:
+                status_msg += " | " + "; ".join(f"{mask_key(key)}: {msg}" for key, (_, msg) in zip(working_keys, results))
+            
+            # Keys the API rejected should not stay in rotation
+            rejected = [key for key, (valid, _) in zip(working_keys, results) if valid is False]
+            if action == "set_and_validate" and rejected:
+                removed = pool.remove_keys(rejected)
+                status_msg += f" | removed {removed} rejected key(s) from pool"
             return (status_msg, is_valid, masked_key)
         else:
             # Skip testing, assume valid if format is correct
-            is_valid = working_key.startswith('gsk_') and len(working_key) > 20
+            is_valid = all(key.startswith('gsk_') and len(key) > 20 for key in working_keys)
             return (status_msg + " | (not tested)", is_valid, masked_key)
     
     def _test_api_key(self, api_key, model):
-        """Test the API key with a simple request"""
-        try:
-            client = Groq(api_key=api_key)
-            
-            # Make a minimal test request
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": "Say 'OK' if you can read this."}
-                ],
-                max_tokens=5,
-                temperature=0.1
-            )
-            
-            if response.choices and response.choices[0].message.content:
-                return True, "✅ API key test successful"
-            else:
-                return False, "❌ API key test failed: No response"
-                
-        except Exception as e:
-            error_msg = str(e).lower()
-            if "401" in error_msg or "invalid_api_key" in error_msg:
-                return False, "❌ Invalid API key"
-            elif "429" in error_msg or "rate_limit" in error_msg:
-                return True, "⚠️ Valid key but rate limited"
-            elif "quota" in error_msg or "billing" in error_msg:
-                return True, "⚠️ Valid key but quota exceeded"
-            elif "timeout" in error_msg or "connection" in error_msg:
-                return None, "⚠️ Connection timeout - key likely valid"
-            else:
-                return False, f"❌ Test failed: {str(e)[:50]}"
+        """Test the API key against the cached, background-refreshed /models check"""
+        result = get_validation_cache().check(api_key)
+        message = result.describe()
+        if result.is_valid and result.models and model not in result.models:
+            message += f" | ⚠️ {model} not available for this key"
+        return result.is_valid, message
 
 class GroqAPIKeyProvider:
     """GROQ API Key Provider - Provides API key to other nodes in the workflow"""
@@ -124,9 +122,9 @@ class GroqAPIKeyProvider:
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "source": (["environment_variable", "manual_input"], {
+                "source": (["environment_variable", "manual_input", "key_pool"], {
                     "default": "environment_variable",
-                    "tooltip": "Where to get the API key from"
+                    "tooltip": "Where to get the API key from.\n\nkey_pool routes each request to the pooled key with the most headroom (set up with GROQ API Key Manager)."
                 }),
             },
             "optional": {
@@ -146,6 +144,9 @@ class GroqAPIKeyProvider:
                 return (manual_key.strip(),)
             else:
                 return ("",)  # Empty if no manual key provided
+        elif source == "key_pool":
+            # Resolved per request by the shared request path
+            return (POOL_KEY,)
         else:
             # Get from environment variable
             env_key = os.getenv('GROQ_API_KEY', '')
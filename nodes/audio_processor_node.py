@@ -1,8 +1,13 @@
-import os
 from typing import Dict, List, Optional, Tuple, Any
-from groq import Groq
 
 from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.moderation import MODERATION_INPUTS, SafetyScreenError, screened
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.structured_output import string_schema, schema_instructions, structured_completion
+from .utils.tracing import traced
 
 class GroqMusicToArtPrompter(GroqNode):
     """GROQ Music-to-Art Prompter - Analyze music/audio and generate visual art prompts that match the mood"""
@@ -47,18 +52,34 @@ class GroqMusicToArtPrompter(GroqNode):
                     "step": 0.1,
                     "tooltip": "Lower values make output more deterministic, higher more creative"
                 }),
+            },
+            "optional": {
+                "model": ([AUTO_MODEL] + get_model_choices(ModelType.TEXT), {
+                    "default": "llama-3.3-70b-versatile",
+                    "tooltip": "Model to use. auto picks the fastest model of model_tier expected to meet latency_slo, from observed per-model latency."
+                }),
+                "generation_mode": (["combined_json", "separate_calls"], {
+                    "default": "combined_json",
+                    "tooltip": "combined_json returns the art prompt and mood analysis from one structured JSON completion (half the requests), falling back to separate calls if the JSON fails validation"
+                }),
+                **MODERATION_INPUTS,
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
             }
         }
     
-    def generate_music_art_prompt(self, api_key, music_description, music_genre, mood_intensity, art_style, temperature):
-        # Use provided API key or fall back to environment variable
-        api_key = api_key.strip() or os.getenv('GROQ_API_KEY', '')
-        if not api_key:
-            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
-        
-        # Initialize GROQ client
-        client = Groq(api_key=api_key)
-        
+    ART_SYSTEM_MESSAGE = "You are an expert at synesthesia - translating music into visual art. You understand how musical elements correspond to visual elements and can create compelling art prompts."
+    MOOD_SYSTEM_MESSAGE = "You are a music analyst specializing in emotional and artistic interpretation of music."
+    
+    # Schema for combined_json mode: both outputs from a single completion
+    COMBINED_SCHEMA = string_schema({
+        "art_prompt": "The comprehensive Stable Diffusion art prompt",
+        "mood_analysis": "The concise mood analysis for artists",
+    })
+    
+    def build_art_prompt(self, music_description, music_genre, mood_intensity, art_style):
+        """Build the user prompt for the art prompt request"""
         # Create intensity modifiers
         intensity_modifiers = {
             "subtle": "lightly influenced by, hints of musical elements",
@@ -67,8 +88,7 @@ class GroqMusicToArtPrompter(GroqNode):
             "intense": "completely embodying, intense musical translation"
         }
         
-        # Prepare the main prompt
-        main_prompt = f"""You are an expert at translating music into visual art concepts. Create a detailed Stable Diffusion art prompt based on this music:
+        return f"""You are an expert at translating music into visual art concepts. Create a detailed Stable Diffusion art prompt based on this music:
 
 MUSIC DESCRIPTION: {music_description}
 GENRE: {music_genre}
@@ -83,13 +103,81 @@ Analyze the music and create a visual art prompt that captures:
 5. Artistic techniques that embody the musical style
 
 Create a comprehensive Stable Diffusion prompt that would generate art visually representing this music. Include specific artistic terms, colors, lighting, and composition details."""
+    
+    def build_mood_prompt(self, music_description, music_genre):
+        """Build the user prompt for the mood analysis request"""
+        return f"""Analyze the mood and emotional characteristics of this music for artistic reference:
+
+MUSIC: {music_description}
+GENRE: {music_genre}
+
+Provide a detailed mood analysis including:
+1. Primary emotions conveyed
+2. Energy level and tempo feel
+3. Color associations
+4. Movement and flow characteristics
+5. Overall artistic atmosphere
+
+Keep this concise but insightful for artists."""
+    
+    @traced()
+    def generate_music_art_prompt(self, api_key, music_description, music_genre, mood_intensity, art_style, temperature, generation_mode="combined_json", model="llama-3.3-70b-versatile", safety_screen="off", **kwargs):
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+        
+        # Prepare the main prompt
+        main_prompt = self.build_art_prompt(music_description, music_genre, mood_intensity, art_style)
+        mood_prompt = self.build_mood_prompt(music_description, music_genre)
+        fallback_mood = f"Genre: {music_genre}, Style: {art_style}, Intensity: {mood_intensity}"
+        deadline = Deadline.from_inputs(**kwargs)
+        model = get_model_router().resolve(model, 1024, **kwargs)
         
         try:
+            return screened(api_key, music_description, deadline,
+                            lambda: self._request_music_art(api_key, model, main_prompt, mood_prompt, fallback_mood, temperature, generation_mode, deadline),
+                            safety_screen)
+        except SafetyScreenError as e:
+            print(f"GroqMusicToArtPrompter: {str(e)}")
+            return (f"Error: {str(e)}", "")
+    
+    def _request_music_art(self, api_key, model, main_prompt, mood_prompt, fallback_mood, temperature, generation_mode, deadline):
+        """Run the art prompt and mood analysis request(s), returning (art_prompt, mood_analysis)"""
+        try:
+            # One completion for both outputs; falls through to the two-call path if the JSON is unusable
+            if generation_mode == "combined_json":
+                combined = structured_completion(
+                    api_key,
+                    "music_to_art",
+                    self.COMBINED_SCHEMA,
+                    deadline=deadline,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": self.ART_SYSTEM_MESSAGE},
+                        {"role": "user", "content": f"""{main_prompt}
+
+Also write a mood analysis of the same music:
+{mood_prompt}
+
+{schema_instructions(self.COMBINED_SCHEMA)}"""}
+                    ],
+                    temperature=temperature,
+                    max_tokens=1024 + 512,
+                    top_p=1.0,
+                    frequency_penalty=0.0,
+                    presence_penalty=0.0
+                )
+                if combined is not None:
+                    return (combined["art_prompt"].strip(), combined["mood_analysis"].strip())
+            
             # Make the API call for art prompt
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            response = chat_completion(
+                api_key,
+                deadline=deadline,
+                model=model,
                 messages=[
-                    {"role": "system", "content": "You are an expert at synesthesia - translating music into visual art. You understand how musical elements correspond to visual elements and can create compelling art prompts."},
+                    {"role": "system", "content": self.ART_SYSTEM_MESSAGE},
                     {"role": "user", "content": main_prompt}
                 ],
                 temperature=temperature,
@@ -107,24 +195,12 @@ Create a comprehensive Stable Diffusion prompt that would generate art visually
                 art_prompt = response.choices[0].message.content
             
             # Generate mood analysis
-            mood_prompt = f"""Analyze the mood and emotional characteristics of this music for artistic reference:
-
-MUSIC: {music_description}
-GENRE: {music_genre}
-
-Provide a detailed mood analysis including:
-1. Primary emotions conveyed
-2. Energy level and tempo feel
-3. Color associations
-4. Movement and flow characteristics
-5. Overall artistic atmosphere
-
-Keep this concise but insightful for artists."""
-            
-            mood_response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            mood_response = chat_completion(
+                api_key,
+                deadline=deadline,
+                model=model,
                 messages=[
-                    {"role": "system", "content": "You are a music analyst specializing in emotional and artistic interpretation of music."},
+                    {"role": "system", "content": self.MOOD_SYSTEM_MESSAGE},
                     {"role": "user", "content": mood_prompt}
                 ],
                 temperature=0.3,
@@ -137,9 +213,10 @@ Keep this concise but insightful for artists."""
             if hasattr(mood_response, 'choices') and len(mood_response.choices) > 0:
                 mood_analysis = mood_response.choices[0].message.content
             
-            return (art_prompt or "No art prompt generated", mood_analysis or f"Genre: {music_genre}, Style: {art_style}, Intensity: {mood_intensity}")
+            return (art_prompt or "No art prompt generated", mood_analysis or fallback_mood)
             
         except Exception as e:
+            raise_if_interrupted(e)
             return (f"Error: {str(e)}", "")
 
 # Node class mappings
@@ -0,0 +1,467 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from groq import APIStatusError
+
+from .pipeline_node import STAGE_TYPES, GroqPromptPipeline
+from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, POLL_INTERVAL, TIMEOUT_INPUTS, check_interrupted, raise_if_interrupted
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.moderation import MODERATION_INPUTS, SAFETY_SCREEN_MODES, ContentFlagged, screened
+from .utils.scheduler import PRIORITY_LANES, SCHEDULER_INPUTS, get_scheduler
+from .utils.tracing import current_span, propagate, traced
+
+# Prompt builders a batch can run; each row is one stage of this type
+BATCH_BUILDERS = ["enhance", "style_transfer", "negative_prompt", "music_to_art", "mood_analysis"]
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+CHECKPOINT_VERSION = 1
+# Checkpoint after this many completed rows or seconds, whichever comes first
+CHECKPOINT_ROWS = 25
+CHECKPOINT_SECONDS = 5.0
+# Rows that may finish ahead of the oldest unfinished row; keeps the resume set bounded
+MAX_ROWS_AHEAD = 1000
+
+def iter_rows(path: str, text_column: str = "prompt") -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Stream (row_index, row) pairs from a CSV/TSV, JSONL or plain text file
+
+    JSONL lines may be objects or bare strings; every non-empty line of a
+    text file is one prompt. Only one row is held in memory at a time.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".tsv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f, delimiter="\t" if extension == ".tsv" else ",")
+            for index, row in enumerate(reader):
+                yield index, row
+        return
+
+    with open(path, "r", encoding="utf-8-sig") as f:
+        index = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if extension in (".jsonl", ".ndjson"):
+                value = json.loads(line)
+                yield index, value if isinstance(value, dict) else {text_column: value}
+            else:
+                yield index, {text_column: line}
+            index += 1
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path + CHECKPOINT_SUFFIX
+
+def load_checkpoint(output_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(checkpoint_path(output_path), "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        return checkpoint if checkpoint.get("version") == CHECKPOINT_VERSION else None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable checkpoint {checkpoint_path(output_path)}: {str(e)}")
+        return None
+
+def save_checkpoint(output_path: str, checkpoint: Dict[str, Any]):
+    """Write the checkpoint atomically so a crash leaves the previous one intact"""
+    path = checkpoint_path(output_path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, path)
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed row may succeed on another run (rate limit, timeout, network or server error)"""
+    if isinstance(error, ContentFlagged):
+        return False
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return True
+
+class BatchProgress:
+    """Completed rows tracked as a watermark plus the few rows finished ahead of it
+
+    Rows whose last attempt failed with a retryable error stay in retry:
+    they count towards the watermark, so they never hold it back, but are
+    not done and run again on resume.
+    """
+
+    def __init__(self, next_row: int = 0, done_ahead=(), completed: int = 0, failed: int = 0, tokens: int = 0,
+                 retry=()):
+        self.next_row = next_row
+        self.done_ahead = set(done_ahead)
+        self.completed = completed
+        self.failed = failed
+        self.tokens = tokens
+        self.retry = set(retry)
+
+    def is_done(self, index: int) -> bool:
+        return (index < self.next_row or index in self.done_ahead) and index not in self.retry
+
+    def mark(self, record: Dict[str, Any]):
+        index = record["row"]
+        if index in self.retry:
+            # A rerun replaces the failed attempt, which was already counted
+            self.retry.remove(index)
+            self.failed -= 1
+        else:
+            self.done_ahead.add(index)
+            while self.next_row in self.done_ahead:
+                self.done_ahead.remove(self.next_row)
+                self.next_row += 1
+            self.completed += 1
+        self.failed += 1 if "error" in record else 0
+        self.tokens += record.get("tokens", 0)
+        if record.get("retryable"):
+            self.retry.add(index)
+
+def scan_output(output_path: str, offset: int, progress: BatchProgress) -> int:
+    """Account for output rows written after the checkpoint and drop a torn last line
+
+    A crash between writing a row and checkpointing leaves the row in the
+    output only; reading from the checkpoint's byte offset picks it up so it
+    is not paid for twice. A rerun row appears once per attempt; its last
+    record is the current one. Returns the size of the valid output.
+    """
+    if not os.path.exists(output_path):
+        return 0
+    with open(output_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        offset = min(offset, f.tell())
+        f.seek(offset)
+        valid = offset
+        for line in f:
+            try:
+                record = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                record = None
+            if not isinstance(record, dict) or "row" not in record:
+                break
+            if not progress.is_done(record["row"]):
+                progress.mark(record)
+            valid += len(line)
+        f.truncate(valid)
+    return valid
+
+class GroqBatchPromptProcessor(GroqNode):
+    """GROQ Batch Prompt Processor - Stream a prompt file through a prompt builder with checkpoint/resume"""
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("output_file", "summary")
+    OUTPUT_TOOLTIPS = ("Path of the JSONL file with one result per input row",
+                       "Rows processed, failures, tokens and throughput")
+    FUNCTION = "process_file"
+    CATEGORY = "GroqPrompt/Art Generation"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        text_models = get_model_choices(ModelType.TEXT)
+
+        return {
+            "required": {
+                "api_key": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable."
+                }),
+                "model": ([AUTO_MODEL] + text_models, {
+                    "default": "llama-3.3-70b-versatile",
+                    "tooltip": "Model for every row"
+                }),
+                "input_file": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Prompt file: .csv/.tsv (with a header row), .jsonl (objects or strings) or .txt (one prompt per line)"
+                }),
+                "output_file": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Results JSONL. Leave empty to write <input_file>.groq.jsonl next to the input."
+                }),
+                "prompt_builder": (BATCH_BUILDERS, {
+                    "default": "enhance",
+                    "tooltip": "Which node's prompt builder runs on each row"
+                }),
+                "text_column": ("STRING", {
+                    "default": "prompt",
+                    "multiline": False,
+                    "tooltip": "Column (CSV) or key (JSONL) holding the input text. Columns named like builder parameters override them per row."
+                }),
+                "concurrency": ("INT", {
+                    "default": 4,
+                    "min": 1,
+                    "max": 32,
+                    "tooltip": "Rows in flight at once"
+                }),
+                "temperature": ("FLOAT", {
+                    "default": 0.7,
+                    "min": 0.0,
+                    "max": 2.0,
+                    "step": 0.1,
+                    "tooltip": "Sampling temperature"
+                }),
+                "max_tokens": ("INT", {
+                    "default": 512,
+                    "min": 1,
+                    "max": 8192,
+                    "tooltip": "Maximum tokens per row"
+                }),
+                "resume": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Continue from the checkpoint next to the output file. Off starts over and overwrites the output."
+                }),
+            },
+            "optional": {
+                "builder_params": ("STRING", {
+                    "multiline": True,
+                    "default": "{}",
+                    "tooltip": "JSON object of builder parameters for every row, e.g. {\"target_model\": \"SDXL\"}"
+                }),
+                "limit": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 10000000,
+                    "tooltip": "Stop after this many new rows (0 = whole file)"
+                }),
+                **MODERATION_INPUTS,
+                **TIMEOUT_INPUTS,
+                # Batch rows yield to interactive nodes by default
+                "priority": (PRIORITY_LANES, dict(SCHEDULER_INPUTS["priority"][1], default="batch")),
+                **ROUTER_INPUTS,
+            }
+        }
+
+    def __init__(self):
+        self.pipeline = GroqPromptPipeline()
+
+    @traced()
+    def process_row(self, api_key, index, row, builder, params, settings) -> Dict[str, Any]:
+        """Run one row on a worker thread and return its output record"""
+        started = time.monotonic()
+        current_span().set_attribute("row", index)
+        text = str(row.get(settings["text_column"]) or "").strip()
+        record = {"row": index, "input": text}
+        if "id" in row:
+            record["id"] = row["id"]
+        if not text:
+            record["error"] = f"no text in column {settings['text_column']!r}"
+            return record
+
+        # Row columns named like a builder parameter override it for that row
+        row_params = dict(params, **{name: row[name] for name in params if row.get(name)})
+        model = get_model_router().resolve(settings["model"], settings["max_tokens"], **settings["router"])
+        # Each row gets its own budget; the file as a whole has none
+        deadline = Deadline.from_inputs(priority=settings["priority"], **settings["timeouts"])
+        try:
+            response = screened(api_key, text, deadline, lambda: chat_completion(
+                api_key,
+                deadline=deadline,
+                model=model,
+                messages=self.pipeline.build_messages(builder, row_params, text, {}),
+                temperature=settings["temperature"],
+                max_tokens=settings["max_tokens"],
+            ), settings["safety_screen"])
+            output = ""
+            if hasattr(response, 'choices') and len(response.choices) > 0:
+                output = (response.choices[0].message.content or "").strip()
+            usage = getattr(response, "usage", None)
+            record.update(output=output, model=model, tokens=getattr(usage, "total_tokens", 0) or 0)
+        except Exception as e:
+            raise_if_interrupted(e)
+            record.update(error=str(e), model=model)
+            if isinstance(e, ContentFlagged):
+                record["flagged"] = e.categories
+            elif is_retryable(e):
+                # Not marked done; resume runs the row again
+                record["retryable"] = True
+        record["seconds"] = round(time.monotonic() - started, 3)
+        return record
+
+    @traced()
+    def process_file(self, api_key, model, input_file, output_file, prompt_builder, text_column, concurrency,
+                     temperature, max_tokens, resume, builder_params="{}", limit=0, safety_screen="off",
+                     priority="batch", **kwargs):
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+
+        input_file = os.path.expanduser(input_file.strip())
+        if not os.path.isfile(input_file):
+            return ("", f"Error: input file not found: {input_file}")
+        output_file = os.path.expanduser(output_file.strip()) or os.path.splitext(input_file)[0] + ".groq.jsonl"
+        if prompt_builder not in BATCH_BUILDERS:
+            return (output_file, f"Error: unknown prompt builder {prompt_builder!r}")
+        try:
+            overrides = json.loads(builder_params or "{}")
+            if not isinstance(overrides, dict):
+                raise ValueError("builder_params must be a JSON object")
+        except ValueError as e:
+            return (output_file, f"Error: invalid builder_params - {str(e)}")
+        params = dict(STAGE_TYPES[prompt_builder], **overrides)
+
+        identity = {"input": os.path.abspath(input_file), "prompt_builder": prompt_builder, "text_column": text_column}
+        checkpoint = load_checkpoint(output_file) if resume else None
+        if checkpoint and checkpoint.get("identity") != identity:
+            return (output_file, f"Error: {checkpoint_path(output_file)} belongs to a different input or builder. "
+                                 "Use another output file or turn resume off to start over.")
+
+        if checkpoint:
+            progress = BatchProgress(checkpoint["next_row"], checkpoint["done_ahead"], checkpoint["completed"],
+                                     checkpoint["failed"], checkpoint["tokens"], checkpoint.get("retry_rows", []))
+            scan_output(output_file, checkpoint["output_bytes"], progress)
+        elif resume:
+            # No checkpoint yet, but an earlier run may have written rows before its first one
+            progress = BatchProgress()
+            scan_output(output_file, 0, progress)
+        else:
+            progress = BatchProgress()
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+            open(output_file, "w").close()
+            # A stale checkpoint would describe rows that are no longer in the output
+            if os.path.exists(checkpoint_path(output_file)):
+                os.remove(checkpoint_path(output_file))
+        resumed_at = progress.next_row
+
+        settings = {
+            "model": model,
+            "text_column": text_column,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "timeouts": {name: kwargs[name] for name in TIMEOUT_INPUTS if name in kwargs},
+            "router": {name: kwargs[name] for name in ROUTER_INPUTS if name in kwargs},
+            "safety_screen": safety_screen,
+            "priority": priority,
+        }
+        started = time.monotonic()
+        new_rows = new_failed = 0
+        checkpointed = {"rows": 0, "at": started}
+
+        def write_checkpoint(out, finished=False):
+            # The output must be durable before the checkpoint claims its rows
+            out.flush()
+            os.fsync(out.fileno())
+            save_checkpoint(output_file, {
+                "version": CHECKPOINT_VERSION,
+                "identity": identity,
+                "next_row": progress.next_row,
+                "done_ahead": sorted(progress.done_ahead),
+                "retry_rows": sorted(progress.retry),
+                "output_bytes": out.tell(),
+                "completed": progress.completed,
+                "failed": progress.failed,
+                "tokens": progress.tokens,
+                "finished": finished,
+                "updated_at": time.time(),
+            })
+            checkpointed.update(rows=progress.completed, at=time.monotonic())
+
+        running = {}
+
+        def drain(out, block=True):
+            nonlocal new_rows, new_failed
+            done, _ = wait(running, timeout=POLL_INTERVAL if block else 0, return_when=FIRST_COMPLETED)
+            check_interrupted()
+            for future in done:
+                running.pop(future)
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                progress.mark(record)
+                new_rows += 1
+                new_failed += 1 if "error" in record else 0
+            if (progress.completed - checkpointed["rows"] >= CHECKPOINT_ROWS
+                    or (done and time.monotonic() - checkpointed["at"] >= CHECKPOINT_SECONDS)):
+                write_checkpoint(out)
+                lane = get_scheduler().metrics()["lanes"][priority]
+                print(f"GROQ batch: {progress.completed} rows done ({progress.failed} failed), "
+                      f"{new_rows / max(time.monotonic() - started, 1e-6):.1f} rows/s, "
+                      f"{priority} lane: {lane['queue_depth']} queued, p95 wait {lane['wait_p95']:.2f}s")
+
+        submitted = 0
+        finished = False
+        with open(output_file, "a", encoding="utf-8") as out:
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="groq-batch")
+            try:
+                for index, row in iter_rows(input_file, text_column):
+                    if progress.is_done(index):
+                        continue
+                    if limit and submitted >= limit:
+                        break
+                    while running and (len(running) >= concurrency or index - progress.next_row >= MAX_ROWS_AHEAD):
+                        drain(out)
+                    running[executor.submit(propagate(self.process_row), api_key, index, row, prompt_builder, params, settings)] = index
+                    submitted += 1
+                else:
+                    finished = True
+                while running:
+                    drain(out)
+            except BaseException:
+                # Keep what finished; rows still in flight are redone on resume
+                for future in running:
+                    future.cancel()
+                write_checkpoint(out)
+                raise
+            finally:
+                executor.shutdown(wait=False)
+            write_checkpoint(out, finished=finished)
+
+        elapsed = time.monotonic() - started
+        summary = (f"{'Finished' if finished else 'Stopped after limit'}: {new_rows} new rows "
+                   f"({new_failed} failed) in {elapsed:.1f}s, {new_rows / elapsed if elapsed else 0:.1f} rows/s\n"
+                   f"Resumed at row {resumed_at}; {progress.completed} rows done in total "
+                   f"({progress.failed} failed, {len(progress.retry)} to retry on resume), {progress.tokens} tokens\n"
+                   f"Output: {output_file}")
+        print(f"GROQ batch: {summary}")
+        return (output_file, summary)
+
+def main(argv=None):
+    """Headless entry point: python -m nodes.batch_node prompts.csv --builder enhance"""
+    parser = argparse.ArgumentParser(description="Stream a prompt file through a GROQ prompt builder with checkpoint/resume")
+    parser.add_argument("input_file", help="Prompt file (.csv, .tsv, .jsonl or .txt)")
+    parser.add_argument("-o", "--output", default="", help="Results JSONL (default: <input>.groq.jsonl)")
+    parser.add_argument("-b", "--builder", default="enhance", choices=BATCH_BUILDERS, help="Prompt builder run on each row")
+    parser.add_argument("-m", "--model", default="llama-3.3-70b-versatile", help=f"Model name or {AUTO_MODEL}")
+    parser.add_argument("--text-column", default="prompt", help="Column or key holding the input text")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Rows in flight at once")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--params", default="{}", help="JSON object of builder parameters")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many new rows")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint and overwrite the output")
+    parser.add_argument("--safety-screen", default="off", choices=SAFETY_SCREEN_MODES,
+                        help="Screen each row with the guard model while it is processed; flagged rows are written as errors")
+    parser.add_argument("--priority", default="batch", choices=PRIORITY_LANES,
+                        help="Scheduling lane; batch yields to interactive requests made in the same process")
+    parser.add_argument("--api-key", default="", help="GROQ API key (default: GROQ_API_KEY)")
+    args = parser.parse_args(argv)
+
+    output_file, summary = GroqBatchPromptProcessor().process_file(
+        args.api_key, args.model, args.input_file, args.output, args.builder, args.text_column,
+        args.concurrency, args.temperature, args.max_tokens, not args.no_resume,
+        builder_params=args.params, limit=args.limit, safety_screen=args.safety_screen,
+        priority=args.priority)
+    if summary.startswith("Error:"):
+        print(summary, file=sys.stderr)
+        return 1
+    return 0
+
+# Node class mappings
+NODE_CLASS_MAPPINGS = {
+    "GroqBatchPromptProcessor": GroqBatchPromptProcessor,
+}
+
+# Node display names
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "GroqBatchPromptProcessor": "GROQ Batch Prompt Processor",
+}
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator
+
+from PIL import Image, ImageOps
+
+from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, POLL_INTERVAL, TIMEOUT_INPUTS, check_interrupted, raise_if_interrupted
+from .utils.groq_client import resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.scheduler import PRIORITY_LANES, SCHEDULER_INPUTS
+from .utils.tracing import propagate, span, traced
+from .vision_node import GroqArtPromptGenerator
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+CAPTION_EXTENSION = ".txt"
+
+DEFAULT_CAPTION_SYSTEM = ("You caption images for training image generation models. Describe what is visible: subject, "
+                          "appearance, clothing, pose, setting, lighting, composition and art style. Write one line of "
+                          "comma-separated phrases. No opinions, no introductions, no line breaks.")
+DEFAULT_CAPTION_INSTRUCTION = "Caption this image."
+
+# Decoded images waiting for a caption slot, on top of the ones being captioned
+PREFETCH_IMAGES = 8
+# How often progress and throughput are printed
+PROGRESS_SECONDS = 10.0
+# Failures printed in full; later ones only count
+MAX_REPORTED_ERRORS = 5
+
+def caption_path(image_path: str) -> str:
+    return os.path.splitext(image_path)[0] + CAPTION_EXTENSION
+
+def iter_images(root: str, recursive: bool = True) -> Iterator[str]:
+    """Stream image paths under root in a stable order, one directory listing at a time"""
+    directories = [root]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"GROQ captioner: cannot read {directory}: {str(e)}")
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not entry.name.startswith("."):
+                    subdirectories.append(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                yield entry.path
+        directories.extend(reversed(subdirectories))
+
+def load_image_url(path: str, max_side: int, encode_image) -> str:
+    """Decode, orient, downscale and JPEG-encode one image as a data URL (runs on the decode pool)"""
+    with span("caption.decode"):
+        with Image.open(path) as image:
+            image.draft("RGB", (max_side, max_side))  # JPEG: decode at reduced scale when much larger
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            if max(image.size) > max_side:
+                image.thumbnail((max_side, max_side), Image.LANCZOS)
+            return f"data:image/jpeg;base64,{encode_image(image, 'JPEG')}"
+
+def clean_caption(text: str, trigger_word: str = "") -> str:
+    """One-line caption, optionally led by the LoRA trigger word"""
+    caption = " ".join((text or "").split()).strip().strip('"').strip()
+    trigger_word = trigger_word.strip()
+    if trigger_word and not caption.lower().startswith(trigger_word.lower()):
+        caption = f"{trigger_word}, {caption}" if caption else trigger_word
+    return caption
+
+def write_caption(path: str, caption: str):
+    """Write a caption atomically so an interrupted job never leaves a partial file that would be skipped"""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(caption + "\n")
+    os.replace(temp_path, path)
+
+class RequestPacer:
+    """Spaces requests evenly to stay under a requests-per-minute limit (0 = no limit)"""
+
+    def __init__(self, requests_per_minute: float = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Wait for the next request slot; the request's deadline starts after it"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        while time.monotonic() < slot:
+            time.sleep(min(slot - time.monotonic(), POLL_INTERVAL))
+            check_interrupted()
+
+class CaptionStats:
+    """Counters of one captioning run, updated from the caption workers"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.captioned = 0
+        self.skipped = 0
+        self.failed = 0
+        self.tokens = 0
+        self.decode_wait_seconds = 0.0
+        self.request_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, result: Dict[str, Any]):
+        with self._lock:
+            if "error" in result:
+                self.failed += 1
+                if self.failed <= MAX_REPORTED_ERRORS:
+                    print(f"GROQ captioner: {result['image']}: {result['error']}")
+            else:
+                self.captioned += 1
+                self.tokens += result.get("tokens", 0)
+            self.decode_wait_seconds += result.get("decode_wait_seconds", 0.0)
+            self.request_seconds += result.get("request_seconds", 0.0)
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        done = self.captioned + self.failed
+        return (f"{self.captioned} captioned, {self.skipped} skipped (already captioned), {self.failed} failed "
+                f"in {elapsed:.1f}s: {self.captioned / elapsed:.2f} images/s, {self.tokens} tokens "
+                f"({self.tokens / elapsed:.0f} tokens/s); per image {1000 * self.decode_wait_seconds / max(done, 1):.0f}ms waiting for decode, "
+                f"{self.request_seconds / max(done, 1):.2f}s request")
+
+class GroqDatasetCaptioner(GroqNode):
+    """GROQ Dataset Captioner - Caption a folder of training images into .txt files next to them"""
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("image_dir", "summary")
+    OUTPUT_TOOLTIPS = ("The captioned folder", "Images captioned, skipped and failed, with throughput")
+    FUNCTION = "caption_directory"
+    CATEGORY = "GroqPrompt/Art Generation"
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        vision_models = get_model_choices(ModelType.VISION)
+
+        return {
+            "required": {
+                "api_key": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable."
+                }),
+                "model": ([AUTO_MODEL] + vision_models, {
+                    "default": "meta-llama/llama-4-scout-17b-16e-instruct",
+                    "tooltip": "Vision-Language Model that writes the captions"
+                }),
+                "image_dir": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Folder of training images (.png, .jpg, .jpeg, .webp, .bmp). Each caption is written to <image>.txt next to its image."
+                }),
+                "system_message": ("STRING", {
+                    "multiline": True,
+                    "default": DEFAULT_CAPTION_SYSTEM,
+                    "tooltip": "Captioning style"
+                }),
+                "user_input": ("STRING", {
+                    "multiline": True,
+                    "default": DEFAULT_CAPTION_INSTRUCTION,
+                    "tooltip": "Instruction sent with every image"
+                }),
+                "concurrency": ("INT", {
+                    "default": 4,
+                    "min": 1,
+                    "max": 32,
+                    "tooltip": "Images captioned at once"
+                }),
+                "requests_per_minute": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 10000,
+                    "tooltip": "Space requests to stay under this rate (0 = only the API's own rate limit handling)"
+                }),
+            },
+            "optional": {
+                "trigger_word": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "LoRA trigger word put at the start of every caption"
+                }),
+                "overwrite": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Caption images that already have a .txt file. Off skips them, so an interrupted job resumes where it stopped."
+                }),
+                "recursive": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Include images in subfolders"
+                }),
+                "max_side": ("INT", {
+                    "default": 1024,
+                    "min": 256,
+                    "max": 4096,
+                    "step": 64,
+                    "tooltip": "Images are downscaled to this longest side before upload"
+                }),
+                "temperature": ("FLOAT", {
+                    "default": 0.3,
+                    "min": 0.0,
+                    "max": 2.0,
+                    "step": 0.05,
+                    "tooltip": "Low values keep captions factual and consistent"
+                }),
+                "max_tokens": ("INT", {
+                    "default": 300,
+                    "min": 16,
+                    "max": 4096,
+                    "tooltip": "Maximum tokens per caption"
+                }),
+                "max_retries": ("INT", {
+                    "default": 2,
+                    "min": 1,
+                    "max": 10,
+                    "tooltip": "Attempts per image; images that still fail get no caption file and are retried by the next run"
+                }),
+                "limit": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 10000000,
+                    "tooltip": "Stop after this many new captions (0 = whole folder)"
+                }),
+                **TIMEOUT_INPUTS,
+                # Captioning jobs yield to interactive nodes by default
+                "priority": (PRIORITY_LANES, dict(SCHEDULER_INPUTS["priority"][1], default="batch")),
+                **ROUTER_INPUTS,
+            }
+        }
+
+    def __init__(self):
+        self.generator = GroqArtPromptGenerator()
+
+    def caption_image(self, api_key, image_path, decoded, pacer, settings) -> Dict[str, Any]:
+        """Caption one image whose decode is in flight on the decode pool and write its .txt; never raises"""
+        result = {"image": image_path}
+        started = time.monotonic()
+        try:
+            image_url = decoded.result()
+            result["decode_wait_seconds"] = time.monotonic() - started
+            pacer.wait()
+            deadline = Deadline.from_inputs(priority=settings["priority"], **settings["timeouts"])
+            request_params = {
+                "model": settings["model"],
+                "messages": self.generator.build_messages(settings["system_message"], settings["user_input"], image_url),
+                "temperature": settings["temperature"],
+                "max_tokens": settings["max_tokens"],
+            }
+            requested = time.monotonic()
+            response = self.generator.request_with_retries(api_key, request_params, settings["max_retries"], deadline)
+            result["request_seconds"] = time.monotonic() - requested
+            content = response.choices[0].message.content if getattr(response, "choices", None) else ""
+            caption = clean_caption(content, settings["trigger_word"])
+            if not caption or caption == settings["trigger_word"].strip():
+                raise ValueError("empty caption")
+            write_caption(caption_path(image_path), caption)
+            usage = getattr(response, "usage", None)
+            result["tokens"] = getattr(usage, "total_tokens", 0) or 0
+        except Exception as e:
+            raise_if_interrupted(e)
+            result["error"] = str(e)
+        return result
+
+    @traced()
+    def caption_directory(self, api_key, model, image_dir, system_message, user_input, concurrency, requests_per_minute,
+                          trigger_word="", overwrite=False, recursive=True, max_side=1024, temperature=0.3,
+                          max_tokens=300, max_retries=2, limit=0, priority="batch", **kwargs):
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+
+        image_dir = os.path.expanduser(image_dir.strip())
+        if not os.path.isdir(image_dir):
+            return (image_dir, f"Error: image folder not found: {image_dir}")
+
+        settings = {
+            # Resolved once so the whole dataset is captioned by one model
+            "model": get_model_router().resolve(model, max_tokens, candidates=get_model_choices(ModelType.VISION), **kwargs),
+            "system_message": system_message,
+            "user_input": user_input,
+            "trigger_word": trigger_word,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "max_retries": max_retries,
+            "timeouts": {name: kwargs[name] for name in TIMEOUT_INPUTS if name in kwargs},
+            "priority": priority,
+        }
+        stats = CaptionStats()
+        pacer = RequestPacer(requests_per_minute)
+        images = iter_images(image_dir, recursive)
+        decoding = deque()
+        running = {}
+        exhausted = False
+        reported_at = stats.started
+
+        def limit_reached():
+            # Only captions written count; a failed image frees its place for the next one
+            return limit and stats.captioned + len(decoding) + len(running) >= limit
+
+        def prefetch():
+            # Decode ahead of the caption slots; files already captioned are skipped without being opened
+            nonlocal exhausted
+            while not exhausted and len(decoding) < PREFETCH_IMAGES and not limit_reached():
+                image_path = next(images, None)
+                if image_path is None:
+                    exhausted = True
+                elif not overwrite and os.path.exists(caption_path(image_path)):
+                    stats.skipped += 1
+                else:
+                    decoding.append((image_path, decode_pool.submit(propagate(load_image_url), image_path, max_side, self.encode_image)))
+
+        decode_pool = ThreadPoolExecutor(max_workers=min(os.cpu_count() or 4, 8), thread_name_prefix="groq-decode")
+        caption_pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="groq-caption")
+        try:
+            while True:
+                prefetch()
+                while decoding and len(running) < concurrency:
+                    image_path, decoded = decoding.popleft()
+                    running[caption_pool.submit(propagate(self.caption_image), api_key, image_path, decoded, pacer, settings)] = image_path
+                    prefetch()
+                if not running:
+                    break
+                done, _ = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                check_interrupted()
+                for future in done:
+                    running.pop(future)
+                    stats.record(future.result())
+                if time.monotonic() - reported_at >= PROGRESS_SECONDS:
+                    reported_at = time.monotonic()
+                    print(f"GROQ captioner: {stats.summary()}")
+        except BaseException:
+            # Captions already written stay; the rest are picked up by the next run
+            for future, _ in decoding:
+                future.cancel()
+            for future in running:
+                future.cancel()
+            raise
+        finally:
+            decode_pool.shutdown(wait=False)
+            caption_pool.shutdown(wait=False)
+
+        # The limit only stopped the run if an uncaptioned image is left
+        limit_hit = not exhausted and any(overwrite or not os.path.exists(caption_path(image_path)) for image_path in images)
+        summary = f"{'Stopped after limit' if limit_hit else 'Finished'}: {stats.summary()}\nFolder: {image_dir}"
+        print(f"GROQ captioner: {summary}")
+        return (image_dir, summary)
+
+def main(argv=None):
+    """Headless entry point: python -m nodes.caption_node /data/lora/images --trigger-word ohwx"""
+    parser = argparse.ArgumentParser(description="Caption a folder of training images into .txt files with a GROQ vision model")
+    parser.add_argument("image_dir", help="Folder of training images")
+    parser.add_argument("-m", "--model", default="meta-llama/llama-4-scout-17b-16e-instruct", help=f"Vision model name or {AUTO_MODEL}")
+    parser.add_argument("-t", "--trigger-word", default="", help="LoRA trigger word put at the start of every caption")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Images captioned at once")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute limit (0 = none)")
+    parser.add_argument("--system", default=DEFAULT_CAPTION_SYSTEM, help="Captioning style system message")
+    parser.add_argument("--instruction", default=DEFAULT_CAPTION_INSTRUCTION, help="Instruction sent with every image")
+    parser.add_argument("--max-side", type=int, default=1024, help="Longest image side sent to the API")
+    parser.add_argument("--temperature", type=float, default=0.3)
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many new captions")
+    parser.add_argument("--overwrite", action="store_true", help="Recaption images that already have a .txt file")
+    parser.add_argument("--no-recursive", action="store_true", help="Ignore subfolders")
+    parser.add_argument("--priority", default="batch", choices=PRIORITY_LANES,
+                        help="Scheduling lane; batch yields to interactive requests made in the same process")
+    parser.add_argument("--api-key", default="", help="GROQ API key (default: GROQ_API_KEY)")
+    args = parser.parse_args(argv)
+
+    _, summary = GroqDatasetCaptioner().caption_directory(
+        args.api_key, args.model, args.image_dir, args.system, args.instruction, args.concurrency, args.rpm,
+        trigger_word=args.trigger_word, overwrite=args.overwrite, recursive=not args.no_recursive,
+        max_side=args.max_side, temperature=args.temperature, max_tokens=args.max_tokens,
+        max_retries=args.max_retries, limit=args.limit, priority=args.priority)
+    if summary.startswith("Error:"):
+        print(summary, file=sys.stderr)
+        return 1
+    return 0
+
+# Node class mappings
+NODE_CLASS_MAPPINGS = {
+    "GroqDatasetCaptioner": GroqDatasetCaptioner,
+}
+
+# Node display names
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "GroqDatasetCaptioner": "GROQ Dataset Captioner",
+}
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,21 @@
-import os
+import json
 import re
 from typing import Dict, List, Optional, Tuple, Any
-from groq import Groq
 
 from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.json_patch import PATCH_SCHEMA, JsonPatchError, apply_patch
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.structured_output import schema_instructions, structured_completion
+from .utils.tracing import traced
+from .utils.workflow_format import compact_to_ui, is_api_workflow, minify_workflow, restore_layout, validate_graph
+from .utils.workflow_templates import get_template
+
+# Fenced code block (optionally tagged json) and the outermost {...} span of a response
+JSON_BLOCK_PATTERN = re.compile(r'```(?:json)?\n(.*?)\n```', re.DOTALL)
+JSON_OBJECT_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
 
 class GroqWorkflowHelper(GroqNode):
     """GROQ Workflow Helper - Generate ComfyUI workflows, fix issues, and provide technical assistance"""
@@ -24,7 +36,7 @@ class GroqWorkflowHelper(GroqNode):
                     "multiline": False,
                     "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable."
                 }),
-                "model": (get_model_choices(ModelType.CODE), {
+                "model": ([AUTO_MODEL] + get_model_choices(ModelType.CODE), {
                     "default": "llama-3.3-70b-versatile",
                     "tooltip": "Select a model for workflow generation"
                 }),
@@ -65,25 +77,53 @@ class GroqWorkflowHelper(GroqNode):
                     "default": "",
                     "tooltip": "Paste existing workflow JSON here for debugging/modification"
                 }),
+                "use_template": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "For txt2img, img2img, inpainting, controlnet and upscaling, fill a bundled workflow template: the model only picks the parameters (checkpoint, sampler, steps, prompts...). Much faster and always structurally valid."
+                }),
+                "edit_mode": (["json_patch", "full_workflow"], {
+                    "default": "json_patch",
+                    "tooltip": "How the model fixes an existing workflow. json_patch: it returns only RFC 6902 patch operations, applied and validated locally (output scales with the fix, not the workflow). full_workflow: it re-emits the whole workflow. json_patch falls back to full_workflow if the patch does not apply."
+                }),
+                "compact_workflow": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Send the existing workflow as a minified graph without layout data (positions, sizes, groups), then merge the layout back into the result. Cuts input tokens for large workflows."
+                }),
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
             }
         }
     
-    def generate_workflow(self, api_key, model, workflow_request, workflow_type, temperature, max_tokens, include_instructions, model_preference, existing_workflow=""):
-        # Use provided API key or fall back to environment variable
-        api_key = api_key.strip() or os.getenv('GROQ_API_KEY', '')
+    @traced()
+    def generate_workflow(self, api_key, model, workflow_request, workflow_type, temperature, max_tokens, include_instructions, model_preference, existing_workflow="", compact_workflow=True, use_template=True, edit_mode="json_patch", **kwargs):
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
         if not api_key:
             raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
         
-        # Initialize GROQ client
-        client = Groq(api_key=api_key)
+        # One budget for the workflow and instructions calls
+        deadline = Deadline.from_inputs(**kwargs)
+        model = get_model_router().resolve(model, max_tokens, **kwargs)
         
         # Prepare the prompt based on workflow type
+        layout = None
         if existing_workflow.strip():
+            workflow_text = existing_workflow
+            format_note = ""
+            if compact_workflow:
+                workflow_text, layout = minify_workflow(existing_workflow)
+                if layout is not None:
+                    format_note = """
+The workflow is given as a compact graph: {node_id: {"class_type", "inputs": {name: [source_node_id, output_slot]}, "widgets_values": [...]}}.
+Return the corrected workflow in this same compact format, keeping the node ids of unchanged nodes."""
+
             # Debug/modify existing workflow
             prompt = f"""You are a ComfyUI workflow expert. Analyze and improve this existing workflow:
 
 EXISTING WORKFLOW:
-{existing_workflow}
+{workflow_text}
+{format_note}
 
 USER REQUEST: {workflow_request}
 
@@ -123,9 +163,31 @@ Please provide:
 
 The JSON should be ready to copy-paste into ComfyUI."""
         
+        template = None
+        if use_template and not existing_workflow.strip():
+            template = get_template(workflow_type)
+        
         try:
+            if template is not None:
+                workflow_json = self._fill_template(api_key, model, template, workflow_request, model_preference, temperature, deadline)
+                instructions = ""
+                if include_instructions:
+                    instructions = self._generate_instructions(api_key, model, workflow_request, deadline)
+                return (workflow_json, instructions)
+            
+            if existing_workflow.strip() and edit_mode == "json_patch":
+                patched = self._patch_workflow(api_key, model, workflow_text, layout, workflow_request, temperature, max_tokens, deadline)
+                if patched is not None:
+                    workflow_json, instructions = patched
+                    if include_instructions:
+                        instructions += "\n\n" + self._generate_instructions(api_key, model, workflow_request, deadline)
+                    return (workflow_json, instructions)
+                print("Workflow patch failed, regenerating the full workflow")
+            
             # Make the API call
-            response = client.chat.completions.create(
+            response = chat_completion(
+                api_key,
+                deadline=deadline,
                 model=model,
                 messages=[
                     {"role": "system", "content": "You are a ComfyUI workflow expert with deep knowledge of node connections, parameters, and JSON structure. Always provide valid, working workflows."},
@@ -146,20 +208,124 @@ The JSON should be ready to copy-paste into ComfyUI."""
                 content = response.choices[0].message.content
                 
                 # Try to extract JSON workflow from the response
-                json_blocks = re.findall(r'```(?:json)?\n(.*?)\n```', content, re.DOTALL)
-                if json_blocks:
-                    workflow_json = json_blocks[0].strip()
-                else:
-                    # If no code blocks, try to find JSON-like content
-                    json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                    if json_match:
-                        workflow_json = json_match.group(0)
-                    else:
-                        workflow_json = content
+                workflow_json = restore_layout(self.extract_workflow_json(content), layout)
                 
                 # Generate instructions if requested
                 if include_instructions:
-                    instructions_prompt = f"""Based on this ComfyUI workflow request: "{workflow_request}", provide step-by-step instructions for:
+                    instructions = self._generate_instructions(api_key, model, workflow_request, deadline)
+                
+                return (workflow_json or "No workflow generated", instructions)
+            
+            return ("No workflow generated", "No response received")
+            
+        except Exception as e:
+            raise_if_interrupted(e)
+            return (f"Error: {str(e)}", "")
+    
+    @staticmethod
+    def extract_workflow_json(content):
+        """Pull the workflow JSON out of a model response: first code block, else the outermost braces"""
+        # Only the first block is used, so stop scanning at it
+        json_block = JSON_BLOCK_PATTERN.search(content)
+        if json_block:
+            return json_block.group(1).strip()
+        # If no code blocks, try to find JSON-like content
+        json_match = JSON_OBJECT_PATTERN.search(content)
+        return json_match.group(0) if json_match else content
+    
+    def _fill_template(self, api_key, model, template, workflow_request, model_preference, temperature, deadline):
+        """Have the model choose the template's parameters and apply them locally"""
+        defaults = template.defaults(model_preference)
+        schema = template.schema()
+        prompt = f"""Choose the parameters for this ComfyUI workflow template.
+
+TEMPLATE: {template.name} - {template.description}
+USER REQUEST: {workflow_request}
+PREFERRED MODEL: {model_preference}
+DEFAULT VALUES: {json.dumps(defaults)}
+
+Keep a default unless the request asks for something else. Write a detailed positive prompt from the request.
+
+{schema_instructions(schema)}"""
+        
+        params = structured_completion(
+            api_key,
+            f"{template.name}_parameters",
+            schema,
+            deadline=deadline,
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a ComfyUI workflow expert. Respond only with the parameter values as JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=1024,
+        )
+        if params is None:
+            # Still a valid workflow: template defaults with the request as the prompt
+            print(f"Workflow template {template.name}: using default parameters")
+            params = {"positive_prompt": workflow_request}
+        return json.dumps(template.apply(params, model_preference), indent=2)
+    
+    def _patch_workflow(self, api_key, model, workflow_text, layout, workflow_request, temperature, max_tokens, deadline):
+        """Ask for JSON Patch operations against the submitted workflow and apply them locally
+
+        Returns (workflow_json, change summary), or None if the patch is unusable.
+        """
+        try:
+            document = json.loads(workflow_text)
+        except json.JSONDecodeError:
+            return None
+        
+        prompt = f"""You are a ComfyUI workflow expert. Fix or modify this workflow as requested.
+
+WORKFLOW:
+{workflow_text}
+
+USER REQUEST: {workflow_request}
+
+Do NOT repeat the workflow. Return only RFC 6902 JSON Patch operations against it, using JSON Pointer paths (e.g. /3/inputs/steps or /3/widgets_values/2), and a short explanation.
+
+{schema_instructions(PATCH_SCHEMA)}"""
+        
+        result = structured_completion(
+            api_key,
+            "workflow_patch",
+            PATCH_SCHEMA,
+            deadline=deadline,
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a ComfyUI workflow expert. You edit workflows with minimal JSON Patch operations."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        if result is None:
+            return None
+        
+        operations = result["operations"]
+        try:
+            patched = apply_patch(document, operations)
+        except JsonPatchError as e:
+            print(f"Workflow patch did not apply: {str(e)}")
+            return None
+        
+        graph_like = layout is not None or is_api_workflow(document)
+        errors = validate_graph(patched) if graph_like else []
+        if errors:
+            print(f"Patched workflow is invalid: {'; '.join(errors[:3])}")
+            return None
+        
+        if layout is not None:
+            patched = compact_to_ui(patched, layout)
+        changes = "\n".join(f"- {op.get('op')} {op.get('path')}" for op in operations)
+        summary = f"{result['explanation']}\n\nApplied {len(operations)} patch operations:\n{changes}"
+        return (json.dumps(patched, indent=2), summary)
+    
+    def _generate_instructions(self, api_key, model, workflow_request, deadline):
+        """Step-by-step usage instructions for a generated workflow"""
+        instructions_prompt = f"""Based on this ComfyUI workflow request: "{workflow_request}", provide step-by-step instructions for:
 
 1. How to load and use this workflow in ComfyUI
 2. What nodes are required (if any custom nodes needed)
@@ -168,29 +334,25 @@ The JSON should be ready to copy-paste into ComfyUI."""
 5. Expected results and usage tips
 
 Keep instructions clear and beginner-friendly."""
-                    
-                    inst_response = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {"role": "system", "content": "You are a helpful ComfyUI instructor. Provide clear, step-by-step guidance."},
-                            {"role": "user", "content": instructions_prompt}
-                        ],
-                        temperature=0.3,
-                        max_tokens=1024,
-                        top_p=1.0,
-                        frequency_penalty=0.0,
-                        presence_penalty=0.0
-                    )
-                    
-                    if hasattr(inst_response, 'choices') and len(inst_response.choices) > 0:
-                        instructions = inst_response.choices[0].message.content
-                
-                return (workflow_json or "No workflow generated", instructions)
-            
-            return ("No workflow generated", "No response received")
-            
-        except Exception as e:
-            return (f"Error: {str(e)}", "")
+        
+        inst_response = chat_completion(
+            api_key,
+            deadline=deadline,
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a helpful ComfyUI instructor. Provide clear, step-by-step guidance."},
+                {"role": "user", "content": instructions_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=1024,
+            top_p=1.0,
+            frequency_penalty=0.0,
+            presence_penalty=0.0
+        )
+        
+        if hasattr(inst_response, 'choices') and len(inst_response.choices) > 0:
+            return inst_response.choices[0].message.content
+        return ""
 
 # Node class mappings
 NODE_CLASS_MAPPINGS = {
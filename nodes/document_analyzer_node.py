@@ -1,9 +1,15 @@
-import os
 import json
 from typing import Dict, List, Optional, Any
-from groq import Groq
 
-from .utils.base_node import GroqNode
+from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.moderation import MODERATION_INPUTS, SafetyScreenError, screened
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.semantic_cache import get_semantic_cache, log_cache_hit
+from .utils.structured_output import string_schema, schema_instructions, structured_completion
+from .utils.tracing import traced
 
 class GroqStyleTransferPrompter(GroqNode):
     """GROQ Style Transfer Prompter - Convert art descriptions into consistent Stable Diffusion prompts"""
@@ -56,18 +62,45 @@ class GroqStyleTransferPrompter(GroqNode):
                     "default": "moderate",
                     "tooltip": "How strongly to apply the style characteristics"
                 }),
+            },
+            "optional": {
+                "model": ([AUTO_MODEL] + get_model_choices(ModelType.TEXT), {
+                    "default": "llama-3.3-70b-versatile",
+                    "tooltip": "Model to use. auto picks the fastest model of model_tier expected to meet latency_slo, from observed per-model latency."
+                }),
+                "generation_mode": (["combined_json", "separate_calls"], {
+                    "default": "combined_json",
+                    "tooltip": "combined_json returns the style and negative prompts from one structured JSON completion (half the requests), falling back to separate calls if the JSON fails validation"
+                }),
+                "semantic_cache": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Reuse the result of a previous near-duplicate style description with the same settings instead of calling the API"
+                }),
+                "similarity_threshold": ("FLOAT", {
+                    "default": 0.9,
+                    "min": 0.5,
+                    "max": 1.0,
+                    "step": 0.01,
+                    "tooltip": "Minimum cosine similarity for a semantic cache hit. Lower values reuse more results but may match descriptions that mean something different."
+                }),
+                **MODERATION_INPUTS,
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
             }
         }
     
-    def generate_style_prompt(self, api_key, style_description, art_medium, subject_matter, temperature, max_tokens, include_negative, prompt_strength):
-        # Use provided API key or fall back to environment variable
-        api_key = api_key.strip() or os.getenv('GROQ_API_KEY', '')
-        if not api_key:
-            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
-        
-        # Initialize GROQ client
-        client = Groq(api_key=api_key)
-        
+    STYLE_SYSTEM_MESSAGE = "You are an expert art prompt engineer specializing in Stable Diffusion prompts. Create detailed, effective prompts that capture artistic styles accurately."
+    NEGATIVE_SYSTEM_MESSAGE = "You are an expert at creating negative prompts for AI art generation."
+    
+    # Schema for combined_json mode: both outputs from a single completion
+    COMBINED_SCHEMA = string_schema({
+        "style_prompt": "The single, comma-separated style prompt",
+        "negative_prompt": "The comma-separated negative prompt terms",
+    })
+    
+    def build_style_prompt(self, style_description, art_medium, subject_matter, prompt_strength):
+        """Build the user prompt for the style prompt request"""
         # Create strength modifiers
         strength_modifiers = {
             "subtle": "lightly inspired by, hints of",
@@ -76,8 +109,7 @@ class GroqStyleTransferPrompter(GroqNode):
             "extreme": "exact style of, perfect emulation of"
         }
         
-        # Prepare the main prompt
-        main_prompt = f"""Convert this art style description into a detailed Stable Diffusion prompt for {subject_matter} artwork:
+        return f"""Convert this art style description into a detailed Stable Diffusion prompt for {subject_matter} artwork:
 
 Style Description: {style_description}
 Art Medium: {art_medium}
@@ -91,13 +123,93 @@ Create a comprehensive prompt that captures:
 5. Quality and detail descriptors
 
 Format as a single, comma-separated prompt optimized for AI art generation."""
+    
+    def build_negative_prompt(self, style_description, art_medium, subject_matter):
+        """Build the user prompt for the negative prompt request"""
+        return f"""Create a negative prompt to avoid unwanted elements when generating {subject_matter} artwork in {art_medium} style. Include common issues like:
+- Poor quality descriptors
+- Unwanted artistic styles that conflict with {style_description}
+- Technical problems (blurry, distorted, etc.)
+- Inappropriate elements for {subject_matter}
+
+Format as comma-separated negative terms."""
+    
+    @traced()
+    def generate_style_prompt(self, api_key, style_description, art_medium, subject_matter, temperature, max_tokens, include_negative, prompt_strength, generation_mode="combined_json",
+                              semantic_cache=False, similarity_threshold=0.9, model="llama-3.3-70b-versatile", safety_screen="off", **kwargs):
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+        
+        # Reuse the result of a near-duplicate style description with the same settings
+        if semantic_cache:
+            cache = get_semantic_cache("style_transfer_prompter")
+            namespace = cache.namespace_for(model=model, art_medium=art_medium, subject_matter=subject_matter, include_negative=include_negative,
+                                            prompt_strength=prompt_strength)
+        
+        deadline = Deadline.from_inputs(**kwargs)
+        
+        def generate():
+            if semantic_cache:
+                hit = cache.lookup(namespace, style_description, similarity_threshold)
+                if hit is not None:
+                    result, similarity, cached_text = hit
+                    log_cache_hit("GroqStyleTransferPrompter", similarity, style_description, cached_text)
+                    return tuple(result), True
+            resolved_model = get_model_router().resolve(model, max_tokens, **kwargs)
+            return self._request_style_prompt(api_key, resolved_model, style_description, art_medium, subject_matter, temperature, max_tokens, include_negative, prompt_strength,
+                                              generation_mode, deadline), False
+        
+        try:
+            result, from_cache = screened(api_key, style_description, deadline, generate, safety_screen)
+        except SafetyScreenError as e:
+            print(f"GroqStyleTransferPrompter: {str(e)}")
+            return (f"Error: {str(e)}", "")
+        if semantic_cache and not from_cache and not result[0].startswith("Error:") and result[0] != "No style prompt generated":
+            cache.add(namespace, style_description, list(result))
+        return result
+    
+    def _request_style_prompt(self, api_key, model, style_description, art_medium, subject_matter, temperature, max_tokens, include_negative, prompt_strength, generation_mode, deadline=None):
+        """Run the style (and negative) prompt request(s)"""
+        # Prepare the main prompt
+        main_prompt = self.build_style_prompt(style_description, art_medium, subject_matter, prompt_strength)
+        negative_prompt_request = self.build_negative_prompt(style_description, art_medium, subject_matter)
         
         try:
+            # One completion for both outputs; falls through to the two-call path if the JSON is unusable
+            if include_negative and generation_mode == "combined_json":
+                combined = structured_completion(
+                    api_key,
+                    "style_transfer",
+                    self.COMBINED_SCHEMA,
+                    deadline=deadline,
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": self.STYLE_SYSTEM_MESSAGE},
+                        {"role": "user", "content": f"""{main_prompt}
+
+Also write the negative prompt for the same artwork:
+{negative_prompt_request}
+
+{schema_instructions(self.COMBINED_SCHEMA)}"""}
+                    ],
+                    temperature=temperature,
+                    max_tokens=max_tokens + 512,
+                    top_p=1.0,
+                    frequency_penalty=0.0,
+                    presence_penalty=0.0
+                )
+                if combined is not None:
+                    return (combined["style_prompt"].strip(), combined["negative_prompt"].strip())
+            
             # Make the API call for main prompt
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            response = chat_completion(
+                api_key,
+                deadline=deadline,
+                model=model,
                 messages=[
-                    {"role": "system", "content": "You are an expert art prompt engineer specializing in Stable Diffusion prompts. Create detailed, effective prompts that capture artistic styles accurately."},
+                    {"role": "system", "content": self.STYLE_SYSTEM_MESSAGE},
                     {"role": "user", "content": main_prompt}
                 ],
                 temperature=temperature,
@@ -116,18 +228,12 @@ Format as a single, comma-separated prompt optimized for AI art generation."""
             
             # Generate negative prompt if requested
             if include_negative:
-                negative_prompt_request = f"""Create a negative prompt to avoid unwanted elements when generating {subject_matter} artwork in {art_medium} style. Include common issues like:
-- Poor quality descriptors
-- Unwanted artistic styles that conflict with {style_description}
-- Technical problems (blurry, distorted, etc.)
-- Inappropriate elements for {subject_matter}
-
-Format as comma-separated negative terms."""
-                
-                neg_response = client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
+                neg_response = chat_completion(
+                    api_key,
+                    deadline=deadline,
+                    model=model,
                     messages=[
-                        {"role": "system", "content": "You are an expert at creating negative prompts for AI art generation."},
+                        {"role": "system", "content": self.NEGATIVE_SYSTEM_MESSAGE},
                         {"role": "user", "content": negative_prompt_request}
                     ],
                     temperature=0.3,
@@ -143,6 +249,7 @@ Format as comma-separated negative terms."""
             return (style_prompt or "No style prompt generated", negative_prompt)
             
         except Exception as e:
+            raise_if_interrupted(e)
             return (f"Error: {str(e)}", "")
 
 # Node class mappings
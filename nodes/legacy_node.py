@@ -4,9 +4,19 @@ import random
 import numpy as np
 import torch
 from typing import Dict, List, Optional, Any
-from groq import Groq
 
 from .utils.base_node import GroqNode, get_model_descriptions, get_model_choices, ModelType
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.few_shot import render_preset
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.tracing import traced
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "groq")
+PRESET_FILES = [
+    os.path.join(PROMPTS_DIR, "DefaultPrompts.json"),
+    os.path.join(PROMPTS_DIR, "UserPrompts.json"),
+]
 
 class GroqLLMNode(GroqNode):
     """Legacy GroqLLMNode for backward compatibility with old workflows"""
@@ -19,6 +29,7 @@ class GroqLLMNode(GroqNode):
     @classmethod
     def INPUT_TYPES(cls):
         text_models = get_model_choices(ModelType.TEXT)
+        presets = ["None"] + list(cls.load_prompt_presets(PRESET_FILES))
         
         return {
             "required": {
@@ -27,7 +38,7 @@ class GroqLLMNode(GroqNode):
                     "multiline": False, 
                     "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable."
                 }),
-                "model": (text_models, {
+                "model": ([AUTO_MODEL] + text_models, {
                     "default": "llama-3.3-70b-versatile",
                     "tooltip": "Select a text generation model"
                 }),
@@ -80,11 +91,47 @@ class GroqLLMNode(GroqNode):
                     "max": 2**32-1,
                     "tooltip": "Random seed (-1 for random)"
                 }),
+                "preset": (presets, {
+                    "default": "None",
+                    "tooltip": "Preset from DefaultPrompts.json / UserPrompts.json used as system message; the prompt fills its [user_input]"
+                }),
+                "few_shot_examples": ("INT", {
+                    "default": 3,
+                    "min": 0,
+                    "max": 50,
+                    "tooltip": "Send only this many of the preset's example replies, the ones most similar to the prompt (selected locally). 0 sends the whole library."
+                }),
+                "few_shot_token_budget": ("INT", {
+                    "default": 400,
+                    "min": 0,
+                    "max": 8192,
+                    "tooltip": "Maximum estimated tokens of selected examples (0 = no limit)"
+                }),
+                **TIMEOUT_INPUTS,
+                **ROUTER_INPUTS,
             }
         }
     
+    @staticmethod
+    def parse_history(conversation_history):
+        """Turn the conversation_history input into messages: a JSON message list, else plain text context"""
+        history_text = conversation_history.strip()
+        if not history_text:
+            return []
+        try:
+            # Try to parse as JSON first
+            if history_text.startswith('['):
+                history = json.loads(history_text)
+                return history if isinstance(history, list) else []
+        except json.JSONDecodeError:
+            pass
+        # Not a valid JSON list: treat as plain text context
+        return [{"role": "assistant", "content": history_text}]
+    
+    @traced()
     def generate(self, api_key, model, prompt, temperature, max_tokens, top_p, 
-                 api_key_override="", conversation_history="", system_message="", seed=-1, **kwargs):
+                 api_key_override="", conversation_history="", system_message="", seed=-1,
+                 preset="None", few_shot_examples=3, few_shot_token_budget=400, **kwargs):
         """Generate text response with conversation history support"""
         
         # Set random seed if specified
@@ -93,45 +140,39 @@ class GroqLLMNode(GroqNode):
             np.random.seed(seed)
             torch.manual_seed(seed)
         
-        # Use API key from provider node, then manual input, then environment variable
-        final_api_key = api_key_override.strip() or api_key.strip() or os.getenv('GROQ_API_KEY', '')
+        # Use API key from provider node, then manual input, then the key pool, then environment variable
+        final_api_key = resolve_api_key(api_key_override.strip() or api_key)
         if not final_api_key:
             return ("Error: No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.",)
         
-        # Initialize GROQ client
-        try:
-            client = Groq(api_key=final_api_key)
-        except Exception as e:
-            return (f"Error initializing GROQ client: {str(e)}",)
-        
         # Prepare messages
         messages = []
         
+        # A preset becomes the system message, carrying only the examples relevant to this prompt
+        presets = self.load_prompt_presets(PRESET_FILES) if preset != "None" else {}
+        if preset in presets:
+            preset_message, few_shot = render_preset(preset, presets[preset], prompt, few_shot_examples, few_shot_token_budget)
+            if few_shot["library"]:
+                print(f"GroqLLMNode: {few_shot['examples']} of {few_shot['library']} examples for '{preset}' "
+                      f"(~{few_shot['example_tokens']} of ~{few_shot['library_tokens']} example tokens)")
+            system_message = f"{preset_message}\n\n{system_message.strip()}".strip()
+        
         # Add system message if provided
         if system_message.strip():
             messages.append({"role": "system", "content": system_message.strip()})
         
         # Parse conversation history if provided
-        if conversation_history.strip():
-            try:
-                # Try to parse as JSON first
-                if conversation_history.strip().startswith('['):
-                    history = json.loads(conversation_history)
-                    if isinstance(history, list):
-                        messages.extend(history)
-                else:
-                    # Treat as plain text context
-                    messages.append({"role": "assistant", "content": conversation_history.strip()})
-            except json.JSONDecodeError:
-                # If not valid JSON, treat as plain text context
-                messages.append({"role": "assistant", "content": conversation_history.strip()})
+        messages.extend(self.parse_history(conversation_history))
         
         # Add current prompt
-        messages.append({"role": "user", "content": prompt})
+        if preset in presets and "[user_input]" in preset:
+            messages.append({"role": "user", "content": preset.replace("[user_input]", prompt)})
+        else:
+            messages.append({"role": "user", "content": prompt})
         
         # Prepare request data
         data = {
-            "model": model,
+            "model": get_model_router().resolve(model, max_tokens, **kwargs),
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
@@ -140,7 +181,7 @@ class GroqLLMNode(GroqNode):
         
         try:
             # Make the API call
-            response = client.chat.completions.create(**data)
+            response = chat_completion(final_api_key, deadline=Deadline.from_inputs(**kwargs), **data)
             
             # Extract the response content
             if hasattr(response, 'choices') and len(response.choices) > 0:
@@ -151,6 +192,7 @@ class GroqLLMNode(GroqNode):
             return ("No response generated",)
             
         except Exception as e:
+            raise_if_interrupted(e)
             error_msg = str(e)
             if "401" in error_msg or "invalid_api_key" in error_msg.lower():
                 return ("Error: Invalid API Key. Please check your GROQ_API_KEY.",)
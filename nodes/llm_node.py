@@ -1,19 +1,29 @@
-import os
 import json
 import random
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import torch
 import re
 from typing import Dict, List, Optional, Any
-from groq import Groq
 
 from .utils.base_node import GroqNode, get_model_descriptions, get_model_choices, ModelType
+from .utils.clip_tokens import CLIP_WINDOWS, compact_prompt, count_clip_tokens
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.groq_client import reasoning_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.moderation import MODERATION_INPUTS, SafetyScreenError, screened
+from .utils.reasoning import REASONING_EFFORTS, REASONING_MODES, reasoning_params
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.semantic_cache import get_semantic_cache, log_cache_hit
+from .utils.structured_output import schema_instructions, structured_completion
+from .utils.tracing import propagate, traced
 
 class GroqArtPromptEnhancer(GroqNode):
     """GROQ Art Prompt Enhancer - Enhance and refine art prompts for better AI generation results"""
     
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("enhanced_prompt",)
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("enhanced_prompt", "prompt_variations", "reasoning_usage")
+    OUTPUT_IS_LIST = (False, True, False)
     FUNCTION = "enhance_prompt"
     CATEGORY = "GroqPrompt/Art Generation"
     
@@ -30,7 +40,7 @@ class GroqArtPromptEnhancer(GroqNode):
                     "multiline": False, 
                     "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable."
                 }),
-                "model": (text_models, {
+                "model": ([AUTO_MODEL] + text_models, {
                     "default": "llama-3.3-70b-versatile",
                     "tooltip": "Select a text generation model"
                 }),
@@ -96,27 +106,55 @@ class GroqArtPromptEnhancer(GroqNode):
                     "default": "moderate",
                     "tooltip": "How creative to be with enhancements"
                 }),
+            },
+            "optional": {
+                "num_variations": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 16,
+                    "tooltip": "Number of distinct prompt variations, generated in one request and topped up with single requests if the model returns fewer. The prompt_variations output is a list of exactly this many items that fans out into downstream nodes (e.g. one sampler run per variation); failed variations are 'Error: ...' items."
+                }),
+                "semantic_cache": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Reuse the result of a previous near-duplicate prompt (e.g. 'beautiful woman, portrait' vs 'portrait of a beautiful woman') with the same settings instead of calling the API"
+                }),
+                "similarity_threshold": ("FLOAT", {
+                    "default": 0.9,
+                    "min": 0.5,
+                    "max": 1.0,
+                    "step": 0.01,
+                    "tooltip": "Minimum cosine similarity for a semantic cache hit. Lower values reuse more results but may match prompts that mean something different."
+                }),
+                "fit_clip_window": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "For SD1.5/SDXL targets, compact the result locally to CLIP's 75-token window: keywords are deduplicated, ranked and packed using CLIP's own BPE vocabulary. Runs in milliseconds, no extra API call."
+                }),
+                "reasoning": (REASONING_MODES, {
+                    "default": "hidden",
+                    "tooltip": "Reasoning models (DeepSeek R1, QwQ, gpt-oss) only: hidden drops the reasoning trace server-side, parsed returns it separately in reasoning_usage, raw streams it inline and strips the <think> spans locally. The enhanced prompt never contains reasoning."
+                }),
+                "reasoning_effort": (REASONING_EFFORTS, {
+                    "default": "default",
+                    "tooltip": "How much gpt-oss models reason before answering. Lower effort leaves more of max_tokens for the prompt and answers faster."
+                }),
+                "max_reasoning_tokens": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 32768,
+                    "step": 64,
+                    "tooltip": "DeepSeek R1 / QwQ only (0 = no limit): stream the reasoning and, once it exceeds this many tokens, stop it and have the model answer from what it has reasoned so far."
+                }),
+                **MODERATION_INPUTS,
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
             }
         }
     
-    def enhance_prompt(self, api_key, model, base_prompt, enhancement_type, target_model,
-                      temperature, max_tokens, top_p, frequency_penalty, presence_penalty,
-                      seed, prompt_length, creativity_level, **kwargs):
-        
-        # Set random seed if specified
-        if seed != -1:
-            random.seed(seed)
-            np.random.seed(seed)
-            torch.manual_seed(seed)
-        
-        # Use provided API key or fall back to environment variable
-        api_key = api_key.strip() or os.getenv('GROQ_API_KEY', '')
-        if not api_key:
-            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
-        
-        # Initialize GROQ client
-        client = Groq(api_key=api_key)
-        
+    SYSTEM_MESSAGE = "You are an expert AI art prompt engineer specializing in creating high-quality prompts for various AI art models. You understand what makes prompts effective and how to optimize them for different platforms."
+    
+    def build_enhancement_prompt(self, base_prompt, enhancement_type, target_model, prompt_length, creativity_level):
+        """Build the user prompt for the enhancement request"""
         # Create enhancement instructions based on type
         enhancement_instructions = {
             "quality_boost": "Add quality descriptors like 'high resolution', 'detailed', 'professional', 'masterpiece'",
@@ -143,7 +181,7 @@ class GroqArtPromptEnhancer(GroqNode):
         }
         
         # Create the enhancement prompt
-        enhancement_prompt = f"""You are an expert AI art prompt engineer. Enhance this basic art prompt for {target_model}:
+        return f"""You are an expert AI art prompt engineer. Enhance this basic art prompt for {target_model}:
 
 ORIGINAL PROMPT: {base_prompt}
 
@@ -160,17 +198,48 @@ Please enhance this prompt by:
 5. Ensuring the result is {length_targets[prompt_length]}
 
 Return only the enhanced prompt, no explanations."""
+    
+    def variations_schema(self, num_variations):
+        """Schema for a JSON list of prompt variations"""
+        return {
+            "type": "object",
+            "properties": {
+                "prompts": {
+                    "type": "array",
+                    "items": {"type": "string", "minLength": 1},
+                    "minItems": num_variations,
+                    "description": f"Exactly {num_variations} distinct enhanced prompts",
+                },
+            },
+            "required": ["prompts"],
+            "additionalProperties": False,
+        }
+    
+    @traced()
+    def enhance_prompt(self, api_key, model, base_prompt, enhancement_type, target_model,
+                      temperature, max_tokens, top_p, frequency_penalty, presence_penalty,
+                      seed, prompt_length, creativity_level, num_variations=1,
+                      semantic_cache=False, similarity_threshold=0.9, fit_clip_window=False,
+                      reasoning="hidden", reasoning_effort="default", max_reasoning_tokens=0, safety_screen="off", **kwargs):
         
-        # Prepare messages
-        messages = [
-            {"role": "system", "content": "You are an expert AI art prompt engineer specializing in creating high-quality prompts for various AI art models. You understand what makes prompts effective and how to optimize them for different platforms."},
-            {"role": "user", "content": enhancement_prompt}
-        ]
+        # Set random seed if specified
+        if seed != -1:
+            random.seed(seed)
+            np.random.seed(seed)
+            torch.manual_seed(seed)
+        
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+        
+        deadline = Deadline.from_inputs(**kwargs)
+        model = get_model_router().resolve(model, max_tokens, **kwargs)
+        enhancement_prompt = self.build_enhancement_prompt(base_prompt, enhancement_type, target_model, prompt_length, creativity_level)
         
         # Prepare request data
         data = {
             "model": model,
-            "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
             "top_p": top_p,
@@ -178,26 +247,136 @@ Return only the enhanced prompt, no explanations."""
             "presence_penalty": presence_penalty,
         }
         
+        # Reuse the result of a near-duplicate prompt with the same settings
+        if semantic_cache:
+            cache = get_semantic_cache("art_prompt_enhancer")
+            namespace = cache.namespace_for(model=model, enhancement_type=enhancement_type, target_model=target_model,
+                                            prompt_length=prompt_length, creativity_level=creativity_level,
+                                            num_variations=num_variations)
+        
+        def generate():
+            if semantic_cache:
+                hit = cache.lookup(namespace, base_prompt, similarity_threshold)
+                if hit is not None:
+                    result, similarity, cached_text = hit
+                    log_cache_hit("GroqArtPromptEnhancer", similarity, base_prompt, cached_text)
+                    return tuple(result), None
+            enhanced_prompt, variations, reasoning_info = self._request_enhancement(
+                api_key, enhancement_prompt, data, num_variations, deadline, reasoning, reasoning_effort, max_reasoning_tokens)
+            return (enhanced_prompt, variations), reasoning_info
+        
+        try:
+            result, reasoning_info = screened(api_key, base_prompt, deadline, generate, safety_screen)
+        except SafetyScreenError as e:
+            print(f"GroqArtPromptEnhancer: {str(e)}")
+            return (f"Error: {str(e)}", [f"Error: {str(e)}"], "{}")
+        
+        if reasoning_info is None:
+            reasoning_info = {"cached": True}
+        elif semantic_cache and not any(text.startswith("Error:") for text in result[1]) and result[0] != "No response generated":
+            # Only results for inputs that passed the safety screen are cached
+            cache.add(namespace, base_prompt, list(result))
+        
+        enhanced_prompt, variations = result
+        
+        # Fit the CLIP window locally instead of re-queuing with a shorter prompt_length
+        token_budget = CLIP_WINDOWS.get(target_model)
+        if fit_clip_window and token_budget and not enhanced_prompt.startswith("Error:"):
+            variations = [compact_prompt(variation, token_budget, base_prompt) for variation in variations]
+            compacted = compact_prompt(enhanced_prompt, token_budget, base_prompt)
+            print(f"GroqArtPromptEnhancer: compacted prompt from {count_clip_tokens(enhanced_prompt)} to {count_clip_tokens(compacted)} CLIP tokens")
+            enhanced_prompt = compacted
+        
+        return (enhanced_prompt, variations, json.dumps(reasoning_info, indent=2, ensure_ascii=False))
+    
+    def _request_enhancement(self, api_key, enhancement_prompt, data, num_variations, deadline=None,
+                             reasoning="hidden", reasoning_effort="default", max_reasoning_tokens=0):
+        """Run the enhancement request(s), returning (enhanced_prompt, prompt_variations, reasoning_usage)"""
         # Remove function calling - not needed for art prompt enhancement
         
         try:
-            # Make the API call
-            response = client.chat.completions.create(**data)
+            if num_variations == 1:
+                content, reasoning_info = self._request_single(api_key, enhancement_prompt, data, deadline, reasoning,
+                                                               reasoning_effort, max_reasoning_tokens)
+                if content:
+                    return (content, [content], reasoning_info)
+                return ("No response generated", ["No response generated"], reasoning_info)
             
-            # Extract the response content
-            if hasattr(response, 'choices') and len(response.choices) > 0:
-                choice = response.choices[0]
-                content = getattr(choice.message, 'content', '')
-                
-                # Clean up the response - remove any explanatory text, just return the prompt
-                content = content.strip()
-                
-                return (content,)
+            # Several variations come back as one structured JSON list instead of N requests
+            variations = []
+            schema = self.variations_schema(num_variations)
+            # JSON mode takes hidden or parsed reasoning only
+            reasoning_request = reasoning_params(data["model"], "hidden" if reasoning == "raw" else reasoning, reasoning_effort)
+            result = structured_completion(
+                api_key,
+                "prompt_variations",
+                schema,
+                deadline=deadline,
+                messages=[
+                    {"role": "system", "content": self.SYSTEM_MESSAGE},
+                    {"role": "user", "content": f"""{enhancement_prompt}
+
+Write {num_variations} distinct variations of the enhanced prompt. Vary the details, wording and emphasis while keeping the core concept.
+
+{schema_instructions(schema)}"""}
+                ],
+                **dict(data, max_tokens=min(data["max_tokens"] * num_variations, 32768), **reasoning_request)
+            )
+            if result is not None:
+                variations = [prompt.strip() for prompt in result["prompts"] if prompt.strip()][:num_variations]
+            reasoning_info = {"model": data["model"], "reasoning_effort": reasoning_effort,
+                              "note": "token accounting is only reported for single prompt requests",
+                              "variations_requested": num_variations, "variations_structured": len(variations)}
+            
+            # Top up a short or failed list with single requests, run side by side
+            missing = num_variations - len(variations)
+            if missing:
+                print(f"GroqArtPromptEnhancer: {len(variations)} of {num_variations} variations from one request, "
+                      f"requesting {missing} more")
+                with ThreadPoolExecutor(max_workers=missing, thread_name_prefix="groq-variation") as executor:
+                    futures = [executor.submit(propagate(self._request_single), api_key, enhancement_prompt, data, deadline,
+                                               reasoning, reasoning_effort, max_reasoning_tokens)
+                               for _ in range(missing)]
+                    for future in futures:
+                        try:
+                            content = future.result()[0]
+                            if not content:
+                                raise ValueError("No response generated")
+                            variations.append(content)
+                        except Exception as e:
+                            raise_if_interrupted(e)
+                            variations.append(f"Error: {str(e)}")
             
-            return ("No response generated",)
+            # Failed variations stay in the list as errors so the list always has num_variations items
+            failed = sum(1 for variation in variations if variation.startswith("Error:"))
+            reasoning_info["variations_failed"] = failed
+            if failed:
+                print(f"GroqArtPromptEnhancer: {failed} of {num_variations} variations failed")
+            enhanced_prompt = next((variation for variation in variations if not variation.startswith("Error:")), variations[0])
+            return (enhanced_prompt, variations, reasoning_info)
             
         except Exception as e:
-            return (f"Error: {str(e)}",)
+            raise_if_interrupted(e)
+            return (f"Error: {str(e)}", [f"Error: {str(e)}"], {})
+    
+    def _request_single(self, api_key, enhancement_prompt, data, deadline=None, reasoning="hidden",
+                        reasoning_effort="default", max_reasoning_tokens=0):
+        """One enhancement request, returning (enhanced_prompt or "", reasoning_usage)"""
+        # Make the API call; reasoning is kept out of the answer and accounted separately
+        result = reasoning_completion(api_key, deadline=deadline, reasoning=reasoning, reasoning_effort=reasoning_effort,
+                                      max_reasoning_tokens=max_reasoning_tokens, messages=[
+            {"role": "system", "content": self.SYSTEM_MESSAGE},
+            {"role": "user", "content": enhancement_prompt}
+        ], **data)
+        
+        reasoning_info = dict(result.usage)
+        if reasoning != "hidden" and result.reasoning:
+            reasoning_info["reasoning"] = result.reasoning
+        if result.usage.get("reasoning_tokens"):
+            print(f"GroqArtPromptEnhancer: {result.usage['reasoning_tokens']} reasoning / {result.usage['answer_tokens']} answer tokens")
+        
+        # Clean up the response - remove any explanatory text, just return the prompt
+        return (result.answer.strip(), reasoning_info)
 
 # Node class mappings
 NODE_CLASS_MAPPINGS = {
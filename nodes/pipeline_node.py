@@ -0,0 +1,345 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List
+
+from .audio_processor_node import GroqMusicToArtPrompter
+from .document_analyzer_node import GroqStyleTransferPrompter
+from .llm_node import GroqArtPromptEnhancer
+from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, POLL_INTERVAL, TIMEOUT_INPUTS, check_interrupted, raise_if_interrupted
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.moderation import MODERATION_INPUTS, SafetyScreenError, screened
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.tracing import current_span, propagate, traced
+
+DEFAULT_VISION_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+
+# Parameters each stage type accepts, with their defaults
+STAGE_TYPES = {
+    "vision_caption": {
+        "instruction": "Create a detailed art prompt for Stable Diffusion based on this image. Include style, lighting, composition, colors, and artistic techniques.",
+        "system": "You are an expert art prompt engineer specializing in creating detailed prompts for AI art generation. Analyze images and create comprehensive Stable Diffusion prompts.",
+    },
+    "enhance": {
+        "enhancement_type": "quality_boost",
+        "target_model": "SDXL",
+        "prompt_length": "medium",
+        "creativity_level": "moderate",
+    },
+    "style_transfer": {
+        "art_medium": "digital_art",
+        "subject_matter": "portrait",
+        "prompt_strength": "moderate",
+    },
+    "negative_prompt": {
+        "art_medium": "digital_art",
+        "subject_matter": "portrait",
+    },
+    "music_to_art": {
+        "music_genre": "ambient",
+        "mood_intensity": "moderate",
+        "art_style": "abstract",
+    },
+    "mood_analysis": {
+        "music_genre": "ambient",
+    },
+    "custom": {
+        "system": "You are an expert AI art prompt engineer.",
+        "template": "{input}",
+    },
+}
+
+DEFAULT_STAGE_GRAPH = """[
+  {"name": "enhanced", "type": "enhance"},
+  {"name": "style", "type": "style_transfer", "input": "enhanced"},
+  {"name": "negative", "type": "negative_prompt", "input": "enhanced"}
+]"""
+
+MAX_PARALLEL_STAGES = 8
+
+def parse_stage_graph(text: str):
+    """Parse and validate a stage graph, returning (stages in dependency order, output stage name)
+
+    The graph is a JSON list of stages, or {"stages": [...], "output": name}.
+    Each stage has a unique name, a type from STAGE_TYPES, optional "input"
+    (a stage name, default: the pipeline input), optional "inputs" (extra
+    stage names usable as {name} in custom templates; one name may be given
+    as a string), and optional params, model, temperature and max_tokens.
+    """
+    data = json.loads(text)
+    output = None
+    if isinstance(data, dict):
+        output = data.get("output")
+        data = data.get("stages")
+    if not isinstance(data, list) or not data:
+        raise ValueError("Stage graph must be a non-empty list of stages")
+
+    stages = {}
+    for stage in data:
+        name = stage.get("name") if isinstance(stage, dict) else None
+        if not name or name in stages or name == "input":
+            raise ValueError(f"Every stage needs a unique name other than 'input' (got {name!r})")
+        if stage.get("type") not in STAGE_TYPES:
+            raise ValueError(f"Stage {name}: unknown type {stage.get('type')!r} (use one of {', '.join(STAGE_TYPES)})")
+        inputs = stage.get("inputs", [])
+        # A single stage name is a one-item list
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        if not isinstance(inputs, list) or not all(isinstance(dep, str) for dep in inputs):
+            raise ValueError(f"Stage {name}: \"inputs\" must be a list of stage names (got {stage['inputs']!r})")
+        if stage.get("input") and not isinstance(stage["input"], str):
+            raise ValueError(f"Stage {name}: \"input\" must be one stage name (got {stage['input']!r})")
+        depends = ([stage["input"]] if stage.get("input") else []) + inputs
+        stages[name] = dict(stage, depends_on=[dep for dep in depends if dep != "input"])
+
+    for name, stage in stages.items():
+        for dep in stage["depends_on"]:
+            if dep not in stages:
+                raise ValueError(f"Stage {name}: unknown input stage {dep!r}")
+
+    # Kahn's algorithm, also rejecting cycles
+    ordered, done = [], set()
+    while len(ordered) < len(stages):
+        ready = [name for name, stage in stages.items()
+                 if name not in done and all(dep in done for dep in stage["depends_on"])]
+        if not ready:
+            raise ValueError("Stage graph has a cycle")
+        for name in ready:
+            ordered.append(stages[name])
+            done.add(name)
+
+    output = output or data[-1]["name"]
+    if output not in stages:
+        raise ValueError(f"Output stage {output!r} does not exist")
+    return ordered, output
+
+class GroqPromptPipeline(GroqNode):
+    """GROQ Prompt Pipeline - Run a graph of prompt stages in one node, independent stages concurrently"""
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("final_output", "stage_outputs", "timings")
+    OUTPUT_TOOLTIPS = ("Output of the graph's output stage (the last stage unless set)",
+                       "Every stage output as a JSON object keyed by stage name",
+                       "Per-stage timing breakdown")
+    FUNCTION = "run_pipeline"
+    CATEGORY = "GroqPrompt/Art Generation"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        text_models = get_model_choices(ModelType.TEXT)
+
+        return {
+            "required": {
+                "api_key": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable."
+                }),
+                "model": ([AUTO_MODEL] + text_models, {
+                    "default": "llama-3.3-70b-versatile",
+                    "tooltip": "Model for every text stage that does not set its own"
+                }),
+                "input_text": ("STRING", {
+                    "multiline": True,
+                    "default": "a lighthouse on a cliff at dusk",
+                    "tooltip": "Pipeline input, passed to every stage without an input stage"
+                }),
+                "stage_graph": ("STRING", {
+                    "multiline": True,
+                    "default": DEFAULT_STAGE_GRAPH,
+                    "tooltip": "JSON list of stages: {name, type, input, inputs, params, model, temperature, max_tokens}. Types: " + ", ".join(STAGE_TYPES) + ". Stages whose inputs are ready run concurrently."
+                }),
+                "temperature": ("FLOAT", {
+                    "default": 0.7,
+                    "min": 0.0,
+                    "max": 2.0,
+                    "step": 0.1,
+                    "tooltip": "Default temperature for stages that do not set their own"
+                }),
+                "max_tokens": ("INT", {
+                    "default": 512,
+                    "min": 1,
+                    "max": 8192,
+                    "tooltip": "Default maximum tokens per stage"
+                }),
+            },
+            "optional": {
+                "image": ("IMAGE", {
+                    "tooltip": "Image for vision_caption stages"
+                }),
+                **MODERATION_INPUTS,
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
+            }
+        }
+
+    def __init__(self):
+        self.enhancer = GroqArtPromptEnhancer()
+        self.style = GroqStyleTransferPrompter()
+        self.music = GroqMusicToArtPrompter()
+
+    def build_messages(self, stage_type: str, params: Dict[str, Any], text: str, inputs: Dict[str, str], image_url: str = "") -> List[Dict[str, Any]]:
+        """Build a stage's messages with the same prompt builders the standalone nodes use"""
+        if stage_type == "vision_caption":
+            return [
+                {"role": "system", "content": params["system"]},
+                {"role": "user", "content": [
+                    {"type": "text", "text": params["instruction"] + (f"\n\nContext: {text}" if text else "")},
+                    {"type": "image_url", "image_url": {"url": image_url}},
+                ]},
+            ]
+        if stage_type == "enhance":
+            system = self.enhancer.SYSTEM_MESSAGE
+            prompt = self.enhancer.build_enhancement_prompt(text, params["enhancement_type"], params["target_model"],
+                                                            params["prompt_length"], params["creativity_level"])
+        elif stage_type == "style_transfer":
+            system = self.style.STYLE_SYSTEM_MESSAGE
+            prompt = self.style.build_style_prompt(text, params["art_medium"], params["subject_matter"], params["prompt_strength"])
+        elif stage_type == "negative_prompt":
+            system = self.style.NEGATIVE_SYSTEM_MESSAGE
+            prompt = self.style.build_negative_prompt(text, params["art_medium"], params["subject_matter"])
+        elif stage_type == "music_to_art":
+            system = self.music.ART_SYSTEM_MESSAGE
+            prompt = self.music.build_art_prompt(text, params["music_genre"], params["mood_intensity"], params["art_style"])
+        elif stage_type == "mood_analysis":
+            system = self.music.MOOD_SYSTEM_MESSAGE
+            prompt = self.music.build_mood_prompt(text, params["music_genre"])
+        else:
+            system = params["system"]
+            prompt = params["template"].format_map(dict(inputs, input=text))
+        return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+    @traced()
+    def run_stage(self, api_key, stage, text, inputs, defaults, image_url, deadline, router_settings):
+        """Run one stage on a pipeline worker thread, returning (output, timing info)"""
+        started = time.monotonic()
+        current_span().set_attributes(stage=stage["name"], stage_type=stage["type"])
+        params = dict(STAGE_TYPES[stage["type"]], **stage.get("params", {}))
+        max_tokens = stage.get("max_tokens", defaults["max_tokens"])
+        if stage["type"] == "vision_caption":
+            model = get_model_router().resolve(stage.get("model", DEFAULT_VISION_MODEL), max_tokens,
+                                               candidates=get_model_choices(ModelType.VISION), **router_settings)
+        else:
+            model = get_model_router().resolve(stage.get("model", defaults["model"]), max_tokens, **router_settings)
+
+        response = chat_completion(
+            api_key,
+            deadline=deadline,
+            model=model,
+            messages=self.build_messages(stage["type"], params, text, inputs, image_url),
+            temperature=stage.get("temperature", defaults["temperature"]),
+            max_tokens=max_tokens,
+        )
+        output = ""
+        if hasattr(response, 'choices') and len(response.choices) > 0:
+            output = (response.choices[0].message.content or "").strip()
+        usage = getattr(response, "usage", None)
+        return output, {"model": model, "seconds": time.monotonic() - started,
+                        "tokens": getattr(usage, "total_tokens", 0) or 0}
+
+    @traced()
+    def run_pipeline(self, api_key, model, input_text, stage_graph, temperature, max_tokens, image=None, safety_screen="off", **kwargs):
+        # Use provided API key, then the key pool, then the environment variable
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+
+        try:
+            stages, output_stage = parse_stage_graph(stage_graph)
+        except (ValueError, TypeError, AttributeError) as e:
+            return (f"Error: invalid stage graph - {str(e)}", "{}", "")
+
+        image_url = ""
+        if any(stage["type"] == "vision_caption" for stage in stages):
+            if image is None:
+                return ("Error: vision_caption stages need an image input", "{}", "")
+            image_url = f"data:image/png;base64,{self.encode_image(self.tensor_to_pil(image).convert('RGB'), 'PNG')}"
+
+        # One budget for the whole pipeline
+        deadline = Deadline.from_inputs(**kwargs)
+        router_settings = {name: kwargs[name] for name in ROUTER_INPUTS if name in kwargs}
+        defaults = {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+
+        try:
+            outputs, timings, wall = screened(
+                api_key, input_text, deadline,
+                lambda: self._run_stages(api_key, stages, input_text, defaults, image_url, deadline, router_settings),
+                safety_screen)
+        except SafetyScreenError as e:
+            print(f"GroqPromptPipeline: {str(e)}")
+            return (f"Error: {str(e)}", "{}", "")
+
+        ordered_outputs = {stage["name"]: outputs[stage["name"]] for stage in stages}
+        return (ordered_outputs[output_stage], json.dumps(ordered_outputs, indent=2, ensure_ascii=False),
+                self.format_timings(stages, timings, wall))
+
+    def _run_stages(self, api_key, stages, input_text, defaults, image_url, deadline, router_settings):
+        """Run the stage graph, returning (outputs, timings, wall seconds)"""
+        outputs: Dict[str, str] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        failed = set()
+        pending = {stage["name"]: stage for stage in stages}
+        running = {}
+        pipeline_started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_STAGES, thread_name_prefix="groq-pipeline") as executor:
+            while pending or running:
+                # Launch every stage whose inputs are ready; skip those downstream of a failure
+                for name, stage in list(pending.items()):
+                    if any(dep in failed for dep in stage["depends_on"]):
+                        del pending[name]
+                        failed.add(name)
+                        outputs[name] = f"Skipped: input stage {next(dep for dep in stage['depends_on'] if dep in failed)} failed"
+                        timings[name] = {"model": "", "start": 0.0, "seconds": 0.0, "tokens": 0, "status": "skipped"}
+                    elif all(dep in outputs for dep in stage["depends_on"]):
+                        del pending[name]
+                        text = outputs[stage["input"]] if stage.get("input") and stage["input"] != "input" else input_text
+                        inputs = {dep: outputs[dep] for dep in stage["depends_on"]}
+                        future = executor.submit(propagate(self.run_stage), api_key, stage, text, inputs, defaults, image_url, deadline, router_settings)
+                        running[future] = (name, time.monotonic() - pipeline_started)
+
+                done, _ = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                try:
+                    check_interrupted()
+                except BaseException:
+                    for future in running:
+                        future.cancel()
+                    raise
+                for future in done:
+                    name, start = running.pop(future)
+                    try:
+                        outputs[name], timing = future.result()
+                        timing["status"] = "ok"
+                    except Exception as e:
+                        raise_if_interrupted(e)
+                        failed.add(name)
+                        outputs[name] = f"Error: {str(e)}"
+                        timing = {"model": "", "seconds": time.monotonic() - pipeline_started - start, "tokens": 0, "status": "error"}
+                    timing["start"] = start
+                    timings[name] = timing
+
+        wall = time.monotonic() - pipeline_started
+        return outputs, timings, wall
+
+    def format_timings(self, stages, timings, wall: float) -> str:
+        """Render the per-stage breakdown as a fixed-width table"""
+        lines = [f"{'stage':<16} {'model':<34} {'start':>7} {'time':>7} {'tokens':>7}  status"]
+        for stage in stages:
+            timing = timings[stage["name"]]
+            lines.append(f"{stage['name'][:16]:<16} {timing['model'][:34]:<34} {timing['start']:>6.2f}s {timing['seconds']:>6.2f}s "
+                         f"{timing['tokens']:>7}  {timing['status']}")
+        serial = sum(timing["seconds"] for timing in timings.values())
+        lines.append(f"wall {wall:.2f}s, stages {serial:.2f}s serial ({serial / wall if wall else 1:.1f}x from concurrency)")
+        return "\n".join(lines)
+
+# Node class mappings
+NODE_CLASS_MAPPINGS = {
+    "GroqPromptPipeline": GroqPromptPipeline,
+}
+
+# Node display names
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "GroqPromptPipeline": "GROQ Prompt Pipeline",
+}
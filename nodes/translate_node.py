@@ -0,0 +1,247 @@
+import os
+import json
+import re
+from typing import Dict, List, Tuple
+
+from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.glossary import get_glossary
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.language_detect import UNDETERMINED, detect_language
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.structured_output import schema_instructions, structured_completion
+from .utils.tracing import span, traced
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "groq")
+TRANSLATE_PROMPT_FILES = [
+    os.path.join(PROMPTS_DIR, "DefaultPrompts_ALM_Translate.json"),
+    os.path.join(PROMPTS_DIR, "UserPrompts_ALM_Translate.json"),
+]
+DEFAULT_PRESET = "Translate the prompt to English using the style and guidance of [user_input]"
+
+# Phrases are split on commas, semicolons and newlines, including the CJK forms
+SEPARATOR_PATTERN = re.compile(r"(\s*(?:[,;，、；]|\n)\s*)")
+CJK_SEPARATORS = {"，": ", ", "、": ", ", "；": "; "}
+
+# Emphasis syntax stays outside the phrase: "(obra maestra:1.2)" -> "(", "obra maestra", ":1.2)"
+PHRASE_PATTERN = re.compile(r"^([\s(\[{]*)(.*?)((?::\s*-?[\d.]+)?[\s)\]}]*)$", re.DOTALL)
+
+class GroqPromptTranslator(GroqNode):
+    """GROQ Prompt Translator - Translate prompts to English, skipping the API for English text and known phrases"""
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("translated_prompt", "detected_language", "info")
+    FUNCTION = "translate_prompt"
+    CATEGORY = "GroqPrompt/Art Generation"
+
+    SYSTEM_MESSAGE = "You are a translator for image generation prompts. You translate short phrases into natural English prompt tags."
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        text_models = get_model_choices(ModelType.TEXT)
+        presets = list(cls.load_prompt_options(TRANSLATE_PROMPT_FILES)) or [DEFAULT_PRESET]
+
+        return {
+            "required": {
+                "api_key": ("STRING", {
+                    "default": "",
+                    "multiline": False,
+                    "tooltip": "Your GROQ API key. Leave empty to use GROQ_API_KEY environment variable. Not needed when the prompt is already English."
+                }),
+                "prompt": ("STRING", {
+                    "multiline": True,
+                    "default": "",
+                    "tooltip": "Prompt in any language"
+                }),
+                "model": ([AUTO_MODEL] + text_models, {
+                    "default": "llama-3.1-8b-instant",
+                    "tooltip": "Model used for phrases that are not in the glossary. A small fast model is enough for tag translation."
+                }),
+                "preset": (presets, {
+                    "default": DEFAULT_PRESET if DEFAULT_PRESET in presets else presets[0],
+                    "tooltip": "Translation instructions from DefaultPrompts_ALM_Translate.json / UserPrompts_ALM_Translate.json"
+                }),
+            },
+            "optional": {
+                "guidance": ("STRING", {
+                    "multiline": False,
+                    "default": "",
+                    "tooltip": "Style and guidance filled into the preset's [user_input]"
+                }),
+                "use_glossary": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Reuse earlier translations of the same phrase (e.g. 'obra maestra') from the persistent glossary and store new ones"
+                }),
+                "min_confidence": ("FLOAT", {
+                    "default": 0.7,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.05,
+                    "tooltip": "Prompts are only translated when detected as a non-English language with at least this confidence. Detection runs locally."
+                }),
+                "max_tokens": ("INT", {
+                    "default": 1024,
+                    "min": 64,
+                    "max": 8192,
+                    "step": 1,
+                    "tooltip": "Maximum number of tokens for the translation"
+                }),
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
+            }
+        }
+
+    @staticmethod
+    def split_phrases(prompt: str) -> Tuple[List[str], List[str]]:
+        """Split a prompt into phrases and the separators between them (len(separators) == len(phrases) - 1)"""
+        parts = SEPARATOR_PATTERN.split(prompt)
+        return parts[0::2], parts[1::2]
+
+    @staticmethod
+    def join_phrases(phrases: List[str], separators: List[str]) -> str:
+        result = phrases[0]
+        for separator, phrase in zip(separators, phrases[1:]):
+            for cjk, latin in CJK_SEPARATORS.items():
+                separator = separator.replace(cjk, latin)
+            result += separator + phrase
+        return result
+
+    def build_instructions(self, preset: str, guidance: str) -> str:
+        """System instructions from the preset, with guidance filled into [user_input]"""
+        instructions = self.get_prompt_content(preset, self.load_prompt_options(TRANSLATE_PROMPT_FILES)) or self.SYSTEM_MESSAGE
+        guidance = guidance.strip()
+        if "[user_input]" in instructions:
+            return instructions.replace("[user_input]", guidance or "a faithful literal translation")
+        if guidance:
+            instructions += f"\n\nStyle and guidance: {guidance}"
+        return instructions
+
+    def translations_schema(self, count: int):
+        return {
+            "type": "object",
+            "properties": {
+                "translations": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": count,
+                    "description": f"Exactly {count} English translations, in the same order as the phrases",
+                },
+            },
+            "required": ["translations"],
+            "additionalProperties": False,
+        }
+
+    @traced()
+    def translate_prompt(self, api_key, prompt, model, preset, guidance="", use_glossary=True,
+                         min_confidence=0.7, max_tokens=1024, **kwargs):
+        language, confidence = detect_language(prompt)
+        info = {"language": language, "confidence": confidence, "phrases": 0, "kept": 0,
+                "glossary_hits": 0, "translated": 0, "api_calls": 0}
+
+        # Fast path: English (or too uncertain to tell) prompts never reach the API
+        if language in ("en", UNDETERMINED) or confidence < min_confidence:
+            return (prompt, language, json.dumps(dict(info, skipped=True)))
+
+        try:
+            phrases, separators = self.split_phrases(prompt)
+            glossary = get_glossary("en")
+            translations: Dict[str, str] = {}
+            pending: List[str] = []
+            cores = []
+            for phrase in phrases:
+                prefix, core, suffix = PHRASE_PATTERN.match(phrase).groups()
+                cores.append((prefix, core, suffix))
+                if not core or core in translations or core in pending:
+                    continue
+                info["phrases"] += 1
+                cached = glossary.lookup(language, core) if use_glossary else None
+                if cached is not None:
+                    translations[core] = cached
+                    info["glossary_hits"] += 1
+                # English tags mixed into a foreign prompt are kept as they are
+                elif detect_language(core)[0] in ("en", UNDETERMINED):
+                    translations[core] = core
+                    info["kept"] += 1
+                else:
+                    pending.append(core)
+
+            if pending:
+                translated = self._request_translations(api_key, model, pending, language, preset, guidance, max_tokens, kwargs)
+                info["api_calls"] = 1
+                if translated is None:
+                    # Phrase-by-phrase output was unusable: fall back to translating the prompt as a whole
+                    whole = self._request_whole(api_key, model, prompt, language, preset, guidance, max_tokens, kwargs)
+                    info["api_calls"] = 2
+                    info["translated"] = len(pending)
+                    return (whole, language, json.dumps(info))
+                translations.update(translated)
+                info["translated"] = len(translated)
+                if use_glossary:
+                    glossary.add_many(language, translated)
+
+            result = self.join_phrases([prefix + translations.get(core, core) + suffix for prefix, core, suffix in cores], separators)
+            print(f"GroqPromptTranslator: {language} ({confidence:.2f}), {info['phrases']} phrases, "
+                  f"{info['glossary_hits']} from glossary, {info['kept']} kept, {info['translated']} translated")
+            return (result, language, json.dumps(info))
+
+        except Exception as e:
+            raise_if_interrupted(e)
+            return (f"Error: {str(e)}", language, json.dumps(info))
+
+    def _resolve(self, api_key, model, max_tokens, kwargs):
+        api_key = resolve_api_key(api_key)
+        if not api_key:
+            raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+        return api_key, get_model_router().resolve(model, max_tokens, **kwargs), Deadline.from_inputs(**kwargs)
+
+    def _request_translations(self, api_key, model, phrases, language, preset, guidance, max_tokens, kwargs):
+        """Translate phrases in one structured request, returning {phrase: translation} or None"""
+        api_key, model, deadline = self._resolve(api_key, model, max_tokens, kwargs)
+        schema = self.translations_schema(len(phrases))
+        with span("translate.phrases", language=language, phrases=len(phrases)):
+            result = structured_completion(
+                api_key,
+                "prompt_translation",
+                schema,
+                deadline=deadline,
+                model=model,
+                temperature=0.2,
+                max_tokens=max_tokens,
+                messages=[
+                    {"role": "system", "content": self.build_instructions(preset, guidance)},
+                    {"role": "user", "content": f"""Translate each of these {len(phrases)} phrases from language code '{language}' to English:
+
+{json.dumps(phrases, ensure_ascii=False, indent=1)}
+
+{schema_instructions(schema)}"""}
+                ],
+            )
+        if result is None:
+            return None
+        translations = [text.strip() for text in result["translations"]]
+        if len(translations) != len(phrases) or not all(translations):
+            print(f"GroqPromptTranslator: expected {len(phrases)} translations, model returned {len(translations)}")
+            return None
+        return dict(zip(phrases, translations))
+
+    def _request_whole(self, api_key, model, prompt, language, preset, guidance, max_tokens, kwargs):
+        api_key, model, deadline = self._resolve(api_key, model, max_tokens, kwargs)
+        response = chat_completion(api_key, deadline=deadline, model=model, temperature=0.2, max_tokens=max_tokens, messages=[
+            {"role": "system", "content": self.build_instructions(preset, guidance)},
+            {"role": "user", "content": f"Translate this prompt from language code '{language}' to English. Keep the comma-separated structure and return only the translation.\n\n{prompt}"}
+        ])
+        if hasattr(response, 'choices') and len(response.choices) > 0:
+            return (response.choices[0].message.content or "").strip()
+        return "No response generated"
+
+# Node class mappings
+NODE_CLASS_MAPPINGS = {
+    "GroqPromptTranslator": GroqPromptTranslator,
+}
+
+# Node display names
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "GroqPromptTranslator": "GROQ Prompt Translator",
+}
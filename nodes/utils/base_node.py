@@ -8,7 +8,9 @@ from dataclasses import dataclass
 from groq import Groq, GroqError
 from PIL import Image, ImageEnhance, ImageOps
 import torch
-import numpy as np
+
+from .image_convert import preprocess_to_pil_list, to_bhwc, tensor_to_pil_list
+from .tracing import span
 
 # Constants
 DEFAULT_API_KEY = os.getenv('GROQ_API_KEY', '')
@@ -17,6 +19,16 @@ DEFAULT_TEMPERATURE = 0.7
 DEFAULT_TOP_P = 0.9
 DEFAULT_MAX_TOKENS = 1024
 
+# Persistent caches (semantic cache, glossaries, model stats) live here
+CACHE_DIR = os.getenv('GROQ_PROMPT_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'cache'))
+
+# Where a preset's content takes its "examples" list
+EXAMPLES_MARKER = "[examples]"
+
+def expand_examples(content: str, examples: List[str]) -> str:
+    """Fill a preset's [examples] marker"""
+    return content.replace(EXAMPLES_MARKER, "\n".join(examples))
+
 class ModelType(Enum):
     TEXT = "text"
     VISION = "vision"
@@ -147,10 +159,9 @@ def get_model_descriptions() -> Dict[str, str]:
 
 def process_image(image_tensor, crop_region=None, resize_dims=None, enhance=False):
     """Process image tensor with optional cropping, resizing, and enhancement"""
-    # Convert tensor to PIL Image
+    # Tensors are processed in the tensor domain; only the result becomes a PIL Image
     if isinstance(image_tensor, torch.Tensor):
-        image = 255.0 * image_tensor.cpu().numpy()
-        image = Image.fromarray(np.clip(image, 0, 255).astype(np.uint8))
+        return process_image_batch(to_bhwc(image_tensor)[:1], crop_region, resize_dims, enhance)[0]
     elif isinstance(image_tensor, Image.Image):
         image = image_tensor
     else:
@@ -158,7 +169,8 @@ def process_image(image_tensor, crop_region=None, resize_dims=None, enhance=Fals
     
     # Convert to RGB if needed
     if image.mode != 'RGB':
-        image = image.convert('RGB')
+        with span("image.convert_rgb", mode=image.mode):
+            image = image.convert('RGB')
     
     # Apply cropping if specified
     if crop_region and isinstance(crop_region, (tuple, list)) and len(crop_region) == 4:
@@ -168,65 +180,84 @@ def process_image(image_tensor, crop_region=None, resize_dims=None, enhance=Fals
         top = max(0, min(top, height - 1))
         right = max(left + 1, min(right, width))
         bottom = max(top + 1, min(bottom, height))
-        image = image.crop((left, top, right, bottom))
+        with span("image.crop"):
+            image = image.crop((left, top, right, bottom))
     
     # Apply resizing if specified
     if resize_dims and isinstance(resize_dims, (tuple, list)) and len(resize_dims) == 2:
-        image = image.resize(resize_dims, Image.LANCZOS)
+        with span("image.resize", size=f"{resize_dims[0]}x{resize_dims[1]}"):
+            image = image.resize(resize_dims, Image.LANCZOS)
     
     # Apply enhancement if requested
     if enhance:
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.2)
-        
-        # Enhance sharpness
-        enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.1)
+        with span("image.enhance"):
+            # Enhance contrast
+            enhancer = ImageEnhance.Contrast(image)
+            image = enhancer.enhance(1.2)
+            
+            # Enhance sharpness
+            enhancer = ImageEnhance.Sharpness(image)
+            image = enhancer.enhance(1.1)
     
     return image
 
+def process_image_batch(image_tensor, crop_region=None, resize_dims=None, enhance=False):
+    """Crop, resize and enhance every image of a tensor batch, returning RGB PIL Images
+
+    Cropping, antialiased downsampling and contrast/sharpness run on the
+    whole batch as tensor ops; PIL is only used to wrap the final pixels.
+    """
+    with span("image.preprocess_batch", shape=str(tuple(image_tensor.shape)), crop=bool(crop_region),
+              resize=str(resize_dims) if resize_dims else None, enhance=bool(enhance)):
+        return preprocess_to_pil_list(image_tensor, crop_region, resize_dims, enhance)
+
 class GroqNode:
     """Base class for GROQ nodes with common functionality"""
     
     @classmethod
-    def load_prompt_options(cls, prompt_files):
-        """Load prompt options from JSON files"""
-        prompt_options = {}
+    def load_prompt_presets(cls, prompt_files):
+        """Load presets from JSON files as {name: {"content": ..., "examples": [...]}}"""
+        presets = {}
         for file_path in prompt_files:
             try:
                 if os.path.exists(file_path):
                     with open(file_path, 'r', encoding='utf-8') as f:
                         data = json.load(f)
                         if isinstance(data, dict):
-                            prompt_options.update(data)
+                            presets.update((name, {"content": content, "examples": []}) for name, content in data.items())
+                        elif isinstance(data, list):
+                            # Preset files are lists of {"name": ..., "content": ..., "examples": [...]}
+                            presets.update((item["name"], {"content": item.get("content", ""), "examples": item.get("examples", [])})
+                                           for item in data if isinstance(item, dict) and "name" in item)
             except Exception as e:
                 print(f"Error loading prompt file {file_path}: {str(e)}")
-        return prompt_options
+        return presets
+
+    @classmethod
+    def load_prompt_options(cls, prompt_files):
+        """Load prompt options from JSON files, with every example filled into its preset"""
+        return {name: expand_examples(preset["content"], preset["examples"])
+                for name, preset in cls.load_prompt_presets(prompt_files).items()}
     
     def get_prompt_content(self, prompt_name, prompt_options):
         """Get content for a specific prompt name"""
         return prompt_options.get(prompt_name, "")
     
     def tensor_to_pil(self, image_tensor):
-        """Convert a PyTorch tensor to a PIL Image"""
-        if image_tensor.dim() == 4:  # Batch of images
-            image_tensor = image_tensor[0]  # Take first image in batch
-        
-        # Convert from CHW to HWC and denormalize if needed
-        if image_tensor.shape[0] <= 4:  # CHW format
-            image_tensor = image_tensor.permute(1, 2, 0)
-        
-        # If the image is in [0, 1] range, scale to [0, 255]
-        if image_tensor.max() <= 1.0:
-            image_tensor = image_tensor * 255.0
-        
-        # Convert to numpy and ensure it's uint8
-        image_np = image_tensor.cpu().numpy().astype(np.uint8)
-        return Image.fromarray(image_np)
+        """Convert a PyTorch tensor to a PIL Image (first image of a batch)"""
+        with span("image.tensor_to_pil", shape=str(tuple(image_tensor.shape))):
+            return tensor_to_pil_list(to_bhwc(image_tensor)[:1])[0]
+    
+    def tensor_to_pil_batch(self, image_tensor):
+        """Convert every image in a PyTorch tensor batch to PIL Images"""
+        with span("image.tensor_to_pil_batch", shape=str(tuple(image_tensor.shape))):
+            return tensor_to_pil_list(image_tensor)
     
-    def encode_image(self, image_pil):
+    def encode_image(self, image_pil, format="JPEG"):
         """Encode PIL Image to base64"""
         buffered = BytesIO()
-        image_pil.save(buffered, format="JPEG")
-        return base64.b64encode(buffered.getvalue()).decode('utf-8')
+        with span(f"image.{format.lower()}_encode", size=f"{image_pil.width}x{image_pil.height}") as encode_span:
+            image_pil.save(buffered, format=format)
+            encode_span.set_attribute("bytes", buffered.tell())
+        with span("image.base64"):
+            return base64.b64encode(buffered.getvalue()).decode('utf-8')
@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .base_node import CACHE_DIR
+
+# GROQ_CASSETTE_MODE: off, record or replay
+# GROQ_CASSETTE_PATH: cassette file (gzip-compressed JSON lines)
+# GROQ_CASSETTE_TIMING: replay speed, 0 = instant, 1 = original timing, 0.5 = twice as fast
+CASSETTE_MODES = ("off", "record", "replay")
+DEFAULT_CASSETTE_PATH = os.path.join(CACHE_DIR, "cassettes", "groq.jsonl.gz")
+
+# Response headers never written to a cassette
+DROPPED_HEADERS = {"set-cookie", "cf-ray", "date"}
+
+def request_hash(request: httpx.Request) -> str:
+    """Canonical hash of a request: method, path, query and key-sorted JSON body
+
+    Headers (and so API keys) are not part of the hash, so recordings replay
+    under any key.
+    """
+    body = request.content or b""
+    try:
+        body = json.loads(body) if body else None
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        body = body.decode("latin-1")
+    canonical = json.dumps({
+        "method": request.method,
+        "path": request.url.path,
+        "query": sorted(request.url.params.multi_items()),
+        "body": body,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Pass response chunks through while timing them, then write the interaction"""
+
+    def __init__(self, stream, cassette, interaction, started):
+        self._stream = stream
+        self._cassette = cassette
+        self._interaction = interaction
+        self._started = started
+        self._written = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            # latin-1 maps bytes 1:1 to code points, so raw (possibly compressed) bytes survive JSON
+            self._interaction["chunks"].append([round(time.monotonic() - self._started, 4), chunk.decode("latin-1")])
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._written:
+                self._written = True
+                self._cassette.write(self._interaction)
+
+class _ReplayStream(httpx.SyncByteStream):
+    """Yield recorded chunks, optionally sleeping to reproduce their timing"""
+
+    def __init__(self, chunks, timing_scale):
+        self._chunks = chunks
+        self._timing_scale = timing_scale
+
+    def __iter__(self):
+        started = time.monotonic()
+        for offset, data in self._chunks:
+            if self._timing_scale > 0:
+                delay = offset * self._timing_scale - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            yield data
+
+class Cassette:
+    """Recorded GROQ traffic, indexed by canonical request hash"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, List[dict]]] = None
+        self._served: Dict[str, int] = {}
+
+    def write(self, interaction: dict):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Each append is its own gzip member; readers see one continuous stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+            if self._index is not None:
+                self._index.setdefault(interaction["hash"], []).append(self._prepare(interaction))
+
+    @staticmethod
+    def _prepare(interaction: dict) -> dict:
+        interaction["chunks"] = [(offset, data.encode("latin-1")) for offset, data in interaction["chunks"]]
+        return interaction
+
+    def load(self) -> Dict[str, List[dict]]:
+        """Read and index the cassette once; later lookups are dictionary hits"""
+        with self._lock:
+            if self._index is None:
+                index = {}
+                if os.path.exists(self.path):
+                    with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                        for line in f:
+                            if line.strip():
+                                interaction = self._prepare(json.loads(line))
+                                index.setdefault(interaction["hash"], []).append(interaction)
+                self._index = index
+            return self._index
+
+    def next_interaction(self, digest: str) -> Optional[dict]:
+        """Recordings of the same request are served in recorded order, then cycled"""
+        recordings = self.load().get(digest)
+        if not recordings:
+            return None
+        with self._lock:
+            served = self._served.get(digest, 0)
+            self._served[digest] = served + 1
+        return recordings[served % len(recordings)]
+
+    def __len__(self):
+        return sum(len(recordings) for recordings in self.load().values())
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records real traffic to, or replays it from, a cassette"""
+
+    def __init__(self, cassette: Cassette, mode: str, timing_scale: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.cassette = cassette
+        self.mode = mode
+        self.timing_scale = timing_scale
+        self._transport = httpx.HTTPTransport() if mode == "record" else None
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        digest = request_hash(request)
+        if self.mode == "replay":
+            interaction = self.cassette.next_interaction(digest)
+            if interaction is None:
+                return httpx.Response(404, json={"error": {
+                    "message": f"No cassette recording for request {digest[:12]} in {self.cassette.path}",
+                    "type": "cassette_miss",
+                }}, request=request)
+            return httpx.Response(
+                interaction["status"],
+                headers=interaction["headers"],
+                stream=_ReplayStream(interaction["chunks"], self.timing_scale),
+                request=request,
+            )
+
+        started = time.monotonic()
+        response = self._transport.handle_request(request)
+        interaction = {
+            "hash": digest,
+            "method": request.method,
+            "path": request.url.path,
+            "recorded_at": time.time(),
+            "status": response.status_code,
+            "headers": [[name, value] for name, value in response.headers.multi_items()
+                        if name.lower() not in DROPPED_HEADERS],
+            "chunks": [],
+        }
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, self.cassette, interaction, started),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+_settings = {
+    "mode": os.getenv("GROQ_CASSETTE_MODE", "off").lower(),
+    "path": os.getenv("GROQ_CASSETTE_PATH", DEFAULT_CASSETTE_PATH),
+    "timing_scale": float(os.getenv("GROQ_CASSETTE_TIMING", "0") or 0),
+}
+
+def configure(mode: str = "off", path: str = "", timing_scale: float = 0.0):
+    """Set the process-wide cassette mode (use groq_client.use_cassette so clients are rebuilt)"""
+    mode = (mode or "off").lower()
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"Cassette mode must be one of {', '.join(CASSETTE_MODES)}")
+    _settings.update(mode=mode, path=path or DEFAULT_CASSETTE_PATH, timing_scale=timing_scale)
+
+def get_cassette(path: str) -> Cassette:
+    """Get the shared Cassette for a file so recordings and replay counters are per file"""
+    path = os.path.abspath(path)
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+def cassette_transport() -> Optional[CassetteTransport]:
+    """Transport for the configured mode, or None when recording/replay is off"""
+    if _settings["mode"] == "off":
+        return None
+    return CassetteTransport(get_cassette(_settings["path"]), _settings["mode"], _settings["timing_scale"])
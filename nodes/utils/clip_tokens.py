@@ -0,0 +1,131 @@
+import gzip
+import html
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# CLIP's BPE merges (openai/CLIP bpe_simple_vocab_16e6, first 48894 merges),
+# the vocabulary used by the SD1.5 and SDXL text encoders
+MERGES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "groq", "clip_bpe_merges.txt.gz")
+
+# 77-token context minus the start and end tokens
+CLIP_WINDOWS = {
+    "SD1.5": 75,
+    "SDXL": 75,
+}
+
+# CLIP's pre-tokenizer, with \p{L}/\p{N} spelled in stdlib re
+TOKEN_PATTERN = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|(?:[^\s\w]|_)+""", re.IGNORECASE)
+
+def _bytes_to_unicode() -> Dict[int, str]:
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    codes = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            codes.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, (chr(code) for code in codes)))
+
+BYTE_ENCODER = _bytes_to_unicode()
+
+_ranks = None
+_ranks_lock = threading.Lock()
+
+def _merge_ranks() -> Dict[Tuple[str, str], int]:
+    global _ranks
+    with _ranks_lock:
+        if _ranks is None:
+            with gzip.open(MERGES_PATH, "rt", encoding="utf-8") as f:
+                lines = f.read().split("\n")[1:]
+            _ranks = {tuple(line.split()): rank for rank, line in enumerate(lines) if line}
+        return _ranks
+
+@lru_cache(maxsize=65536)
+def _bpe_length(token: str) -> int:
+    """Number of BPE pieces for one pre-tokenized word"""
+    ranks = _merge_ranks()
+    word = tuple(token[:-1]) + (token[-1] + "</w>",)
+    while len(word) > 1:
+        pairs = {(word[i], word[i + 1]) for i in range(len(word) - 1)}
+        bigram = min(pairs, key=lambda pair: ranks.get(pair, float("inf")))
+        if bigram not in ranks:
+            break
+        first, second = bigram
+        merged = []
+        i = 0
+        while i < len(word):
+            if i < len(word) - 1 and word[i] == first and word[i + 1] == second:
+                merged.append(first + second)
+                i += 2
+            else:
+                merged.append(word[i])
+                i += 1
+        word = tuple(merged)
+    return len(word)
+
+def count_clip_tokens(text: str) -> int:
+    """Count CLIP tokens in text, excluding the start/end tokens"""
+    text = " ".join(html.unescape(text).split()).lower()
+    total = 0
+    for token in TOKEN_PATTERN.findall(text):
+        total += _bpe_length("".join(BYTE_ENCODER[b] for b in token.encode("utf-8")))
+    return total
+
+def split_keywords(prompt: str) -> List[str]:
+    """Split a prompt into comma/line/sentence separated keywords"""
+    parts = re.split(r"[,;\n]|\.(?:\s|$)", prompt)
+    return [part.strip(" .\t\"'") for part in parts if part.strip(" .\t\"'")]
+
+def _words(keyword: str) -> frozenset:
+    return frozenset(re.findall(r"[^\W_]+", keyword.lower()))
+
+def compact_prompt(prompt: str, token_budget: int, base_prompt: str = "") -> str:
+    """Deduplicate, rank and pack comma-separated keywords into a CLIP token budget
+
+    Keywords are ranked by position (CLIP weights early tokens more) with a
+    boost for keywords that keep words of the user's base prompt. The kept
+    keywords are emitted in their original order. Deterministic for a given input.
+    """
+    if count_clip_tokens(prompt) <= token_budget:
+        return prompt.strip()
+
+    # Drop exact duplicates and keywords whose words are all covered by an earlier keyword
+    keywords = []
+    seen = []
+    for keyword in split_keywords(prompt):
+        words = _words(keyword)
+        if not words or any(words <= other for other in seen):
+            continue
+        keywords.append(keyword)
+        seen.append(words)
+
+    base_words = _words(base_prompt)
+    scored = []
+    for position, keyword in enumerate(keywords):
+        score = 1.0 / (1 + position)
+        if base_words and _words(keyword) & base_words:
+            score += 1.0
+        scored.append((-score, position, keyword))
+    scored.sort()
+
+    kept = []
+    used = 0
+    for _, position, keyword in scored:
+        # Each keyword after the first also costs one token for its comma
+        cost = count_clip_tokens(keyword) + (1 if kept else 0)
+        if used + cost <= token_budget:
+            kept.append((position, keyword))
+            used += cost
+
+    if not kept and keywords:
+        # A single keyword longer than the window: keep as many words as fit
+        words = keywords[0].split()
+        while words and count_clip_tokens(" ".join(words)) > token_budget:
+            words.pop()
+        return " ".join(words)
+
+    return ", ".join(keyword for _, keyword in sorted(kept))
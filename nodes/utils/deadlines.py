@@ -0,0 +1,94 @@
+import time
+
+import httpx
+
+try:
+    import comfy.model_management as model_management
+except ImportError:
+    # Running outside ComfyUI (scripts, CLI): there is no interrupt flag
+    model_management = None
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 120.0
+DEFAULT_TOTAL_TIMEOUT = 300.0
+
+# How often a waiting request checks ComfyUI's interrupt flag and its deadline
+POLL_INTERVAL = 0.1
+
+# Optional inputs shared by every node that calls the API
+TIMEOUT_INPUTS = {
+    "connect_timeout": ("FLOAT", {
+        "default": DEFAULT_CONNECT_TIMEOUT,
+        "min": 1.0,
+        "max": 120.0,
+        "step": 0.5,
+        "tooltip": "Seconds to wait for a connection to the GROQ API"
+    }),
+    "read_timeout": ("FLOAT", {
+        "default": DEFAULT_READ_TIMEOUT,
+        "min": 1.0,
+        "max": 600.0,
+        "step": 1.0,
+        "tooltip": "Seconds to wait for the API to respond to a single request"
+    }),
+    "total_timeout": ("FLOAT", {
+        "default": DEFAULT_TOTAL_TIMEOUT,
+        "min": 1.0,
+        "max": 3600.0,
+        "step": 1.0,
+        "tooltip": "Deadline for the whole node run, shared by all of its API calls"
+    }),
+}
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a node's total deadline runs out"""
+
+class Deadline:
+    """Time budget (and scheduling lane) shared across the sub-calls of one node execution"""
+
+    def __init__(self, total: float = DEFAULT_TOTAL_TIMEOUT, connect: float = DEFAULT_CONNECT_TIMEOUT, read: float = DEFAULT_READ_TIMEOUT,
+                 priority: str = "normal"):
+        self.total = total
+        self.connect = connect
+        self.read = read
+        self.priority = priority
+        self.expires_at = time.monotonic() + total
+        self.cancelled = None
+
+    @classmethod
+    def from_inputs(cls, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT, total_timeout=DEFAULT_TOTAL_TIMEOUT,
+                    priority="normal", **kwargs):
+        """Build a deadline from a node's TIMEOUT_INPUTS and SCHEDULER_INPUTS values"""
+        return cls(total=total_timeout, connect=connect_timeout, read=read_timeout, priority=priority)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def cancel(self, error: Exception):
+        """Abort the node run from another thread: every later check() raises error"""
+        self.cancelled = error
+
+    def check(self):
+        """Raise DeadlineExceeded if the budget is used up, or the error the run was cancelled with"""
+        if self.cancelled is not None:
+            raise self.cancelled
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.total:g}s exceeded")
+
+    def request_timeout(self) -> httpx.Timeout:
+        """Per-request timeout that never outlives the remaining budget"""
+        remaining = max(self.remaining(), 0.1)
+        return httpx.Timeout(min(self.read, remaining), connect=min(self.connect, remaining))
+
+def check_interrupted():
+    """Raise ComfyUI's interrupt exception if the user pressed Cancel"""
+    if model_management is not None:
+        model_management.throw_exception_if_processing_interrupted()
+
+def raise_if_interrupted(error: Exception):
+    """Re-raise a ComfyUI interrupt that a node's generic error handler caught"""
+    if model_management is not None and isinstance(error, model_management.InterruptProcessingException):
+        raise error
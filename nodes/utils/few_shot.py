@@ -0,0 +1,77 @@
+import hashlib
+import math
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .base_node import EXAMPLES_MARKER, expand_examples
+from .shared_state import CHARS_PER_TOKEN
+from .text_vectors import embed_text, embed_texts
+
+# Examples this similar to one already picked add tokens but no new guidance
+DUPLICATE_SIMILARITY = 0.9
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class FewShotIndex:
+    """Example library of one preset with embeddings computed once up front"""
+
+    def __init__(self, examples: List[str]):
+        self.examples = list(examples)
+        self.vectors = embed_texts(self.examples)
+        self.tokens = np.array([estimate_tokens(example) for example in self.examples])
+
+    def select(self, query: str, k: int = 3, token_budget: int = 0) -> List[str]:
+        """Top-k examples by similarity to query that fit token_budget (0 = no budget), in library order
+
+        One matrix-vector product scores the whole library. Near-duplicates
+        of an example already picked are skipped.
+        """
+        if not self.examples or k <= 0:
+            return []
+        scores = self.vectors @ embed_text(query)
+        chosen: List[int] = []
+        used = 0
+        for index in np.argsort(-scores, kind="stable"):
+            if len(chosen) >= k:
+                break
+            if token_budget and used + self.tokens[index] > token_budget:
+                continue
+            if chosen and float(np.max(self.vectors[chosen] @ self.vectors[index])) >= DUPLICATE_SIMILARITY:
+                continue
+            chosen.append(int(index))
+            used += int(self.tokens[index])
+        return [self.examples[index] for index in sorted(chosen)]
+
+_indexes: Dict[Tuple[str, str], FewShotIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_few_shot_index(name: str, examples: List[str]) -> FewShotIndex:
+    """Index for a preset's examples, built once per library version"""
+    digest = hashlib.sha1("\0".join(examples).encode("utf-8")).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get((name, digest))
+        if index is None:
+            index = FewShotIndex(examples)
+            _indexes[(name, digest)] = index
+        return index
+
+def render_preset(name: str, preset: Dict, query: str, k: int = 3, token_budget: int = 0) -> Tuple[str, Dict[str, int]]:
+    """Preset content with only the examples most relevant to query, and selection stats
+
+    k = 0 keeps the whole library (the preset as written).
+    """
+    content = preset.get("content", "")
+    examples = preset.get("examples") or []
+    if not examples or EXAMPLES_MARKER not in content:
+        return content, {"examples": 0, "library": len(examples), "example_tokens": 0, "library_tokens": 0}
+    selected = examples if k <= 0 else get_few_shot_index(name, examples).select(query, k, token_budget)
+    stats = {
+        "examples": len(selected),
+        "library": len(examples),
+        "example_tokens": sum(estimate_tokens(example) for example in selected),
+        "library_tokens": sum(estimate_tokens(example) for example in examples),
+    }
+    return expand_examples(content, selected), stats
@@ -0,0 +1,83 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from .base_node import CACHE_DIR
+from .jsonl import read_jsonl
+
+# Longer phrases are one-off sentences that will not recur; caching them only grows the file
+MAX_GLOSSARY_WORDS = 8
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_phrase(phrase: str) -> str:
+    return _WHITESPACE.sub(" ", phrase.strip().lower())
+
+class TranslationGlossary:
+    """Persistent phrase -> translation cache for one target language
+
+    <target>.jsonl holds one entry per line (source language, phrase,
+    translation) and is append-only; a later entry for the same phrase wins.
+    """
+
+    def __init__(self, target_language: str = "en", cache_dir: str = None):
+        self.target_language = target_language
+        self.cache_dir = os.path.join(cache_dir or CACHE_DIR, "glossary")
+        self.path = os.path.join(self.cache_dir, f"{target_language}.jsonl")
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[Tuple[str, str], str]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = {}
+        for entry in read_jsonl(self.path):
+            if isinstance(entry, dict) and {"source", "phrase", "translation"} <= entry.keys():
+                entries[(entry["source"], entry["phrase"])] = entry["translation"]
+        self._entries = entries
+
+    def lookup(self, source_language: str, phrase: str) -> Optional[str]:
+        key = (source_language, normalize_phrase(phrase))
+        with self._lock:
+            self._load()
+            translation = self._entries.get(key)
+            if translation is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return translation
+
+    def add_many(self, source_language: str, translations: Dict[str, str]):
+        """Store phrase -> translation pairs, skipping ones already known or too long to recur"""
+        with self._lock:
+            self._load()
+            lines = []
+            for phrase, translation in translations.items():
+                key = (source_language, normalize_phrase(phrase))
+                if not key[1] or len(key[1].split()) > MAX_GLOSSARY_WORDS or self._entries.get(key) == translation:
+                    continue
+                self._entries[key] = translation
+                lines.append(json.dumps({"source": key[0], "phrase": key[1], "translation": translation}, ensure_ascii=False))
+            if lines:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._load()
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+_glossaries: Dict[str, TranslationGlossary] = {}
+_glossaries_lock = threading.Lock()
+
+def get_glossary(target_language: str = "en") -> TranslationGlossary:
+    """Get the process-wide glossary for a target language"""
+    with _glossaries_lock:
+        if target_language not in _glossaries:
+            _glossaries[target_language] = TranslationGlossary(target_language)
+        return _glossaries[target_language]
@@ -0,0 +1,309 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional
+
+from groq import Groq, APIStatusError, DefaultHttpxClient
+from groq.types.chat import ChatCompletion
+
+from . import cassette
+from .deadlines import Deadline, POLL_INTERVAL, check_interrupted
+from .key_pool import get_key_pool
+from .model_router import get_model_router
+from .reasoning import (REASONING_MODELS, THINK_CLOSE, THINK_OPEN, ReasoningFilter, ReasoningResult,
+                        apply_reasoning_defaults, is_reasoning_model, merge_usage, reasoning_params,
+                        reasoning_usage, split_reasoning)
+from .scheduler import MAX_CONCURRENCY, get_scheduler
+from .shared_state import CHARS_PER_TOKEN, estimate_tokens, get_shared_state, request_cache_key
+from .tracing import propagate, span, tracing_enabled
+
+# Sentinel api_key value meaning "route through the key pool"
+POOL_KEY = "@groq-key-pool"
+
+# Requests run here so the node's thread can react to Cancel and deadlines;
+# the scheduler never dispatches more requests than there are workers
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="groq-request")
+
+_clients: Dict[str, Groq] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: str) -> Groq:
+    """Get a cached GROQ client for a key so HTTP connections are reused"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            transport = cassette.cassette_transport()
+            if transport is None:
+                client = Groq(api_key=api_key)
+            else:
+                # Replayed responses are deterministic, so retrying a miss is pointless
+                client = Groq(api_key=api_key, http_client=DefaultHttpxClient(transport=transport),
+                              max_retries=0 if transport.mode == "replay" else 2)
+            _clients[api_key] = client
+        return client
+
+def use_cassette(mode: str = "off", path: str = "", timing_scale: float = 0.0):
+    """Record GROQ traffic to, or replay it from, a cassette file (mode off/record/replay)
+
+    Applies to every request made through get_client from now on.
+    """
+    cassette.configure(mode, path, timing_scale)
+    with _clients_lock:
+        _clients.clear()
+
+def resolve_api_key(api_key: str = "") -> str:
+    """Resolve a node's api_key input: explicit key, then the key pool, then GROQ_API_KEY"""
+    api_key = (api_key or "").strip()
+    if api_key and api_key != POOL_KEY:
+        return api_key
+    if len(get_key_pool()) > 0:
+        return POOL_KEY
+    return os.getenv('GROQ_API_KEY', '')
+
+def _send(api_key: str, pooled: bool, request_params, reserved_tokens: int = 0, cache_key: Optional[str] = None, ticket=None):
+    """Send one request on a worker thread and feed its quota headers and timing back
+
+    The scheduler slot is held until the HTTP call ends, even when the
+    caller has abandoned the request. A stream frees it once the response
+    starts.
+    """
+    pool = get_key_pool()
+    shared = get_shared_state()
+    router = get_model_router()
+    model = request_params.get("model", "")
+    started = time.monotonic()
+    try:
+        with span("groq.request", model=model) as request_span:
+            raw_response = get_client(api_key).chat.completions.with_raw_response.create(**request_params)
+            response = raw_response.parse()
+            if tracing_enabled():
+                _annotate_request_span(request_span, raw_response, response, time.monotonic() - started)
+    except APIStatusError as e:
+        if pooled:
+            pool.release(api_key, e.response.headers, e.status_code)
+        if e.status_code == 429 or e.status_code >= 500:
+            router.record_error(model)
+        if shared is not None:
+            shared.settle(api_key, reserved_tokens, 0)
+            shared.sync(api_key, e.response.headers, e.status_code)
+        raise
+    except Exception:
+        if pooled:
+            pool.release(api_key, status_code=0)
+        router.record_error(model)
+        if shared is not None:
+            shared.settle(api_key, reserved_tokens, 0)
+        raise
+    finally:
+        if ticket is not None:
+            get_scheduler().release(ticket)
+
+    if pooled:
+        pool.release(api_key, raw_response.headers)
+    else:
+        pool.record_quota(api_key, raw_response.headers)
+    if not request_params.get("stream"):
+        router.record(model, time.monotonic() - started, getattr(response, "usage", None))
+    if shared is not None:
+        # Settle before syncing: the reported remaining quota already counts this request's real usage
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            shared.settle(api_key, reserved_tokens, getattr(usage, "total_tokens", 0) or 0)
+        shared.sync(api_key, raw_response.headers)
+        if cache_key is not None:
+            shared.put_response(cache_key, model, response.model_dump_json())
+    return response
+
+def _annotate_request_span(request_span, raw_response, response, elapsed: float):
+    """Attach GROQ's server-side timing so network overhead can be told apart from queueing and generation"""
+    request_span.set_attributes(status_code=raw_response.status_code,
+                                request_id=raw_response.headers.get("x-request-id"))
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for name in ("queue_time", "prompt_time", "completion_time", "total_time",
+                 "prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(usage, name, None)
+        if value is not None:
+            request_span.set_attribute(f"groq.{name}", value)
+    if getattr(usage, "total_time", None) is not None:
+        # Upload, download and everything else outside the API's own processing
+        request_span.set_attribute("groq.network_time", max(elapsed - usage.total_time - (usage.queue_time or 0), 0.0))
+
+def _wait_for_quota(shared, api_key: str, tokens: int, deadline: Deadline):
+    """Block until the host-wide token bucket grants the request, honoring Cancel and the deadline"""
+    announced = False
+    while True:
+        wait = shared.debit(api_key, tokens)
+        if wait <= 0:
+            return
+        if not announced:
+            print(f"Waiting {wait:.1f}s for shared GROQ quota")
+            announced = True
+        time.sleep(min(wait, POLL_INTERVAL))
+        check_interrupted()
+        deadline.check()
+
+def chat_completion(api_key: str, deadline: Optional[Deadline] = None, **request_params):
+    """Shared request path for chat completions
+
+    Pooled requests are routed to the key with the most headroom and the
+    rate-limit headers of every response are fed back into the pool. With
+    GROQ_SHARED_STATE set, quota is debited from a token bucket shared by
+    every process on the host and deterministic responses are shared too.
+
+    The request runs on a worker thread while the calling thread watches
+    ComfyUI's interrupt flag and the deadline (shared by all calls of one
+    node run), so Cancel frees the executor immediately. An abandoned
+    request ends on its own once its read timeout, capped to the deadline,
+    runs out. Requests wait for a slot in the scheduler lane named by the
+    deadline's priority, so interactive nodes go ahead of batch backlogs.
+
+    Reasoning models return their answer only (reasoning_format hidden)
+    unless the request chooses a reasoning format itself.
+    """
+    apply_reasoning_defaults(request_params)
+    with span("groq.chat_completion", model=request_params.get("model"), stream=bool(request_params.get("stream"))):
+        return _chat_completion(api_key, deadline or Deadline(), request_params)
+
+def _chat_completion(api_key: str, deadline: Deadline, request_params):
+    deadline.check()
+    check_interrupted()
+
+    api_key = resolve_api_key(api_key)
+    if not api_key:
+        raise ValueError("No API key provided. Please set GROQ_API_KEY environment variable or provide it in the node.")
+
+    # Deterministic requests are answered from the host-wide cache when another worker already made them
+    shared = get_shared_state()
+    cache_key = request_cache_key(request_params) if shared is not None else None
+    if cache_key is not None:
+        with span("groq.cache_lookup") as lookup_span:
+            cached = shared.get_response(cache_key)
+            lookup_span.set_attribute("hit", cached is not None)
+        if cached is not None:
+            return ChatCompletion.model_validate_json(cached)
+
+    pooled = api_key == POOL_KEY
+    # The pooled key is only picked after dispatch, so pooled requests share turns per node run instead
+    caller = f"{POOL_KEY}:{id(deadline)}" if pooled else api_key
+    scheduler = get_scheduler()
+    ticket = scheduler.acquire(deadline.priority, caller, request_params.get("model", ""), deadline)
+
+    if pooled:
+        try:
+            with span("groq.key_acquire"):
+                api_key = get_key_pool().acquire()
+        except BaseException:
+            scheduler.release(ticket)
+            raise
+
+    reserved_tokens = 0
+    if shared is not None:
+        reserved_tokens = estimate_tokens(request_params)
+        try:
+            with span("groq.quota_wait", tokens=reserved_tokens):
+                _wait_for_quota(shared, api_key, reserved_tokens, deadline)
+        except BaseException:
+            if pooled:
+                get_key_pool().release(api_key, status_code=0)
+            scheduler.release(ticket)
+            raise
+
+    request_params.setdefault("timeout", deadline.request_timeout())
+    future = _executor.submit(propagate(_send), api_key, pooled, request_params, reserved_tokens, cache_key, ticket)
+    while True:
+        try:
+            return future.result(timeout=POLL_INTERVAL)
+        except FutureTimeoutError:
+            pass
+        try:
+            check_interrupted()
+            deadline.check()
+        except BaseException:
+            # A request still queued never reaches the API; one in flight is abandoned
+            if future.cancel():
+                scheduler.release(ticket)
+                if pooled:
+                    get_key_pool().release(api_key, status_code=0)
+                if shared is not None:
+                    # _send never ran, so nothing else credits the reservation back
+                    shared.settle(api_key, reserved_tokens, 0)
+            raise
+
+def reasoning_completion(api_key: str, deadline: Optional[Deadline] = None, reasoning: str = "hidden",
+                         reasoning_effort: str = "default", max_reasoning_tokens: int = 0,
+                         **request_params) -> ReasoningResult:
+    """Chat completion whose answer never contains the model's reasoning
+
+    reasoning selects the model's reasoning_format (hidden, parsed, raw) and
+    reasoning_effort limits reasoning where the model supports it. Raw
+    reasoning, and any request with a max_reasoning_tokens budget, is
+    streamed and <think> spans are stripped as they arrive. Once the budget
+    is spent the stream is closed and the model is made to answer from the
+    reasoning so far (budget forcing through an assistant prefill).
+    """
+    deadline = deadline or Deadline()
+    model = request_params.get("model", "")
+    request_params.update(reasoning_params(model, reasoning, reasoning_effort))
+    # Budget forcing needs reasoning inline in <think> tags; other models are limited by reasoning_effort
+    if not REASONING_MODELS.get(model, {}).get("format"):
+        max_reasoning_tokens = 0
+
+    def account(usage, answer, reasoning_text, budget_forced=False):
+        return reasoning_usage(usage, answer, reasoning_text, model, reasoning, reasoning_effort, budget_forced)
+
+    if not is_reasoning_model(model) or (reasoning != "raw" and not max_reasoning_tokens):
+        response = chat_completion(api_key, deadline=deadline, **request_params)
+        if not (hasattr(response, 'choices') and len(response.choices) > 0):
+            return ReasoningResult("", "", account(getattr(response, "usage", None), "", ""))
+        message = response.choices[0].message
+        answer, inline_reasoning = split_reasoning(message.content or "")
+        reasoning_text = getattr(message, "reasoning", None) or inline_reasoning
+        return ReasoningResult(answer.strip(), reasoning_text, account(response.usage, answer, reasoning_text))
+
+    if request_params.get("reasoning_format") == "hidden":
+        # Hidden reasoning cannot be measured while streaming; raw carries it inline to the filter
+        request_params["reasoning_format"] = "raw"
+    reasoning_filter, usage, budget_spent = _stream_reasoning(api_key, deadline, max_reasoning_tokens, request_params)
+    result = ReasoningResult(reasoning_filter.answer, reasoning_filter.reasoning,
+                             account(usage, reasoning_filter.answer, reasoning_filter.reasoning))
+    if not budget_spent:
+        return result
+
+    print(f"Reasoning budget of {max_reasoning_tokens} tokens spent on {model}, asking for the answer")
+    forced_params = dict(request_params, stream=False)
+    forced_params["messages"] = list(request_params["messages"]) + [
+        {"role": "assistant", "content": f"{THINK_OPEN}\n{result.reasoning}\n{THINK_CLOSE}\n\n"}
+    ]
+    response = chat_completion(api_key, deadline=deadline, **forced_params)
+    content = response.choices[0].message.content if response.choices else ""
+    answer, _ = split_reasoning(content or "")
+    return ReasoningResult(answer.strip(), result.reasoning,
+                           merge_usage(result.usage, account(response.usage, answer, "", budget_forced=True)))
+
+def _stream_reasoning(api_key: str, deadline: Deadline, max_reasoning_tokens: int, request_params):
+    """Stream a completion through a ReasoningFilter; returns (filter, usage, budget_spent)"""
+    reasoning_filter = ReasoningFilter()
+    usage = None
+    budget_chars = max_reasoning_tokens * CHARS_PER_TOKEN
+    stream = chat_completion(api_key, deadline=deadline, stream=True, **request_params)
+    try:
+        for chunk in stream:
+            check_interrupted()
+            deadline.check()
+            if chunk.choices:
+                delta = chunk.choices[0].delta
+                if getattr(delta, "reasoning", None):
+                    reasoning_filter.add_reasoning(delta.reasoning)
+                if delta.content:
+                    reasoning_filter.feed(delta.content)
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(chunk, "usage", None) or getattr(x_groq, "usage", None) or usage
+            if budget_chars and not reasoning_filter.answer_parts and reasoning_filter.reasoning_chars > budget_chars:
+                return reasoning_filter, usage, True
+    finally:
+        stream.close()
+    reasoning_filter.flush()
+    return reasoning_filter, usage, False
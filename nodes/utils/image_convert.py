@@ -0,0 +1,201 @@
+import math
+
+import numpy as np
+import torch
+from PIL import Image
+
+# Upper bound on float32 scratch elements per conversion block (~64 MB). Large
+# frames are converted a band of rows at a time so peak memory stays flat no
+# matter the resolution or batch size.
+SCRATCH_ELEMENTS = 16 * 1024 * 1024
+
+CHANNEL_MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+# Pixels per image sampled to tell [0, 1] from [0, 255] float images
+RANGE_SAMPLES = 4096
+
+def to_bhwc(image_tensor):
+    """Return a BHWC view of an image tensor (HWC, BHWC or BCHW) without copying"""
+    if image_tensor.dim() == 3:
+        image_tensor = image_tensor.unsqueeze(0)
+    if image_tensor.dim() != 4:
+        raise ValueError(f"Expected a 3D or 4D image tensor, got shape {tuple(image_tensor.shape)}")
+
+    # ComfyUI IMAGE tensors are BHWC; only treat the tensor as channels-first
+    # when the trailing axis cannot be a channel axis
+    if image_tensor.shape[-1] not in CHANNEL_MODES and image_tensor.shape[1] in CHANNEL_MODES:
+        image_tensor = image_tensor.permute(0, 2, 3, 1)
+    return image_tensor
+
+def is_unit_range(batch) -> bool:
+    """Whether a BHWC float batch holds [0, 1] values rather than [0, 255]
+
+    Decided from a strided grid of at most RANGE_SAMPLES pixels per image, so
+    the check costs the same for a 512px image and an 8K one.
+    """
+    b, h, w, _ = batch.shape
+    if b == 0 or h == 0 or w == 0:
+        return True
+    stride = max(1, math.isqrt(h * w // RANGE_SAMPLES))
+    return float(batch[:, ::stride, ::stride].max()) <= 1.0
+
+def tensor_to_uint8(image_tensor) -> np.ndarray:
+    """Convert a float image batch to a contiguous uint8 BHWC numpy array
+
+    Batches in [0, 1] are scaled to [0, 255]; batches already in [0, 255]
+    are only clamped.
+    """
+    batch = to_bhwc(image_tensor).detach()
+    if batch.dtype == torch.uint8:
+        return batch.cpu().contiguous().numpy()
+    scale = 255.0 if is_unit_range(batch) else 1.0
+
+    b, h, w, c = batch.shape
+    result = np.empty((b, h, w, c), dtype=np.uint8)
+    image_elements = max(h * w * c, 1)
+
+    if image_elements <= SCRATCH_ELEMENTS:
+        # Several whole images per block
+        step = max(1, SCRATCH_ELEMENTS // image_elements)
+        blocks = [(slice(i, i + step), slice(None)) for i in range(0, b, step)]
+        scratch = torch.empty((min(step, b), h, w, c), dtype=torch.float32)
+    else:
+        # One band of rows per block
+        rows = max(1, SCRATCH_ELEMENTS // max(w * c, 1))
+        blocks = [(slice(i, i + 1), slice(r, r + rows)) for i in range(b) for r in range(0, h, rows)]
+        scratch = torch.empty((1, min(rows, h), w, c), dtype=torch.float32)
+
+    for images, band in blocks:
+        source = batch[images, band]
+        if source.device.type != "cpu":
+            source = source.to("cpu")
+        buffer = scratch[:source.shape[0], :source.shape[1]]
+        torch.mul(source, scale, out=buffer)
+        buffer.clamp_(0, 255)
+        # Unsafe casting truncates toward zero, matching the previous astype(np.uint8)
+        np.copyto(result[images, band], buffer.numpy(), casting="unsafe")
+
+    return result
+
+def uint8_to_pil(image_array):
+    """Wrap a uint8 HWC array as a PIL Image, sharing its memory where PIL allows it"""
+    h, w, c = image_array.shape
+    mode = CHANNEL_MODES.get(c)
+    if mode is None:
+        raise ValueError(f"Unsupported channel count: {c}")
+    if mode == "RGB":
+        # PIL stores RGB as 4 bytes per pixel, so this is always one copy
+        return Image.fromarray(image_array, mode)
+
+    # L and RGBA match PIL's internal layout and are mapped read-only;
+    # PIL copies on the first write
+    image_array = np.ascontiguousarray(image_array)
+    if c == 1:
+        image_array = image_array[..., 0]
+    return Image.frombuffer(mode, (w, h), image_array, "raw", mode, 0, 1)
+
+def tensor_to_pil_list(image_tensor):
+    """Convert a whole image batch to a list of PIL Images in one pass"""
+    batch = tensor_to_uint8(image_tensor)
+    return [uint8_to_pil(image) for image in batch]
+
+# ITU-R 601-2 luma weights, as PIL uses for convert("L")
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+def crop_batch(batch, crop_region):
+    """Crop a BHWC batch to (left, top, right, bottom), clamped to the image; returns a view"""
+    left, top, right, bottom = map(int, crop_region)
+    height, width = batch.shape[1], batch.shape[2]
+    left = max(0, min(left, width - 1))
+    top = max(0, min(top, height - 1))
+    right = max(left + 1, min(right, width))
+    bottom = max(top + 1, min(bottom, height))
+    return batch[:, top:bottom, left:right]
+
+def resize_batch(batch, resize_dims):
+    """Resize a BHWC batch to (width, height) with antialiased bicubic filtering
+
+    The antialias kernel widens with the downscale factor like PIL's LANCZOS,
+    so downsampling does not alias. uint8 batches use torch's vectorized
+    channels-last kernel, many times faster than the float one on CPU.
+    """
+    width, height = map(int, resize_dims)
+    if (batch.shape[2], batch.shape[1]) == (width, height):
+        return batch
+    planar = batch.permute(0, 3, 1, 2)
+    if batch.dtype == torch.uint8:
+        try:
+            resized = torch.nn.functional.interpolate(planar, size=(height, width), mode="bicubic",
+                                                      align_corners=False, antialias=True)
+            return resized.permute(0, 2, 3, 1)
+        except (RuntimeError, NotImplementedError):
+            # Older torch builds only resize floats
+            planar = planar.float().div_(255)
+    resized = torch.nn.functional.interpolate(planar, size=(height, width), mode="bicubic",
+                                              align_corners=False, antialias=True).clamp_(0, 1)
+    if batch.dtype == torch.uint8:
+        resized = resized.mul_(255).round_().to(torch.uint8)
+    return resized.permute(0, 2, 3, 1)
+
+def enhance_batch(pixels, contrast=1.2, sharpness=1.1):
+    """Vectorized equivalent of PIL ImageEnhance Contrast then Sharpness on a uint8 BHWC RGB batch
+
+    Contrast blends each image with its mean luma. Sharpness blends with the
+    3x3 smoothing filter (center weight 5, total 13); the filter is applied
+    as a separable box sum and the one-pixel border is left as is, like PIL.
+    """
+    x = pixels.float()
+    # Luma is linear, so the mean luma is the luma of the channel means
+    mean = (x.mean(dim=(1, 2)) @ x.new_tensor(LUMA_WEIGHTS)).view(-1, 1, 1, 1)
+    x.mul_(contrast).add_(mean * (1.0 - contrast)).clamp_(0, 255)
+
+    if x.shape[1] >= 3 and x.shape[2] >= 3:
+        rows = x[:, :-2] + x[:, 1:-1]
+        rows += x[:, 2:]
+        box = rows[:, :, :-2] + rows[:, :, 1:-1]
+        box += rows[:, :, 2:]
+        # x + (sharpness - 1) * (x - (box + 4x) / 13), folded into one multiply-add
+        k = sharpness - 1.0
+        inner = x[:, 1:-1, 1:-1]
+        inner.copy_(box.mul_(-k / 13).add_(inner, alpha=1.0 + k - 4.0 * k / 13).clamp_(0, 255))
+    return x.to(torch.uint8)
+
+def preprocess_batch(image_tensor, crop_region=None, resize_dims=None, enhance=False):
+    """Crop, resize and enhance a whole image batch in the tensor domain
+
+    Returns a uint8 BHWC RGB batch. Cropping is a view and happens first, so
+    only the kept pixels are quantized (once, for the whole batch, as the PIL
+    path did), resized and enhanced.
+    """
+    batch = to_bhwc(image_tensor).detach()
+    if crop_region and isinstance(crop_region, (tuple, list)) and len(crop_region) == 4:
+        batch = crop_batch(batch, crop_region)
+
+    # Match PIL's convert('RGB'): grey is replicated, alpha is dropped
+    if batch.shape[3] == 1:
+        batch = batch.expand(-1, -1, -1, 3)
+    elif batch.shape[3] == 4:
+        batch = batch[..., :3]
+    pixels = torch.from_numpy(tensor_to_uint8(batch))
+
+    if resize_dims and isinstance(resize_dims, (tuple, list)) and len(resize_dims) == 2:
+        pixels = resize_batch(pixels, resize_dims)
+    if enhance:
+        pixels = enhance_batch(pixels)
+    return pixels
+
+def preprocess_to_pil_list(image_tensor, crop_region=None, resize_dims=None, enhance=False):
+    """preprocess_batch a few images at a time, wrapping each group as PIL Images straight away
+
+    Only one group's intermediates are alive at once, so peak memory does
+    not grow with the batch size.
+    """
+    batch = to_bhwc(image_tensor)
+    pixels = batch.shape[1] * batch.shape[2] * 3
+    if resize_dims and isinstance(resize_dims, (tuple, list)) and len(resize_dims) == 2:
+        pixels = max(pixels, int(resize_dims[0]) * int(resize_dims[1]) * 3)
+    step = max(1, SCRATCH_ELEMENTS // max(pixels, 1))
+    images = []
+    for start in range(0, batch.shape[0], step):
+        images.extend(tensor_to_pil_list(preprocess_batch(batch[start:start + step], crop_region, resize_dims, enhance)))
+    return images
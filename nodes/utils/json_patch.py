@@ -0,0 +1,143 @@
+import copy
+from typing import Any, Dict, List, Tuple
+
+# RFC 6902 operations and the members each one requires besides "op" and "path"
+OPERATIONS = {
+    "add": ("value",),
+    "remove": (),
+    "replace": ("value",),
+    "move": ("from",),
+    "copy": ("from",),
+    "test": ("value",),
+}
+
+# Schema for asking a model for a patch (used with structured_completion)
+PATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "operations": {
+            "type": "array",
+            "description": "RFC 6902 JSON Patch operations against the submitted workflow",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "op": {"type": "string", "enum": list(OPERATIONS)},
+                    "path": {"type": "string", "description": "JSON Pointer, e.g. /3/inputs/steps"},
+                    "from": {"type": "string", "description": "Source pointer for move and copy"},
+                    "value": {"description": "Value for add, replace and test"},
+                },
+                "required": ["op", "path"],
+            },
+        },
+        "explanation": {"type": "string", "description": "What was wrong and what the operations change"},
+    },
+    "required": ["operations", "explanation"],
+}
+
+class JsonPatchError(ValueError):
+    """Raised when a patch is malformed or does not apply to the document"""
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split an RFC 6901 JSON Pointer into unescaped reference tokens"""
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON Pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+    return index
+
+def _resolve(document, tokens: List[str]):
+    """Walk to the value a list of tokens points at"""
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_index(document, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return document
+
+def _parent(document, pointer: str) -> Tuple[Any, str]:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError("Operation cannot target the document root")
+    return _resolve(document, tokens[:-1]), tokens[-1]
+
+def _add(document, pointer: str, value):
+    if pointer == "":
+        return value
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to a scalar at {pointer}")
+    return document
+
+def _remove(document, pointer: str):
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {pointer}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token))
+    raise JsonPatchError(f"Path not found: {pointer}")
+
+def apply_operation(document, operation: Dict[str, Any]):
+    """Apply one operation in place, returning the (possibly replaced) document"""
+    if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+        raise JsonPatchError(f"Unknown operation: {operation!r}")
+    op = operation["op"]
+    for member in ("path",) + OPERATIONS[op]:
+        if member not in operation:
+            raise JsonPatchError(f"{op} operation is missing '{member}'")
+    path = operation["path"]
+
+    if op == "add":
+        return _add(document, path, copy.deepcopy(operation["value"]))
+    if op == "remove":
+        _remove(document, path)
+        return document
+    if op == "replace":
+        if path == "":
+            return copy.deepcopy(operation["value"])
+        _remove(document, path)
+        return _add(document, path, copy.deepcopy(operation["value"]))
+    if op == "move":
+        source = operation["from"]
+        if path != source and path.startswith(source + "/"):
+            raise JsonPatchError(f"Cannot move {source} into its own child {path}")
+        value = _remove(document, source)
+        return _add(document, path, value)
+    if op == "copy":
+        value = _resolve(document, parse_pointer(operation["from"]))
+        return _add(document, path, copy.deepcopy(value))
+    # test
+    if _resolve(document, parse_pointer(path)) != operation["value"]:
+        raise JsonPatchError(f"Test failed at {path}")
+    return document
+
+def apply_patch(document, operations: List[Dict[str, Any]]):
+    """Apply an RFC 6902 patch atomically: the input is never modified"""
+    if not isinstance(operations, list):
+        raise JsonPatchError("A patch must be a list of operations")
+    result = copy.deepcopy(document)
+    for number, operation in enumerate(operations, 1):
+        try:
+            result = apply_operation(result, operation)
+        except JsonPatchError as e:
+            raise JsonPatchError(f"Operation {number}: {e}") from None
+    return result
@@ -0,0 +1,32 @@
+import json
+import os
+from typing import Any, List
+
+def read_jsonl(path: str, stop_at_bad_line: bool = False) -> List[Any]:
+    """Read an append-only JSONL file and cut off a partial last line
+
+    An interrupted write leaves a last line without its newline. It is
+    truncated away here, so the next append starts on a line of its own
+    instead of extending the partial one. Complete lines that do not parse
+    are skipped, or with stop_at_bad_line end the file there (for files
+    whose line number matters).
+    """
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, "rb+") as f:
+        valid = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Partial last line from an interrupted write
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if stop_at_bad_line:
+                    break
+            valid += len(line)
+        f.seek(0, os.SEEK_END)
+        if f.tell() > valid:
+            print(f"Dropping {f.tell() - valid} bytes of incomplete entries from {path}")
+            f.truncate(valid)
+    return entries
@@ -0,0 +1,187 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# How long a key sits out after the API rejects it
+QUARANTINE_RATE_LIMITED = 30.0
+QUARANTINE_UNAUTHORIZED = 600.0
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+def parse_duration(value) -> Optional[float]:
+    """Parse Groq reset/retry durations such as '7.66s', '2m59.56s' or '120ms' into seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+def _header_int(headers, name) -> Optional[int]:
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+def mask_key(api_key: str) -> str:
+    """Mask an API key for display"""
+    return f"{api_key[:8]}...{api_key[-4:]}" if len(api_key) > 12 else "KEY_TOO_SHORT"
+
+@dataclass
+class KeyState:
+    key: str
+    limit_requests: Optional[int] = None
+    limit_tokens: Optional[int] = None
+    remaining_requests: Optional[int] = None
+    remaining_tokens: Optional[int] = None
+    requests_reset_at: float = 0.0
+    tokens_reset_at: float = 0.0
+    quarantined_until: float = 0.0
+    quarantine_reason: str = ""
+    in_flight: int = 0
+    total_requests: int = 0
+    total_errors: int = 0
+
+    def headroom(self, now: float) -> float:
+        """Fraction of quota left (0-1), counting windows that have already reset as full"""
+        fractions = []
+        for remaining, limit, reset_at in (
+            (self.remaining_requests, self.limit_requests, self.requests_reset_at),
+            (self.remaining_tokens, self.limit_tokens, self.tokens_reset_at),
+        ):
+            if remaining is None or now >= reset_at:
+                fractions.append(1.0)
+            elif limit:
+                fractions.append(remaining / limit)
+            else:
+                fractions.append(1.0 if remaining > 0 else 0.0)
+        return min(fractions)
+
+class GroqKeyPool:
+    """Thread-safe in-process pool of GROQ API keys with per-key quota tracking"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: Dict[str, KeyState] = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    def __contains__(self, api_key):
+        with self._lock:
+            return api_key in self._keys
+
+    def add_keys(self, api_keys: List[str]) -> int:
+        """Add keys to the pool, returning how many were new"""
+        added = 0
+        with self._lock:
+            for api_key in api_keys:
+                if api_key and api_key not in self._keys:
+                    self._keys[api_key] = KeyState(key=api_key)
+                    added += 1
+        return added
+
+    def remove_keys(self, api_keys: List[str]) -> int:
+        """Remove keys from the pool, returning how many were removed"""
+        with self._lock:
+            return sum(1 for api_key in api_keys if self._keys.pop(api_key, None) is not None)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def acquire(self) -> str:
+        """Reserve the key with the most headroom for one request"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._keys:
+                raise RuntimeError("GROQ key pool is empty")
+            available = [state for state in self._keys.values() if state.quarantined_until <= now]
+            if not available:
+                soonest = min(state.quarantined_until for state in self._keys.values())
+                raise RuntimeError(f"All pooled GROQ API keys are quarantined (next available in {soonest - now:.0f}s)")
+
+            # Spread concurrent requests: each in-flight request counts against the key
+            state = max(available, key=lambda s: (s.headroom(now) - 0.05 * s.in_flight, -s.total_requests))
+            state.in_flight += 1
+            state.total_requests += 1
+            return state.key
+
+    def release(self, api_key: str, headers=None, status_code: int = 200):
+        """Return a key after a request and record the quota reported by the API"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._keys.get(api_key)
+            if state is None:
+                return
+            state.in_flight = max(0, state.in_flight - 1)
+            if headers is not None:
+                self._update_quota(state, headers, now)
+
+            if status_code == 429:
+                retry_after = parse_duration(headers.get("retry-after")) if headers is not None else None
+                self._quarantine(state, now, retry_after or QUARANTINE_RATE_LIMITED, "rate limited")
+            elif status_code in (401, 403):
+                self._quarantine(state, now, QUARANTINE_UNAUTHORIZED, "unauthorized")
+            elif status_code >= 400:
+                state.total_errors += 1
+
+    def record_quota(self, api_key: str, headers):
+        """Record quota headers for a pooled key outside acquire/release"""
+        with self._lock:
+            state = self._keys.get(api_key)
+            if state is not None and headers is not None:
+                self._update_quota(state, headers, time.monotonic())
+
+    def _update_quota(self, state: KeyState, headers, now: float):
+        limit_requests = _header_int(headers, "x-ratelimit-limit-requests")
+        limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens")
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        if limit_requests is not None:
+            state.limit_requests = limit_requests
+        if limit_tokens is not None:
+            state.limit_tokens = limit_tokens
+        if remaining_requests is not None:
+            state.remaining_requests = remaining_requests
+            state.requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 60.0)
+        if remaining_tokens is not None:
+            state.remaining_tokens = remaining_tokens
+            state.tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 60.0)
+
+    def _quarantine(self, state: KeyState, now: float, seconds: float, reason: str):
+        state.total_errors += 1
+        state.quarantined_until = max(state.quarantined_until, now + seconds)
+        state.quarantine_reason = reason
+
+    def status(self) -> List[Dict]:
+        """Snapshot of every pooled key for display"""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "key": mask_key(state.key),
+                "headroom": round(state.headroom(now), 3),
+                "remaining_requests": state.remaining_requests,
+                "remaining_tokens": state.remaining_tokens,
+                "in_flight": state.in_flight,
+                "requests": state.total_requests,
+                "errors": state.total_errors,
+                "quarantined_for": round(max(0.0, state.quarantined_until - now), 1),
+                "quarantine_reason": state.quarantine_reason if state.quarantined_until > now else "",
+            } for state in self._keys.values()]
+
+# Process-wide pool shared by every node
+KEY_POOL = GroqKeyPool()
+
+def get_key_pool() -> GroqKeyPool:
+    """Get the process-wide GROQ key pool"""
+    return KEY_POOL
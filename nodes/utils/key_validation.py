@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from .deadlines import DEFAULT_CONNECT_TIMEOUT
+from .groq_client import get_client
+
+# Validation results older than this are refreshed in the background
+VALIDATION_TTL = 300.0
+
+@dataclass
+class ValidationResult:
+    is_valid: Optional[bool]
+    message: str
+    checked_at: float
+    models: Tuple[str, ...] = ()
+
+    def age(self) -> float:
+        return time.time() - self.checked_at
+
+    def describe(self) -> str:
+        """Status message with when the key was last checked"""
+        age = self.age()
+        if age < 1:
+            checked = "just now"
+        elif age < 120:
+            checked = f"{age:.0f}s ago"
+        else:
+            checked = f"{age / 60:.0f}m ago"
+        return f"{self.message} (checked {checked})"
+
+def key_hash(api_key: str) -> str:
+    """Hash an API key so raw keys are never used as cache keys"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def validate_api_key(api_key: str) -> ValidationResult:
+    """Validate a key against the /models endpoint (no completion, no token usage)"""
+    try:
+        models = get_client(api_key).models.list(timeout=DEFAULT_CONNECT_TIMEOUT)
+        model_ids = tuple(model.id for model in getattr(models, "data", []) or [])
+        return ValidationResult(True, "✅ API key valid", time.time(), model_ids)
+    except Exception as e:
+        error_msg = str(e).lower()
+        if "401" in error_msg or "invalid_api_key" in error_msg:
+            return ValidationResult(False, "❌ Invalid API key", time.time())
+        elif "429" in error_msg or "rate_limit" in error_msg:
+            return ValidationResult(True, "⚠️ Valid key but rate limited", time.time())
+        elif "quota" in error_msg or "billing" in error_msg:
+            return ValidationResult(True, "⚠️ Valid key but quota exceeded", time.time())
+        elif "timeout" in error_msg or "connection" in error_msg:
+            return ValidationResult(None, "⚠️ Connection timeout - key likely valid", time.time())
+        else:
+            return ValidationResult(False, f"❌ Test failed: {str(e)[:50]}", time.time())
+
+class KeyValidationCache:
+    """Per-key validation results with a TTL and background refresh"""
+
+    def __init__(self, ttl: float = VALIDATION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results: Dict[str, ValidationResult] = {}
+        self._refreshing = set()
+
+    def check(self, api_key: str) -> ValidationResult:
+        """Return the last known result, refreshing stale entries in the background
+
+        Only the very first check of a key blocks on the network.
+        """
+        digest = key_hash(api_key)
+        with self._lock:
+            result = self._results.get(digest)
+            stale = result is not None and result.age() >= self.ttl
+            if stale and digest not in self._refreshing:
+                self._refreshing.add(digest)
+                threading.Thread(target=self._refresh, args=(api_key, digest), daemon=True).start()
+        if result is not None:
+            return result
+
+        result = validate_api_key(api_key)
+        with self._lock:
+            self._results[digest] = result
+        return result
+
+    def invalidate(self, api_key: str):
+        with self._lock:
+            self._results.pop(key_hash(api_key), None)
+
+    def _refresh(self, api_key: str, digest: str):
+        try:
+            result = validate_api_key(api_key)
+            with self._lock:
+                self._results[digest] = result
+        finally:
+            with self._lock:
+                self._refreshing.discard(digest)
+
+# Process-wide cache shared by every key manager node
+VALIDATION_CACHE = KeyValidationCache()
+
+def get_validation_cache() -> KeyValidationCache:
+    """Get the process-wide API key validation cache"""
+    return VALIDATION_CACHE
@@ -0,0 +1,155 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "groq", "LanguageSamples.json")
+
+# Returned when a text has no letters to judge (numbers, weights, punctuation)
+UNDETERMINED = "und"
+
+NGRAM_SIZES = (1, 2, 3)
+
+# Whole words are much stronger evidence than n-grams when the sample has them
+WORD_WEIGHT = 3.0
+
+# Tokens with digits (8k, 1girl, 4k) are technical tags, not language evidence
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+def _words(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if not any(char.isdigit() for char in token)]
+
+# Non-Latin scripts decide the language on their own: (first, last, language)
+SCRIPT_RANGES = (
+    (0x3040, 0x30FF, "ja"),  # Hiragana, Katakana
+    (0x1100, 0x11FF, "ko"),
+    (0xAC00, 0xD7AF, "ko"),
+    (0x4E00, 0x9FFF, "zh"),  # CJK ideographs, also used by Japanese
+    (0x0400, 0x04FF, "ru"),
+    (0x0370, 0x03FF, "el"),
+    (0x0590, 0x05FF, "he"),
+    (0x0600, 0x06FF, "ar"),
+    (0x0900, 0x097F, "hi"),
+    (0x0E00, 0x0E7F, "th"),
+)
+
+# Letters that only occur in one language sharing a script
+UKRAINIAN_LETTERS = set("іїєґІЇЄҐ")
+PERSIAN_LETTERS = set("پچژگ")
+
+class _LanguageModel:
+    """Smoothed log-probabilities of character n-grams and words for every sample language
+
+    Features share one vocabulary so a text is looked up once and scored
+    against all languages with a single matrix product.
+    """
+
+    def __init__(self, samples: Dict[str, str]):
+        self.languages = list(samples)
+        gram_counts = {}
+        word_counts = {}
+        for language, text in samples.items():
+            words = _words(text)
+            grams = Counter()
+            for word in words:
+                grams.update(_ngrams(word))
+            gram_counts[language] = grams
+            word_counts[language] = Counter(words)
+        self.gram_index, self.gram_logp = self._table(gram_counts)
+        self.word_index, self.word_logp = self._table(word_counts)
+
+    def _table(self, counts: Dict[str, Counter]):
+        index = {}
+        for language in self.languages:
+            for feature in counts[language]:
+                index.setdefault(feature, len(index))
+        # Last column holds each language's score for a feature it never saw
+        table = np.empty((len(self.languages), len(index) + 1), dtype=np.float64)
+        for row, language in enumerate(self.languages):
+            total = sum(counts[language].values())
+            table[row, :] = math.log(0.5 / total)
+            for feature, count in counts[language].items():
+                table[row, index[feature]] = math.log(count / total)
+        return index, table
+
+    def _feature_score(self, index, table, features: Counter) -> np.ndarray:
+        unknown = len(index)
+        columns = np.fromiter((index.get(feature, unknown) for feature in features), dtype=np.int64, count=len(features))
+        counts = np.fromiter(features.values(), dtype=np.float64, count=len(features))
+        return table[:, columns] @ counts
+
+    def scores(self, words: List[str]) -> np.ndarray:
+        grams = Counter()
+        for word in words:
+            grams.update(_ngrams(word))
+        return (self._feature_score(self.gram_index, self.gram_logp, grams)
+                + WORD_WEIGHT * self._feature_score(self.word_index, self.word_logp, Counter(words)))
+
+def _ngrams(word: str):
+    padded = f" {word} "
+    for size in NGRAM_SIZES:
+        for start in range(len(padded) - size + 1):
+            gram = padded[start:start + size]
+            if gram != " ":
+                yield gram
+
+_model: Optional[_LanguageModel] = None
+
+def _load_model() -> _LanguageModel:
+    global _model
+    if _model is None:
+        with open(SAMPLES_PATH, "r", encoding="utf-8") as f:
+            _model = _LanguageModel(json.load(f))
+    return _model
+
+def _script_language(text: str) -> Tuple[Optional[str], float]:
+    """Language of the dominant non-Latin script and its share of the letters"""
+    scripts = Counter()
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        code = ord(char)
+        for first, last, language in SCRIPT_RANGES:
+            if first <= code <= last:
+                scripts[language] += 1
+                break
+    if not scripts:
+        return None, 0.0
+    # Kanji are counted with kana once any kana shows up
+    if scripts["ja"]:
+        scripts["ja"] += scripts.pop("zh", 0)
+    language, count = scripts.most_common(1)[0]
+    if language == "ru" and any(char in UKRAINIAN_LETTERS for char in text):
+        language = "uk"
+    elif language == "ar" and any(char in PERSIAN_LETTERS for char in text):
+        language = "fa"
+    return language, count / letters
+
+def detect_language(text: str) -> Tuple[str, float]:
+    """Detect the language of a prompt locally, returning (ISO 639-1 code, confidence 0-1)
+
+    Non-Latin scripts are recognised by their Unicode ranges; Latin-script
+    languages are scored with naive Bayes over character 1-3 grams and words
+    learned from LanguageSamples.json. Runs in well under a millisecond for
+    prompt-length text.
+    """
+    language, share = _script_language(text)
+    if language is not None and share >= 0.5:
+        return language, round(share, 3)
+
+    words = [word for word in _words(text) if word.isascii() or not _script_language(word)[0]]
+    if not words:
+        return UNDETERMINED, 0.0
+
+    model = _load_model()
+    scores = model.scores(words)
+    best = int(np.argmax(scores))
+    # Posterior over the sample languages with a flat prior
+    posterior = 1.0 / float(np.exp(scores - scores[best]).sum())
+    return model.languages[best], round(posterior, 3)
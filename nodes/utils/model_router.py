@@ -0,0 +1,213 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional
+
+from .base_node import CACHE_DIR
+
+# Model input value that lets the router choose
+AUTO_MODEL = "auto"
+
+STATS_PATH = os.path.join(CACHE_DIR, "model_stats.json")
+
+# Quality rank of the production models the router may pick; higher is better
+MODEL_QUALITY = {
+    "openai/gpt-oss-120b": 3,
+    "moonshotai/kimi-k2-instruct-0905": 3,
+    "llama-3.3-70b-versatile": 3,
+    "meta-llama/llama-4-maverick-17b-128e-instruct": 2,
+    "openai/gpt-oss-20b": 2,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 2,
+    "llama-3.1-8b-instant": 1,
+}
+
+# Minimum quality rank per tier
+QUALITY_TIERS = {
+    "high": 3,
+    "balanced": 2,
+    "fast": 1,
+}
+
+# Cold-start estimates (seconds to first token, output tokens/sec) until real traffic is seen
+PRIORS = {
+    "openai/gpt-oss-120b": (0.35, 500.0),
+    "moonshotai/kimi-k2-instruct-0905": (0.45, 200.0),
+    "llama-3.3-70b-versatile": (0.35, 280.0),
+    "meta-llama/llama-4-maverick-17b-128e-instruct": (0.3, 600.0),
+    "openai/gpt-oss-20b": (0.3, 1000.0),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.3, 750.0),
+    "llama-3.1-8b-instant": (0.25, 560.0),
+}
+DEFAULT_PRIOR = (0.5, 300.0)
+
+# Weight of each new observation in the rolling averages
+EWMA_ALPHA = 0.2
+# Models above this error rate are only used if nothing else qualifies
+MAX_ERROR_RATE = 0.25
+# Share of requests sent to an under-sampled candidate so its stats stay current
+EXPLORE_RATE = 0.05
+MIN_SAMPLES = 5
+SAVE_INTERVAL = 30.0
+
+ROUTER_INPUTS = {
+    "model_tier": (list(QUALITY_TIERS), {
+        "default": "balanced",
+        "tooltip": "With model set to auto: minimum quality tier the router may pick (high: 70B+ class, balanced: adds 17-20B models, fast: any)"
+    }),
+    "latency_slo": ("FLOAT", {
+        "default": 5.0,
+        "min": 0.1,
+        "max": 120.0,
+        "step": 0.1,
+        "tooltip": "With model set to auto: target seconds per request. The fastest model of the tier that is predicted to meet it is used."
+    }),
+}
+
+@dataclass
+class ModelStats:
+    ttft: float
+    tokens_per_second: float
+    error_rate: float = 0.0
+    samples: int = 0
+    errors: int = 0
+    updated_at: float = 0.0
+
+    def predict(self, output_tokens: int) -> float:
+        """Predicted seconds for a request producing output_tokens"""
+        return self.ttft + output_tokens / max(self.tokens_per_second, 1.0)
+
+def _ewma(old: float, new: float, samples: int) -> float:
+    # Plain mean for the first samples so priors are replaced quickly
+    alpha = max(EWMA_ALPHA, 1.0 / (samples + 1))
+    return old + alpha * (new - old)
+
+class ModelRouter:
+    """Rolling per-model latency stats from real traffic, used to resolve model="auto" """
+
+    def __init__(self, path: str = STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ModelStats] = {}
+        self._dirty = False
+        self._saved_at = 0.0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._stats = {model: ModelStats(**values) for model, values in data.items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not load model stats from {self.path}: {str(e)}")
+
+    def stats(self, model: str) -> ModelStats:
+        with self._lock:
+            return self._get(model)
+
+    def _get(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            ttft, tps = PRIORS.get(model, DEFAULT_PRIOR)
+            stats = ModelStats(ttft=ttft, tokens_per_second=tps)
+            self._stats[model] = stats
+        return stats
+
+    def record(self, model: str, latency: float, usage=None):
+        """Record a successful request: wall-clock latency plus the response's usage timings"""
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        completion_time = getattr(usage, "completion_time", 0) or 0
+        with self._lock:
+            stats = self._get(model)
+            if completion_tokens and completion_time:
+                stats.tokens_per_second = _ewma(stats.tokens_per_second, completion_tokens / completion_time, stats.samples)
+            # Time to first token: everything except generating the output (queue, prompt, network)
+            stats.ttft = _ewma(stats.ttft, max(latency - completion_time, 0.0), stats.samples)
+            stats.error_rate = _ewma(stats.error_rate, 0.0, stats.samples)
+            stats.samples += 1
+            stats.updated_at = time.time()
+            self._dirty = True
+        self._maybe_save()
+
+    def record_error(self, model: str):
+        """Record a failed request (server error, rate limit or timeout)"""
+        with self._lock:
+            stats = self._get(model)
+            stats.error_rate = _ewma(stats.error_rate, 1.0, stats.samples)
+            stats.samples += 1
+            stats.errors += 1
+            stats.updated_at = time.time()
+            self._dirty = True
+        self._maybe_save()
+
+    def choose(self, tier: str = "balanced", latency_slo: float = 5.0, output_tokens: int = 512,
+               candidates: Optional[Iterable[str]] = None) -> str:
+        """Pick the fastest healthy model of the tier predicted to finish within latency_slo
+
+        Falls back to the fastest healthy model of the tier, then to the
+        fastest model of the tier regardless of errors.
+        """
+        minimum = QUALITY_TIERS.get(tier, QUALITY_TIERS["balanced"])
+        pool = [model for model in (candidates or MODEL_QUALITY) if MODEL_QUALITY.get(model, 0) >= minimum]
+        if not pool:
+            pool = [max(candidates or MODEL_QUALITY, key=lambda model: MODEL_QUALITY.get(model, 0))]
+
+        with self._lock:
+            scored = sorted((self._get(model).predict(output_tokens), model) for model in pool)
+            healthy = [(predicted, model) for predicted, model in scored
+                       if self._stats[model].error_rate <= MAX_ERROR_RATE]
+            undersampled = [model for _, model in healthy if self._stats[model].samples < MIN_SAMPLES]
+
+        if undersampled and random.random() < EXPLORE_RATE:
+            return random.choice(undersampled)
+        for predicted, model in healthy:
+            if predicted <= latency_slo:
+                return model
+        return (healthy or scored)[0][1]
+
+    def resolve(self, model: str, max_tokens: int = 512, model_tier: str = "balanced", latency_slo: float = 5.0,
+                candidates: Optional[Iterable[str]] = None, **kwargs) -> str:
+        """Return model unchanged, or the router's choice when it is "auto" """
+        if model != AUTO_MODEL:
+            return model
+        chosen = self.choose(model_tier, latency_slo, min(max_tokens or 512, 1024), candidates)
+        print(f"Model router: auto -> {chosen} (tier {model_tier}, SLO {latency_slo:g}s)")
+        return chosen
+
+    def _maybe_save(self):
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Persist stats atomically so the next start routes warm"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {model: asdict(stats) for model, stats in self._stats.items() if stats.samples}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Could not save model stats to {self.path}: {str(e)}")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {model: asdict(stats) for model, stats in self._stats.items()}
+
+# Process-wide router fed by every request through groq_client.chat_completion
+MODEL_ROUTER = ModelRouter()
+atexit.register(MODEL_ROUTER.save)
+
+def get_model_router() -> ModelRouter:
+    """Get the process-wide model router"""
+    return MODEL_ROUTER
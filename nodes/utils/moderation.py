@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .base_node import CACHE_DIR
+from .deadlines import Deadline, POLL_INTERVAL, check_interrupted
+from .groq_client import chat_completion
+from .jsonl import read_jsonl
+from .tracing import propagate, span
+
+GUARD_MODEL = "llama-guard-3-8b"
+
+# Llama Guard 3 hazard taxonomy (MLCommons)
+HAZARD_CATEGORIES = {
+    "S1": "Violent Crimes",
+    "S2": "Non-Violent Crimes",
+    "S3": "Sex-Related Crimes",
+    "S4": "Child Sexual Exploitation",
+    "S5": "Defamation",
+    "S6": "Specialized Advice",
+    "S7": "Privacy",
+    "S8": "Intellectual Property",
+    "S9": "Indiscriminate Weapons",
+    "S10": "Hate",
+    "S11": "Suicide & Self-Harm",
+    "S12": "Sexual Content",
+    "S13": "Elections",
+    "S14": "Code Interpreter Abuse",
+}
+
+SAFETY_SCREEN_MODES = ["off", "block", "block_fail_open"]
+
+# Optional input shared by every node that sends user text to a generator
+MODERATION_INPUTS = {
+    "safety_screen": (SAFETY_SCREEN_MODES, {
+        "default": "off",
+        "tooltip": f"Screen the input with {GUARD_MODEL} while the main request runs. A flagged input cancels the main request "
+                   "and fails the node. block also fails when the screen itself cannot run; block_fail_open lets the result through then. "
+                   "Verdicts are cached per input."
+    }),
+}
+
+# Guard requests run here so they overlap the main generation on the node's thread
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="groq-guard")
+
+class SafetyScreenError(Exception):
+    """The input could not be released: flagged, or not screened with the screen required"""
+
+class ContentFlagged(SafetyScreenError):
+    def __init__(self, categories: List[str]):
+        self.categories = categories
+        names = ", ".join(f"{code} {HAZARD_CATEGORIES.get(code, 'Unknown')}" for code in categories) or "unspecified category"
+        super().__init__(f"Input flagged by safety screen ({names})")
+
+def parse_verdict(content: str) -> Tuple[bool, List[str]]:
+    """Parse Llama Guard's reply ("safe", or "unsafe" and a line of category codes)"""
+    lines = [line.strip() for line in (content or "").strip().splitlines() if line.strip()]
+    if not lines or lines[0].lower() not in ("safe", "unsafe"):
+        raise ValueError(f"Unexpected safety screen reply: {(content or '')[:80]!r}")
+    if lines[0].lower() == "safe":
+        return True, []
+    categories = [code.strip().upper() for line in lines[1:] for code in line.split(",") if code.strip()]
+    return False, categories
+
+class VerdictCache:
+    """Persistent input hash -> verdict cache; input text itself is never stored"""
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = os.path.join(cache_dir or CACHE_DIR, "moderation")
+        self.path = os.path.join(self.cache_dir, "verdicts.jsonl")
+        self._lock = threading.Lock()
+        self._verdicts: Optional[Dict[str, Tuple[bool, List[str]]]] = None
+
+    @staticmethod
+    def input_hash(text: str, model: str = GUARD_MODEL) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self._verdicts is not None:
+            return
+        verdicts = {}
+        for entry in read_jsonl(self.path):
+            if isinstance(entry, dict) and {"hash", "safe", "categories"} <= entry.keys():
+                verdicts[entry["hash"]] = (entry["safe"], entry["categories"])
+        self._verdicts = verdicts
+
+    def get(self, key: str) -> Optional[Tuple[bool, List[str]]]:
+        with self._lock:
+            self._load()
+            return self._verdicts.get(key)
+
+    def put(self, key: str, safe: bool, categories: List[str]):
+        with self._lock:
+            self._load()
+            if key in self._verdicts:
+                return
+            self._verdicts[key] = (safe, categories)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"hash": key, "safe": safe, "categories": categories}) + "\n")
+
+_verdict_cache = None
+_verdict_cache_lock = threading.Lock()
+
+def get_verdict_cache() -> VerdictCache:
+    global _verdict_cache
+    with _verdict_cache_lock:
+        if _verdict_cache is None:
+            _verdict_cache = VerdictCache()
+        return _verdict_cache
+
+def screen_text(api_key: str, text: str, deadline: Optional[Deadline] = None) -> Tuple[bool, List[str]]:
+    """Screen text with the guard model, returning (safe, categories); verdicts are cached"""
+    cache = get_verdict_cache()
+    key = cache.input_hash(text)
+    verdict = cache.get(key)
+    if verdict is not None:
+        return verdict
+    with span("moderation.screen", model=GUARD_MODEL) as screen_span:
+        response = chat_completion(api_key, deadline=deadline, model=GUARD_MODEL, temperature=0, max_tokens=32,
+                                   messages=[{"role": "user", "content": text}])
+        safe, categories = parse_verdict(response.choices[0].message.content if response.choices else "")
+        screen_span.set_attributes(safe=safe, categories=",".join(categories))
+    cache.put(key, safe, categories)
+    return safe, categories
+
+def _screen_and_cancel(api_key: str, text: str, deadline: Deadline, safety_screen: str):
+    """Guard thread: cancel the main request as soon as the verdict requires it"""
+    try:
+        safe, categories = screen_text(api_key, text, deadline)
+    except Exception as e:
+        if deadline.cancelled is not None:
+            raise
+        if safety_screen == "block":
+            deadline.cancel(SafetyScreenError(f"Safety screen unavailable: {str(e)}"))
+            raise deadline.cancelled
+        print(f"Safety screen unavailable, letting the result through: {str(e)}")
+        return True, []
+    if not safe:
+        deadline.cancel(ContentFlagged(categories))
+        raise deadline.cancelled
+    return safe, categories
+
+T = TypeVar("T")
+
+def screened(api_key: str, text: str, deadline: Deadline, generate: Callable[[], T], safety_screen: str = "off") -> T:
+    """Run generate() while text is screened concurrently
+
+    The guard request overlaps the main generation, so a clean input costs
+    no extra latency unless the guard is slower than the generation. A
+    flagged input cancels the node's deadline, which makes the main request
+    stop waiting at its next poll. The result is only returned once the
+    input is known to be clean; otherwise SafetyScreenError is raised.
+    generate must make its requests with the same deadline.
+    """
+    if safety_screen == "off" or not text.strip():
+        return generate()
+
+    cache = get_verdict_cache()
+    cached = cache.get(cache.input_hash(text))
+    if cached is not None:
+        if not cached[0]:
+            raise ContentFlagged(cached[1])
+        return generate()
+
+    future = _executor.submit(propagate(_screen_and_cancel), api_key, text, deadline, safety_screen)
+    try:
+        result = generate()
+    except Exception:
+        # A cancelled main request surfaces as the guard's verdict below
+        if deadline.cancelled is None:
+            raise
+        result = None
+
+    while True:
+        try:
+            future.result(timeout=POLL_INTERVAL)
+            return result
+        except FutureTimeoutError:
+            check_interrupted()
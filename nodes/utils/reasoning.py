@@ -0,0 +1,198 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .shared_state import CHARS_PER_TOKEN
+
+# What each reasoning model accepts. "format": reasoning_format hidden/parsed/raw
+# (reasoning inline in <think> tags when raw); models without it take
+# include_reasoning and never put reasoning in the content. "efforts":
+# accepted reasoning_effort values, the API's own way to limit reasoning.
+REASONING_MODELS = {
+    "deepseek-r1-distill-llama-70b": {"format": True, "efforts": ()},
+    "qwen-qwq-32b": {"format": True, "efforts": ()},
+    "openai/gpt-oss-120b": {"format": False, "efforts": ("low", "medium", "high")},
+    "openai/gpt-oss-20b": {"format": False, "efforts": ("low", "medium", "high")},
+}
+
+REASONING_MODES = ["hidden", "parsed", "raw"]
+REASONING_EFFORTS = ["default", "low", "medium", "high"]
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+def is_reasoning_model(model: str) -> bool:
+    return model in REASONING_MODELS
+
+def reasoning_params(model: str, mode: str = "hidden", effort: str = "default") -> Dict[str, Any]:
+    """Request parameters selecting how a model returns its reasoning; empty for other models"""
+    support = REASONING_MODELS.get(model)
+    if support is None:
+        return {}
+    params = {}
+    if support["format"]:
+        params["reasoning_format"] = mode
+    else:
+        params["include_reasoning"] = mode != "hidden"
+    if effort in support["efforts"]:
+        params["reasoning_effort"] = effort
+    return params
+
+def apply_reasoning_defaults(request_params: Dict[str, Any]):
+    """Keep reasoning out of the answer unless the caller chose a reasoning format"""
+    if "reasoning_format" in request_params or "include_reasoning" in request_params:
+        return
+    request_params.update(reasoning_params(request_params.get("model", "")))
+
+class ReasoningFilter:
+    """Split streamed text into answer and <think> reasoning as it arrives
+
+    Tags may be cut across chunks, so a possible tag prefix at the end of a
+    chunk is held back until the next one decides it. Output that turns out
+    to have started inside a think block (a lone </think>) is moved from the
+    answer to the reasoning, so read .answer once the stream has ended.
+    """
+
+    def __init__(self):
+        self.in_reasoning = False
+        self.answer_parts: List[str] = []
+        self.reasoning_parts: List[str] = []
+        self.reasoning_chars = 0
+        self._pending = ""
+        self._seen_open = False
+
+    def feed(self, text: str) -> str:
+        """Consume a chunk and return the answer text it makes visible"""
+        text = self._pending + text
+        self._pending = ""
+        visible = []
+        while text:
+            tag = THINK_CLOSE if self.in_reasoning else THINK_OPEN
+            index = text.find(tag)
+            if not self.in_reasoning and index < 0 and not self._seen_open and THINK_CLOSE in text:
+                # Some templates open the think block in the prompt, so the output starts inside it
+                self._reclassify_answer_as_reasoning(visible)
+                tag, index = THINK_CLOSE, text.find(THINK_CLOSE)
+                self._emit(text[:index], visible, reasoning=True)
+                text = text[index + len(tag):]
+                self._seen_open = True
+                continue
+            if index >= 0:
+                self._emit(text[:index], visible, self.in_reasoning)
+                text = text[index + len(tag):]
+                self._seen_open = True
+                self.in_reasoning = not self.in_reasoning
+                continue
+            keep = _partial_tag_length(text, tag)
+            if not self.in_reasoning and not self._seen_open:
+                keep = max(keep, _partial_tag_length(text, THINK_CLOSE))
+            self._emit(text[:len(text) - keep], visible, self.in_reasoning)
+            self._pending = text[len(text) - keep:]
+            break
+        return "".join(visible)
+
+    def flush(self) -> str:
+        """End of stream: release any held-back text"""
+        text, self._pending = self._pending, ""
+        visible = []
+        self._emit(text, visible, self.in_reasoning)
+        return "".join(visible)
+
+    def add_reasoning(self, text: str):
+        """Reasoning delivered in its own field (parsed format) rather than inline"""
+        self.reasoning_parts.append(text)
+        self.reasoning_chars += len(text)
+
+    def _emit(self, text: str, visible: List[str], reasoning: bool):
+        if not text:
+            return
+        if reasoning:
+            self.add_reasoning(text)
+        else:
+            visible.append(text)
+            self.answer_parts.append(text)
+
+    def _reclassify_answer_as_reasoning(self, visible: List[str]):
+        for text in self.answer_parts:
+            self.add_reasoning(text)
+        self.answer_parts.clear()
+        visible.clear()
+
+    @property
+    def answer(self) -> str:
+        return "".join(self.answer_parts).strip()
+
+    @property
+    def reasoning(self) -> str:
+        return "".join(self.reasoning_parts).strip()
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+def split_reasoning(text: str) -> Tuple[str, str]:
+    """Split complete text into (answer, reasoning), removing <think> spans"""
+    if THINK_OPEN not in text and THINK_CLOSE not in text:
+        return text, ""
+    reasoning_filter = ReasoningFilter()
+    reasoning_filter.feed(text)
+    reasoning_filter.flush()
+    return reasoning_filter.answer, reasoning_filter.reasoning
+
+def estimate_text_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+@dataclass
+class ReasoningResult:
+    answer: str
+    reasoning: str = ""
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+def reasoning_usage(usage, answer: str, reasoning: str = "", model: str = "", mode: str = "",
+                    effort: str = "default", budget_forced: bool = False) -> Dict[str, Any]:
+    """Reasoning vs answer token accounting for one completion
+
+    Uses the API's completion_tokens_details.reasoning_tokens when it reports
+    them. Otherwise the answer is estimated from its length and the rest of
+    completion_tokens is reasoning, which also covers hidden reasoning.
+    """
+    completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+    details = getattr(usage, "completion_tokens_details", None) if usage is not None else None
+    reasoning_tokens = getattr(details, "reasoning_tokens", None) if details is not None else None
+    estimated = reasoning_tokens is None and bool(reasoning or is_reasoning_model(model)) and not budget_forced
+    if completion_tokens is None:
+        answer_tokens = estimate_text_tokens(answer)
+        reasoning_tokens = estimate_text_tokens(reasoning)
+        completion_tokens = answer_tokens + reasoning_tokens
+    elif reasoning_tokens is None:
+        answer_tokens = min(estimate_text_tokens(answer), completion_tokens)
+        # A budget-forced answer continues after the prefilled reasoning, so it is all answer
+        reasoning_tokens = completion_tokens - answer_tokens if (reasoning or is_reasoning_model(model)) and not budget_forced else 0
+        answer_tokens = completion_tokens - reasoning_tokens
+    else:
+        answer_tokens = max(completion_tokens - reasoning_tokens, 0)
+    return {
+        "model": model,
+        "reasoning_format": mode,
+        "reasoning_effort": effort,
+        "completion_tokens": completion_tokens,
+        "reasoning_tokens": reasoning_tokens,
+        "answer_tokens": answer_tokens,
+        "reasoning_share": round(reasoning_tokens / completion_tokens, 3) if completion_tokens else 0.0,
+        "estimated": estimated,
+        "budget_forced": budget_forced,
+    }
+
+def merge_usage(first: Optional[Dict[str, Any]], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Accounting of two requests that produced one answer (budget forcing)"""
+    if not first:
+        return second
+    merged = dict(second)
+    for name in ("completion_tokens", "reasoning_tokens", "answer_tokens"):
+        merged[name] = first[name] + second[name]
+    merged["reasoning_share"] = round(merged["reasoning_tokens"] / merged["completion_tokens"], 3) if merged["completion_tokens"] else 0.0
+    merged["estimated"] = first["estimated"] or second["estimated"]
+    return merged
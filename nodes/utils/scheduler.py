@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .deadlines import Deadline, POLL_INTERVAL, check_interrupted
+from .tracing import span
+
+# Lanes from most to least urgent. Weights are shares of dispatch while
+# lanes compete: with both lanes backlogged, interactive gets 16 slots for
+# every batch slot, and a lone interactive request goes ahead of the whole
+# batch backlog.
+PRIORITY_LANES = ["interactive", "normal", "batch"]
+LANE_WEIGHTS = {"interactive": 16.0, "normal": 4.0, "batch": 1.0}
+DEFAULT_LANE = "normal"
+
+# Requests in flight at once (the request executor has this many workers)
+MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "32"))
+
+# Waits kept per lane for the percentile metrics
+WAIT_SAMPLES = 256
+
+SCHEDULER_INPUTS = {
+    "priority": (PRIORITY_LANES, {
+        "default": "interactive",
+        "tooltip": "Scheduling lane for this node's API calls. When many requests are queued (e.g. a batch job is running), "
+                   "interactive requests are dispatched first, batch requests last; no lane is starved."
+    }),
+}
+
+def parse_model_limits(value: str) -> Dict[str, int]:
+    """Parse GROQ_MODEL_CONCURRENCY ("llama-3.3-70b-versatile=4,qwen-qwq-32b=2") into per-model limits"""
+    limits = {}
+    for item in (value or "").split(","):
+        model, _, limit = item.strip().rpartition("=")
+        try:
+            limits[model.strip()] = max(1, int(limit))
+        except ValueError:
+            if item.strip():
+                print(f"Ignoring invalid GROQ_MODEL_CONCURRENCY entry: {item.strip()!r}")
+    return limits
+
+class _Ticket:
+    __slots__ = ("lane", "flow", "model", "finish", "enqueued_at", "waited", "granted")
+
+    def __init__(self, lane: str, flow: Tuple[str, str], model: str, finish: float):
+        self.lane = lane
+        self.flow = flow
+        self.model = model
+        self.finish = finish
+        self.enqueued_at = time.monotonic()
+        self.waited = 0.0
+        self.granted = threading.Event()
+
+class _LaneStats:
+    def __init__(self):
+        self.running = 0
+        self.dispatched = 0
+        self.cancelled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+class RequestScheduler:
+    """Weighted fair queue in front of the request executor
+
+    Every request belongs to a flow of (lane, caller): the API key, or the
+    node run for requests served by the key pool. A request's virtual
+    finish tag is max(virtual time, its flow's last tag) + 1 / lane weight,
+    and the queued request with the smallest tag whose model is below its
+    concurrency limit is dispatched whenever a slot frees up (self-clocked
+    fair queuing). A long batch backlog therefore only delays an
+    interactive request until the next slot frees up, and callers sharing
+    a lane take turns instead of going first come, first served.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, model_limits: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.model_limits = dict(model_limits or {})
+        self._lock = threading.Lock()
+        self._queue: List[_Ticket] = []
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Tuple[str, str], float] = {}
+        self._running = 0
+        self._running_by_model: Dict[str, int] = defaultdict(int)
+        self._lanes = {lane: _LaneStats() for lane in PRIORITY_LANES}
+
+    def set_model_limit(self, model: str, limit: Optional[int]):
+        """Cap concurrent requests to a model (None removes the cap)"""
+        with self._lock:
+            if limit is None:
+                self.model_limits.pop(model, None)
+            else:
+                self.model_limits[model] = max(1, int(limit))
+            self._dispatch()
+
+    def acquire(self, lane: str, caller: str, model: str, deadline: Deadline) -> _Ticket:
+        """Wait for a request slot, honoring Cancel and the deadline; release() the ticket when the request ends"""
+        lane = lane if lane in LANE_WEIGHTS else DEFAULT_LANE
+        with self._lock:
+            flow = (lane, caller)
+            finish = max(self._virtual_time, self._last_finish.get(flow, 0.0)) + 1.0 / LANE_WEIGHTS[lane]
+            self._last_finish[flow] = finish
+            ticket = _Ticket(lane, flow, model, finish)
+            self._queue.append(ticket)
+            self._dispatch()
+        if ticket.granted.is_set():
+            return ticket
+
+        with span("groq.schedule_wait", lane=lane, model=model) as wait_span:
+            while not ticket.granted.wait(POLL_INTERVAL):
+                try:
+                    check_interrupted()
+                    deadline.check()
+                except BaseException:
+                    self._withdraw(ticket)
+                    raise
+            wait_span.set_attribute("wait", round(ticket.waited, 4))
+        return ticket
+
+    def release(self, ticket: _Ticket):
+        """Free a granted ticket's slot and dispatch the next request"""
+        with self._lock:
+            self._running -= 1
+            self._running_by_model[ticket.model] -= 1
+            self._lanes[ticket.lane].running -= 1
+            self._dispatch()
+
+    def _withdraw(self, ticket: _Ticket):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._lanes[ticket.lane].cancelled += 1
+                return
+        # Granted while the caller gave up: hand the slot on
+        self.release(ticket)
+
+    def _dispatch(self):
+        """Grant slots to the queued requests with the smallest finish tags (lock held)"""
+        while self._queue and self._running < self.max_concurrency:
+            eligible = [ticket for ticket in self._queue
+                        if self._running_by_model[ticket.model] < self.model_limits.get(ticket.model, self.max_concurrency)]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda t: t.finish)
+            self._queue.remove(ticket)
+            self._running += 1
+            self._running_by_model[ticket.model] += 1
+            self._virtual_time = max(self._virtual_time, ticket.finish)
+            ticket.waited = time.monotonic() - ticket.enqueued_at
+            stats = self._lanes[ticket.lane]
+            stats.running += 1
+            stats.dispatched += 1
+            stats.wait_total += ticket.waited
+            stats.wait_max = max(stats.wait_max, ticket.waited)
+            stats.waits.append(ticket.waited)
+            ticket.granted.set()
+        # A flow whose last tag is behind virtual time starts from virtual time anyway
+        self._last_finish = {flow: finish for flow, finish in self._last_finish.items() if finish > self._virtual_time}
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-lane queue depth, running requests and dispatch wait times (seconds), and running requests per model"""
+        now = time.monotonic()
+        with self._lock:
+            lanes = {}
+            for lane, stats in self._lanes.items():
+                queued = [ticket for ticket in self._queue if ticket.lane == lane]
+                waits = sorted(stats.waits)
+                lanes[lane] = {
+                    "queue_depth": len(queued),
+                    "running": stats.running,
+                    "dispatched": stats.dispatched,
+                    "cancelled": stats.cancelled,
+                    "oldest_wait": round(max((now - ticket.enqueued_at for ticket in queued), default=0.0), 3),
+                    "wait_avg": round(stats.wait_total / stats.dispatched, 4) if stats.dispatched else 0.0,
+                    "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else 0.0,
+                    "wait_max": round(stats.wait_max, 4),
+                }
+            models = {model: running for model, running in self._running_by_model.items() if running}
+            return {"lanes": lanes, "models": models}
+
+# Process-wide scheduler in front of groq_client's request executor
+SCHEDULER = RequestScheduler(MAX_CONCURRENCY, parse_model_limits(os.getenv("GROQ_MODEL_CONCURRENCY", "")))
+
+def get_scheduler() -> RequestScheduler:
+    """Get the process-wide request scheduler"""
+    return SCHEDULER
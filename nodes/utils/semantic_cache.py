@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .base_node import CACHE_DIR
+from .jsonl import read_jsonl
+from .text_vectors import VECTOR_DIM, embed_text
+
+INITIAL_CAPACITY = 1024
+
+class SemanticCache:
+    """Near-duplicate prompt cache over a memory-mapped matrix of text vectors
+
+    Rows of <name>.f32 hold embeddings; <name>.jsonl holds one entry per row
+    (namespace, input text, cached result). Entries are only compared within
+    the same namespace, i.e. the same node settings.
+    """
+
+    def __init__(self, name: str, cache_dir: str = None):
+        self.name = name
+        self.cache_dir = os.path.join(cache_dir or CACHE_DIR, "semantic")
+        self.vectors_path = os.path.join(self.cache_dir, f"{name}.f32")
+        self.entries_path = os.path.join(self.cache_dir, f"{name}.jsonl")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._vectors = None
+        self._namespaces = np.zeros(0, dtype=np.int64)
+        self._entries = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def namespace_for(**settings) -> str:
+        """Stable namespace id for the settings that must match for a result to be reused"""
+        payload = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:15]
+
+    def _load(self):
+        if self._loaded:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Line n pairs with vector row n, so nothing after a bad line can be trusted
+        entries = read_jsonl(self.entries_path, stop_at_bad_line=True)
+
+        capacity = INITIAL_CAPACITY
+        if os.path.exists(self.vectors_path):
+            capacity = max(capacity, os.path.getsize(self.vectors_path) // (VECTOR_DIM * 4))
+        # Only rows that have a matching entry are valid
+        self._entries = entries[:capacity]
+        self._open_vectors(capacity)
+        self._namespaces = np.array([self._namespace_id(entry["namespace"]) for entry in self._entries], dtype=np.int64)
+        self._loaded = True
+
+    def _open_vectors(self, capacity: int):
+        size = capacity * VECTOR_DIM * 4
+        with open(self.vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, VECTOR_DIM))
+
+    @staticmethod
+    def _namespace_id(namespace: str) -> int:
+        return int(namespace, 16)
+
+    def lookup(self, namespace: str, text: str, threshold: float) -> Optional[Tuple[Any, float, str]]:
+        """Return (result, similarity, cached_text) for the nearest entry above threshold"""
+        vector = embed_text(text)
+        with self._lock:
+            self._load()
+            count = len(self._entries)
+            if count == 0:
+                self.misses += 1
+                return None
+            similarities = self._vectors[:count] @ vector
+            similarities[self._namespaces[:count] != self._namespace_id(namespace)] = -1.0
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self._entries[best]
+        return entry["result"], similarity, entry["text"]
+
+    def add(self, namespace: str, text: str, result: Any):
+        """Store a result for text under namespace"""
+        vector = embed_text(text)
+        entry = {"namespace": namespace, "text": text, "result": result}
+        with self._lock:
+            self._load()
+            row = len(self._entries)
+            if row >= self._vectors.shape[0]:
+                self._vectors.flush()
+                self._open_vectors(self._vectors.shape[0] * 2)
+            # Vector first, then the entry that makes the row valid
+            self._vectors[row] = vector
+            self._vectors.flush()
+            with open(self.entries_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._entries.append(entry)
+            self._namespaces = np.append(self._namespaces, self._namespace_id(namespace))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+_caches: Dict[str, SemanticCache] = {}
+_caches_lock = threading.Lock()
+
+def get_semantic_cache(name: str) -> SemanticCache:
+    """Get the process-wide semantic cache for a node"""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = SemanticCache(name)
+        return _caches[name]
+
+def log_cache_hit(node_name: str, similarity: float, text: str, cached_text: str):
+    """Log hit quality so thresholds can be tuned per node"""
+    print(f"{node_name}: semantic cache hit (similarity {similarity:.3f}) '{text[:60]}' ~ '{cached_text[:60]}'")
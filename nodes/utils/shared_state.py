@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .base_node import CACHE_DIR
+from .key_pool import parse_duration
+
+# GROQ_SHARED_STATE: unset/0 = off, 1 = cache/shared_state.sqlite3, anything else = database path.
+# Every ComfyUI process on the host pointing at the same file shares one response
+# cache and one token bucket per API key.
+DEFAULT_STATE_PATH = os.path.join(CACHE_DIR, "shared_state.sqlite3")
+RESPONSE_TTL = float(os.getenv("GROQ_SHARED_CACHE_TTL", "86400"))
+
+# Refill window assumed when a response carries no reset header
+DEFAULT_WINDOW = 60.0
+# Rough prompt size estimate used for the token debit before the real usage is known
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 1500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    hash TEXT PRIMARY KEY,
+    model TEXT,
+    body TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    capacity REAL NOT NULL,
+    level REAL NOT NULL,
+    refill_rate REAL NOT NULL,
+    updated REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+def _key_id(api_key: str) -> str:
+    # Raw keys never reach the database
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+def request_cache_key(request_params: Dict[str, Any]) -> Optional[str]:
+    """Hash of a deterministic request, or None if its response must not be shared
+
+    Only non-streamed requests with temperature 0 or a fixed seed are cached.
+    """
+    if request_params.get("stream") or request_params.get("n", 1) != 1:
+        return None
+    if request_params.get("temperature") != 0 and request_params.get("seed") is None:
+        return None
+    params = {name: value for name, value in request_params.items() if name != "timeout"}
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def estimate_tokens(request_params: Dict[str, Any]) -> int:
+    """Upper-bound token cost of a request for the pre-debit (prompt estimate + max_tokens)"""
+    prompt = 0
+    for message in request_params.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else ""
+        if isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    prompt += len(part.get("text", "")) // CHARS_PER_TOKEN
+                else:
+                    prompt += IMAGE_TOKENS
+        elif content:
+            prompt += len(str(content)) // CHARS_PER_TOKEN
+    return prompt + int(request_params.get("max_tokens") or 1024)
+
+class SharedState:
+    """SQLite (WAL) backed response cache and per-key token buckets shared across processes
+
+    Every debit runs in a BEGIN IMMEDIATE transaction, so concurrent
+    processes see each other's reservations and the quota is never
+    spent twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        with self._transaction() as db:
+            db.execute("DELETE FROM responses WHERE created < ?", (time.time() - RESPONSE_TTL,))
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        # Take the write lock up front so read-modify-write is atomic across processes
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    # Response cache
+
+    def get_response(self, cache_key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT body FROM responses WHERE hash = ? AND created >= ?",
+            (cache_key, time.time() - RESPONSE_TTL)).fetchone()
+        return row[0] if row else None
+
+    def put_response(self, cache_key: str, model: str, body: str):
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO responses (hash, model, body, created) VALUES (?, ?, ?, ?)",
+                       (cache_key, model, body, time.time()))
+
+    # Token buckets, one for requests and one for tokens per key
+
+    @staticmethod
+    def _refill(row, now: float):
+        capacity, level, refill_rate, updated, blocked_until = row
+        return min(capacity, level + max(0.0, now - updated) * refill_rate), blocked_until
+
+    def debit(self, api_key: str, tokens: int) -> float:
+        """Reserve one request and tokens for a key
+
+        Returns 0 when the reservation was made, otherwise the seconds to wait
+        before trying again (nothing is reserved). Keys whose limits have not
+        been seen yet are not limited.
+        """
+        key_id = _key_id(api_key)
+        costs = {f"{key_id}:requests": 1.0, f"{key_id}:tokens": float(tokens)}
+        now = time.time()
+        with self._transaction() as db:
+            levels = {}
+            wait = 0.0
+            for name, cost in costs.items():
+                row = db.execute("SELECT capacity, level, refill_rate, updated, blocked_until FROM buckets WHERE name = ?",
+                                 (name,)).fetchone()
+                if row is None:
+                    continue
+                level, blocked_until = self._refill(row, now)
+                capacity, refill_rate = row[0], row[2]
+                # A request larger than the whole bucket goes through once the bucket is full
+                needed = min(cost, capacity)
+                if blocked_until > now:
+                    wait = max(wait, blocked_until - now)
+                elif level < needed:
+                    wait = max(wait, (needed - level) / refill_rate if refill_rate > 0 else DEFAULT_WINDOW)
+                levels[name] = level - cost
+            if wait > 0:
+                return wait
+            for name, level in levels.items():
+                db.execute("UPDATE buckets SET level = ?, updated = ? WHERE name = ?", (level, now, name))
+        return 0.0
+
+    def settle(self, api_key: str, reserved_tokens: int, used_tokens: int):
+        """Credit back the difference between the reserved and actually used tokens"""
+        with self._transaction() as db:
+            db.execute("UPDATE buckets SET level = MIN(capacity, level + ?) WHERE name = ?",
+                       (float(reserved_tokens - used_tokens), f"{_key_id(api_key)}:tokens"))
+
+    def sync(self, api_key: str, headers, status_code: int = 200):
+        """Align the key's buckets with the quota the API reported"""
+        key_id = _key_id(api_key)
+        now = time.time()
+        with self._transaction() as db:
+            for kind in ("requests", "tokens"):
+                limit = _header_float(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+                if limit is None or remaining is None:
+                    continue
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or DEFAULT_WINDOW
+                refill_rate = max(limit - remaining, 1.0) / reset if remaining < limit else limit / DEFAULT_WINDOW
+                name = f"{key_id}:{kind}"
+                row = db.execute("SELECT capacity, level, refill_rate, updated, blocked_until FROM buckets WHERE name = ?",
+                                 (name,)).fetchone()
+                # The API's count is authoritative, but reservations other workers hold are not in it yet
+                level = min(self._refill(row, now)[0], remaining) if row else remaining
+                db.execute("INSERT OR REPLACE INTO buckets (name, capacity, level, refill_rate, updated, blocked_until) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+                           (name, limit, level, refill_rate, now, row[4] if row else 0.0))
+            if status_code == 429:
+                retry_after = parse_duration(headers.get("retry-after")) or DEFAULT_WINDOW
+                db.execute("UPDATE buckets SET blocked_until = ? WHERE name LIKE ?", (now + retry_after, f"{key_id}:%"))
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._connection()
+        return {
+            "responses": db.execute("SELECT COUNT(*) FROM responses").fetchone()[0],
+            "buckets": {name: {"capacity": capacity, "level": round(level, 1)}
+                        for name, capacity, level in db.execute("SELECT name, capacity, level FROM buckets")},
+        }
+
+def _header_float(headers, name) -> Optional[float]:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+_shared_state = None
+_shared_state_lock = threading.Lock()
+
+def get_shared_state() -> Optional[SharedState]:
+    """Get the host-wide shared state, or None if GROQ_SHARED_STATE is not set"""
+    global _shared_state
+    setting = os.getenv("GROQ_SHARED_STATE", "").strip()
+    if setting.lower() in ("", "0", "false", "off"):
+        return None
+    with _shared_state_lock:
+        if _shared_state is None:
+            path = DEFAULT_STATE_PATH if setting.lower() in ("1", "true", "on") else setting
+            _shared_state = SharedState(path)
+        return _shared_state
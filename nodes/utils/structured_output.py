@@ -0,0 +1,120 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from .deadlines import raise_if_interrupted
+from .groq_client import chat_completion
+from .reasoning import split_reasoning
+
+# Models that accept response_format json_schema (strict structured outputs).
+# Every other model falls back to json_object mode with the schema in the prompt.
+JSON_SCHEMA_MODELS = {
+    "openai/gpt-oss-120b",
+    "openai/gpt-oss-20b",
+    "moonshotai/kimi-k2-instruct-0905",
+    "meta-llama/llama-4-scout-17b-16e-instruct",
+    "meta-llama/llama-4-maverick-17b-128e-instruct",
+}
+
+JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+def string_schema(properties: Dict[str, str]) -> Dict[str, Any]:
+    """Build an object schema whose properties are all required, non-empty strings"""
+    return {
+        "type": "object",
+        "properties": {name: {"type": "string", "minLength": 1, "description": description}
+                       for name, description in properties.items()},
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+def validate_schema(data, schema, path="$") -> List[str]:
+    """Validate data against the JSON Schema subset used by the nodes, returning error messages"""
+    errors = []
+    expected = schema.get("type")
+    if expected:
+        if not isinstance(data, JSON_TYPES[expected]) or (expected in ("integer", "number") and isinstance(data, bool)):
+            return [f"{path}: expected {expected}"]
+
+    if isinstance(data, dict):
+        for name in schema.get("required", []):
+            if name not in data:
+                errors.append(f"{path}.{name}: missing")
+        for name, value in data.items():
+            if name in schema.get("properties", {}):
+                errors.extend(validate_schema(value, schema["properties"][name], f"{path}.{name}"))
+    elif isinstance(data, list):
+        if len(data) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "items" in schema:
+            for index, item in enumerate(data):
+                errors.extend(validate_schema(item, schema["items"], f"{path}[{index}]"))
+    elif isinstance(data, str):
+        if len(data.strip()) < schema.get("minLength", 0):
+            errors.append(f"{path}: empty string")
+    return errors
+
+def parse_json_output(content: str) -> Optional[Any]:
+    """Parse a model's JSON reply, tolerating code fences and surrounding text"""
+    if not content:
+        return None
+    # Reasoning models asked for raw reasoning put a <think> block before the JSON
+    content = split_reasoning(content)[0].strip()
+    fenced = re.search(r'```(?:json)?\s*\n(.*?)\n```', content, re.DOTALL)
+    if fenced:
+        content = fenced.group(1)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        match = re.search(r'\{.*\}', content, re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group(0))
+            except json.JSONDecodeError:
+                return None
+    return None
+
+def schema_instructions(schema: Dict[str, Any]) -> str:
+    """Describe a schema in the prompt (json_object mode requires the word JSON)"""
+    return ("Respond ONLY with a JSON object matching this JSON schema, no other text:\n"
+            + json.dumps(schema, indent=None))
+
+def structured_completion(api_key, schema_name, schema, **request_params) -> Optional[Dict[str, Any]]:
+    """Run one completion that must return JSON matching schema
+
+    Returns the validated object, or None if the call or validation failed so
+    the caller can fall back to its unstructured path.
+    """
+    model = request_params.get("model")
+    if model in JSON_SCHEMA_MODELS:
+        request_params["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": schema_name, "schema": schema},
+        }
+    else:
+        request_params["response_format"] = {"type": "json_object"}
+
+    try:
+        response = chat_completion(api_key, **request_params)
+    except Exception as e:
+        raise_if_interrupted(e)
+        print(f"Structured {schema_name} request failed, falling back: {str(e)}")
+        return None
+
+    content = ""
+    if hasattr(response, 'choices') and len(response.choices) > 0:
+        content = response.choices[0].message.content or ""
+
+    data = parse_json_output(content)
+    errors = validate_schema(data, schema) if data is not None else ["$: not valid JSON"]
+    if errors:
+        print(f"Structured {schema_name} output failed validation, falling back: {'; '.join(errors[:3])}")
+        return None
+    return data
@@ -0,0 +1,53 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+# Dimension of the hashed n-gram space. Collisions are rare enough at this size
+# for prompt-length texts and a row costs 2 KB in a float32 index.
+VECTOR_DIM = 512
+
+NGRAM_SIZES = (3, 4)
+
+# Function words carry no meaning for prompt similarity
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "with", "and", "or", "to", "for",
+    "by", "from", "is", "are", "very", "its", "it", "this", "that",
+}
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash(), so persisted vectors stay valid
+    return zlib.crc32(feature.encode("utf-8")) % VECTOR_DIM
+
+def embed_text(text: str) -> np.ndarray:
+    """Embed text as an L2-normalized hashed bag of words and character n-grams
+
+    Word order is ignored, so "beautiful woman, portrait" and "portrait of a
+    beautiful woman" land on nearly the same vector.
+    """
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for word in tokenize(text):
+        vector[_bucket("w:" + word)] += 4.0
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            for start in range(max(1, len(padded) - size + 1)):
+                vector[_bucket(padded[start:start + size])] += 1.0
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed several texts into an (N, VECTOR_DIM) float32 matrix"""
+    matrix = np.zeros((len(texts), VECTOR_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        matrix[row] = embed_text(text)
+    return matrix
@@ -0,0 +1,237 @@
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+# GROQ_TRACE: unset/0 = off, 1 = write traces to cache/traces, anything else = trace directory
+# GROQ_TRACE_FORMAT: chrome (chrome://tracing, Perfetto), otlp (OpenTelemetry JSON) or both
+TRACE_FORMATS = ("chrome", "otlp", "both")
+SERVICE_NAME = "ComfyUI_GroqPrompt"
+
+# Spans beyond this are dropped from a trace rather than growing it without bound
+MAX_SPANS_PER_TRACE = 10000
+
+def _initial_settings() -> Dict[str, Any]:
+    setting = os.getenv("GROQ_TRACE", "").strip()
+    enabled = setting.lower() not in ("", "0", "false", "off")
+    directory = "" if setting.lower() in ("", "0", "false", "off", "1", "true", "on") else setting
+    return {"enabled": enabled, "dir": directory, "format": os.getenv("GROQ_TRACE_FORMAT", "chrome").lower()}
+
+_settings = _initial_settings()
+_current_span = contextvars.ContextVar("groq_trace_span", default=None)
+
+class _Trace:
+    """Spans of one root span (one node run), exported together when the root ends"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.exported = False
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span"):
+        with self._lock:
+            # Late spans from abandoned requests arrive after export and are ignored
+            if self.exported:
+                return
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+class Span:
+    """A timed phase; use as a context manager"""
+
+    __slots__ = ("name", "attributes", "parent", "trace", "span_id", "start_ns", "end_ns",
+                 "thread_id", "thread_name", "error", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any], parent: Optional["Span"]):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.trace = parent.trace if parent is not None else _Trace()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_ns = self.end_ns = 0
+        self.error = None
+
+    def set_attribute(self, name: str, value: Any):
+        self.attributes[name] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        thread = threading.current_thread()
+        self.thread_id = threading.get_native_id()
+        self.thread_name = thread.name
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.add(self)
+        if self.parent is None:
+            _export(self.trace, self.name)
+        return False
+
+class _NoopSpan:
+    """Returned when tracing is off so instrumented code costs one flag check"""
+
+    def set_attribute(self, name: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+def tracing_enabled() -> bool:
+    return _settings["enabled"]
+
+def enable_tracing(directory: str = "", trace_format: str = "chrome"):
+    """Turn tracing on for this process (GROQ_TRACE does the same from the environment)"""
+    if trace_format not in TRACE_FORMATS:
+        raise ValueError(f"Trace format must be one of {', '.join(TRACE_FORMATS)}")
+    _settings.update(enabled=True, dir=directory, format=trace_format)
+
+def disable_tracing():
+    _settings["enabled"] = False
+
+def span(name: str, **attributes):
+    """Time a phase: with span("image.encode", format="PNG") as s: ...
+
+    A span opened with no active parent starts a new trace, which is written
+    to a file when that span ends.
+    """
+    if not _settings["enabled"]:
+        return NOOP_SPAN
+    return Span(name, attributes, _current_span.get())
+
+def current_span():
+    """The active span, or the no-op span when there is none"""
+    return _current_span.get() or NOOP_SPAN
+
+def traced(name: Optional[str] = None):
+    """Decorator running a node function inside a span named after it"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _settings["enabled"]:
+                return func(*args, **kwargs)
+            with Span(span_name, {}, _current_span.get()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def propagate(func):
+    """Bind func to the caller's active span so spans it opens on a worker thread nest under it"""
+    if not _settings["enabled"] or _current_span.get() is None:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+# Export
+
+def _chrome_trace(trace: _Trace) -> Dict[str, Any]:
+    pid = os.getpid()
+    events = []
+    threads = {}
+    for s in trace.spans:
+        threads[s.thread_id] = s.thread_name
+        events.append({
+            "name": s.name,
+            "cat": s.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": s.start_ns / 1000,
+            "dur": (s.end_ns - s.start_ns) / 1000,
+            "pid": pid,
+            "tid": s.thread_id,
+            "args": dict(s.attributes, span_id=s.span_id, parent_id=s.parent.span_id if s.parent else None,
+                         **({"error": s.error} if s.error else {})),
+        })
+    for thread_id, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"trace_id": trace.trace_id, "service": SERVICE_NAME, "dropped_spans": trace.dropped},
+    }
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_trace(trace: _Trace) -> Dict[str, Any]:
+    spans = []
+    for s in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)}
+                           for key, value in dict(s.attributes, **{"thread.name": s.thread_name}).items() if value is not None],
+            # 1 = OK, 2 = ERROR
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent is not None:
+            otlp_span["parentSpanId"] = s.parent.span_id
+        spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "groq_prompt.tracing"}, "spans": spans}],
+    }]}
+
+def _default_trace_dir() -> str:
+    # Imported here: base_node itself is instrumented with this module
+    from .base_node import CACHE_DIR
+    return os.path.join(CACHE_DIR, "traces")
+
+def _write_json(path: str, data: Dict[str, Any]):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), default=str)
+    os.replace(temp_path, path)
+
+def _export(trace: _Trace, root_name: str):
+    with trace._lock:
+        trace.exported = True
+    try:
+        directory = _settings["dir"] or _default_trace_dir()
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-"
+                                              f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', root_name)}-{trace.trace_id[:8]}")
+        written = []
+        if _settings["format"] in ("chrome", "both"):
+            _write_json(base + ".trace.json", _chrome_trace(trace))
+            written.append(base + ".trace.json")
+        if _settings["format"] in ("otlp", "both"):
+            _write_json(base + ".otlp.json", _otlp_trace(trace))
+            written.append(base + ".otlp.json")
+        print(f"GROQ trace: {len(trace.spans)} spans -> {', '.join(written)}")
+    except Exception as e:
+        print(f"Could not write GROQ trace for {root_name}: {str(e)}")
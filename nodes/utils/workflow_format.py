@@ -0,0 +1,186 @@
+import copy
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Offset for nodes the model adds, placed to the right of the existing graph
+NEW_NODE_SPACING = 320
+DEFAULT_NODE_SIZE = [315, 262]
+
+def is_ui_workflow(data) -> bool:
+    """True for a workflow saved from the ComfyUI canvas (nodes + links + layout)"""
+    return isinstance(data, dict) and isinstance(data.get("nodes"), list) and "links" in data
+
+def is_api_workflow(data) -> bool:
+    """True for an API-format graph: {node_id: {"class_type": ..., "inputs": {...}}}"""
+    return (isinstance(data, dict) and len(data) > 0
+            and all(isinstance(node, dict) and "class_type" in node for node in data.values()))
+
+def dumps_compact(data) -> str:
+    """Serialize JSON without whitespace"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def ui_to_compact(workflow: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Convert a UI-format workflow to an API-like graph without layout data
+
+    Links become ["source_id", output_slot] inputs as in the API format.
+    Widget values stay a positional list: naming them needs the node
+    definitions, and the list maps back onto the UI node unchanged.
+    """
+    links = {}
+    for link in workflow.get("links") or []:
+        if isinstance(link, list) and len(link) >= 3:
+            links[link[0]] = (str(link[1]), link[2])
+        elif isinstance(link, dict):
+            links[link.get("id")] = (str(link.get("origin_id")), link.get("origin_slot"))
+
+    graph = {}
+    for node in sorted(workflow["nodes"], key=lambda n: n.get("id", 0)):
+        compact = {"class_type": node.get("type")}
+        inputs = {}
+        for node_input in node.get("inputs") or []:
+            link = links.get(node_input.get("link"))
+            if link is not None:
+                inputs[node_input["name"]] = list(link)
+        if inputs:
+            compact["inputs"] = inputs
+        if node.get("widgets_values"):
+            compact["widgets_values"] = node["widgets_values"]
+        if node.get("title"):
+            compact["title"] = node["title"]
+        if node.get("mode"):
+            # 2 = muted, 4 = bypassed
+            compact["mode"] = node["mode"]
+        graph[str(node.get("id"))] = compact
+    return graph
+
+def minify_workflow(text: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Minify a pasted workflow for the prompt
+
+    Returns (compact_text, layout). layout is the original UI workflow, used
+    by restore_layout to rebuild a loadable workflow; it is None when the input
+    was already API format or not JSON (then compact_text is minified or unchanged).
+    """
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text, None
+    if is_ui_workflow(data):
+        return dumps_compact(ui_to_compact(data)), data
+    return dumps_compact(data), None
+
+def validate_graph(graph) -> List[str]:
+    """Check that an API-like graph is well formed and every link points at a node"""
+    if not isinstance(graph, dict) or not graph:
+        return ["workflow is not a non-empty object of nodes"]
+    errors = []
+    for node_id, node in graph.items():
+        if not isinstance(node, dict) or not isinstance(node.get("class_type"), str):
+            errors.append(f"node {node_id}: missing class_type")
+            continue
+        inputs = node.get("inputs", {})
+        if not isinstance(inputs, dict):
+            errors.append(f"node {node_id}: inputs is not an object")
+            continue
+        for name, value in inputs.items():
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int):
+                if str(value[0]) not in graph:
+                    errors.append(f"node {node_id}: input {name} links to missing node {value[0]}")
+    return errors
+
+def _output_type(node: Dict[str, Any], slot: int) -> str:
+    outputs = node.get("outputs") or []
+    if isinstance(slot, int) and 0 <= slot < len(outputs):
+        return outputs[slot].get("type", "*")
+    return "*"
+
+def compact_to_ui(graph: Dict[str, Dict[str, Any]], layout: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge an edited compact graph back into the original UI workflow's layout
+
+    Existing nodes keep their position, size, colors and properties. New
+    nodes are placed in a column to the right of the graph. Links are
+    rebuilt from the graph's inputs.
+    """
+    workflow = copy.deepcopy(layout)
+    original = {str(node.get("id")): node for node in workflow.get("nodes", [])}
+
+    right = max((node.get("pos", [0, 0])[0] + (node.get("size") or DEFAULT_NODE_SIZE)[0]
+                 for node in original.values()), default=0)
+    new_row = 0
+
+    nodes = {}
+    for node_id, compact in graph.items():
+        node = original.get(node_id)
+        if node is None or node.get("type") != compact.get("class_type"):
+            node = {
+                "id": int(node_id) if str(node_id).isdigit() else node_id,
+                "type": compact.get("class_type"),
+                "pos": [right + NEW_NODE_SPACING // 4, new_row * NEW_NODE_SPACING],
+                "size": list(DEFAULT_NODE_SIZE),
+                "flags": {},
+                "order": len(nodes),
+                "mode": 0,
+                "inputs": [],
+                "outputs": [],
+                "properties": {"Node name for S&R": compact.get("class_type")},
+            }
+            new_row += 1
+        node["widgets_values"] = compact.get("widgets_values", node.get("widgets_values", []))
+        node["mode"] = compact.get("mode", 0)
+        if compact.get("title"):
+            node["title"] = compact["title"]
+        else:
+            node.pop("title", None)
+        for output in node.get("outputs") or []:
+            output["links"] = []
+        nodes[node_id] = node
+
+    links = []
+    for node_id, compact in graph.items():
+        node = nodes[node_id]
+        wired = {}
+        for name, value in (compact.get("inputs") or {}).items():
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int) and str(value[0]) in nodes:
+                wired[name] = (str(value[0]), value[1])
+
+        existing = {node_input["name"] for node_input in node.get("inputs") or []}
+        for name in wired:
+            if name not in existing:
+                source_id, slot = wired[name]
+                node.setdefault("inputs", []).append({"name": name, "type": _output_type(nodes[source_id], slot), "link": None})
+
+        for node_input in node.get("inputs") or []:
+            if node_input["name"] not in wired:
+                node_input["link"] = None
+                continue
+            source_id, slot = wired[node_input["name"]]
+            source = nodes[source_id]
+            link_type = node_input.get("type") or _output_type(source, slot)
+            link_id = len(links) + 1
+            links.append([link_id, source["id"], slot, node["id"], node["inputs"].index(node_input), link_type])
+            node_input["link"] = link_id
+
+            outputs = source.setdefault("outputs", [])
+            while len(outputs) <= slot:
+                outputs.append({"name": link_type, "type": link_type, "links": [], "slot_index": len(outputs)})
+            outputs[slot].setdefault("links", []).append(link_id)
+
+    workflow["nodes"] = list(nodes.values())
+    workflow["links"] = links
+    workflow["last_node_id"] = max([n["id"] for n in nodes.values() if isinstance(n["id"], int)], default=0)
+    workflow["last_link_id"] = len(links)
+    return workflow
+
+def restore_layout(text: str, layout: Optional[Dict[str, Any]]) -> str:
+    """Turn the model's compact graph back into a loadable UI workflow
+
+    Falls back to the model's text unchanged if it is not a compact graph.
+    """
+    if layout is None:
+        return text
+    try:
+        graph = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text
+    if not is_api_workflow(graph):
+        return text
+    return json.dumps(compact_to_ui(graph, layout), indent=2)
@@ -0,0 +1,103 @@
+import copy
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "groq", "WorkflowTemplates.json")
+
+JSON_SCHEMA_TYPES = {"string": "string", "integer": "integer", "number": "number"}
+
+class WorkflowTemplate:
+    """One pre-parsed API-format workflow with named, bindable parameters"""
+
+    def __init__(self, name: str, description: str, workflow: Dict[str, Any], bindings: Dict[str, List[List[str]]], parameters: Dict[str, Dict[str, Any]]):
+        self.name = name
+        self.description = description
+        self.workflow = workflow
+        self.bindings = bindings
+        self.parameters = {param: parameters[param] for param in bindings}
+        for param, targets in bindings.items():
+            for node_id, input_name in targets:
+                if input_name not in workflow.get(node_id, {}).get("inputs", {}):
+                    raise ValueError(f"Template {name}: parameter {param} targets missing input {node_id}.{input_name}")
+
+    def schema(self) -> Dict[str, Any]:
+        """JSON schema of the parameters the model has to fill in"""
+        properties = {}
+        for param, spec in self.parameters.items():
+            prop = {"type": JSON_SCHEMA_TYPES[spec["type"]], "description": spec["description"]}
+            if "enum" in spec:
+                prop["enum"] = spec["enum"]
+            properties[param] = prop
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False,
+        }
+
+    def defaults(self, model_preference: str = "SDXL") -> Dict[str, Any]:
+        """Default parameter values, with the preferred model family's overrides"""
+        values = {param: spec["default"] for param, spec in self.parameters.items()}
+        overrides = MODEL_DEFAULTS.get(model_preference, MODEL_DEFAULTS.get("SDXL", {}))
+        values.update({param: value for param, value in overrides.items() if param in values})
+        return values
+
+    def coerce(self, param: str, value, default):
+        """Coerce one model-supplied value to the parameter's type, range and choices"""
+        spec = self.parameters[param]
+        try:
+            if spec["type"] == "integer":
+                value = int(round(float(value)))
+            elif spec["type"] == "number":
+                value = float(value)
+            else:
+                value = str(value).strip()
+                if not value:
+                    return default
+        except (TypeError, ValueError):
+            return default
+        if "enum" in spec and value not in spec["enum"]:
+            return default
+        if "min" in spec:
+            value = max(spec["min"], value)
+        if "max" in spec:
+            value = min(spec["max"], value)
+        if spec.get("multiple_of"):
+            value -= value % spec["multiple_of"]
+        return value
+
+    def apply(self, params: Optional[Dict[str, Any]] = None, model_preference: str = "SDXL") -> Dict[str, Any]:
+        """Build the workflow with params applied; missing or invalid values use defaults"""
+        values = self.defaults(model_preference)
+        for param, value in (params or {}).items():
+            if param in values:
+                values[param] = self.coerce(param, value, values[param])
+
+        workflow = copy.deepcopy(self.workflow)
+        for param, targets in self.bindings.items():
+            for node_id, input_name in targets:
+                workflow[node_id]["inputs"][input_name] = values[param]
+        return workflow
+
+def load_templates(path: str = TEMPLATES_PATH):
+    """Parse the bundled template library into (templates by workflow_type, model defaults)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    parameters = data["parameters"]
+    templates = {
+        name: WorkflowTemplate(name, spec["description"], spec["workflow"], spec["bindings"], parameters)
+        for name, spec in data["templates"].items()
+    }
+    return templates, data.get("model_defaults", {})
+
+# Parsed once at import so each node run only deep-copies a template
+try:
+    TEMPLATES, MODEL_DEFAULTS = load_templates()
+except Exception as e:
+    print(f"Error loading workflow templates: {str(e)}")
+    TEMPLATES, MODEL_DEFAULTS = {}, {}
+
+def get_template(workflow_type: str) -> Optional[WorkflowTemplate]:
+    """Get the bundled template for a workflow_type, if there is one"""
+    return TEMPLATES.get(workflow_type)
@@ -1,14 +1,14 @@
-import os
-import base64
 import json
-from io import BytesIO
 from typing import Dict, List, Optional, Tuple, Any
-from groq import Groq
-from PIL import Image
 import torch
 import numpy as np
 
 from .utils.base_node import GroqNode, get_model_choices, ModelType
+from .utils.deadlines import Deadline, TIMEOUT_INPUTS, raise_if_interrupted
+from .utils.groq_client import chat_completion, resolve_api_key
+from .utils.model_router import AUTO_MODEL, ROUTER_INPUTS, get_model_router
+from .utils.scheduler import SCHEDULER_INPUTS
+from .utils.tracing import traced
 
 class GroqArtPromptGenerator(GroqNode):
     """GROQ Art Prompt Generator - Analyze images and create detailed art prompts for Stable Diffusion"""
@@ -26,7 +26,7 @@ class GroqArtPromptGenerator(GroqNode):
         
         return {
             "required": {
-                "model": (vision_models, {
+                "model": ([AUTO_MODEL] + vision_models, {
                     "default": "meta-llama/llama-4-maverick-17b-128e-instruct",
                     "tooltip": "Select the Vision-Language Model (VLM) to use."
                 }),
@@ -86,12 +86,18 @@ class GroqArtPromptGenerator(GroqNode):
                     "default": False,
                     "tooltip": "Enable JSON mode for structured output.\n\nIMPORTANT: Requires you to use the word 'JSON' in the prompt."
                 }),
+            },
+            "optional": {
+                **TIMEOUT_INPUTS,
+                **SCHEDULER_INPUTS,
+                **ROUTER_INPUTS,
             }
         }
     
+    @traced()
     def process_completion_request(self, model, system_message, user_input, image, temperature, max_tokens, top_p, seed, max_retries, stop, json_mode, **kwargs):
-        # Get API key from environment variable (matching original mnemic behavior)
-        api_key = os.getenv('GROQ_API_KEY', '')
+        # Get API key from the key pool or environment variable (matching original mnemic behavior)
+        api_key = resolve_api_key()
         if not api_key:
             return ("No API key found. Please set GROQ_API_KEY environment variable.", False, "401")
         
@@ -102,16 +108,10 @@ class GroqArtPromptGenerator(GroqNode):
             np.random.seed(seed)
             torch.manual_seed(seed)
         
-        # Initialize GROQ client
-        client = Groq(api_key=api_key)
-        
         # Process the image
         if isinstance(image, torch.Tensor):
-            # Convert tensor to PIL Image
-            if image.dim() == 4:  # Batch - take first image
-                image = image[0]
-            image_np = 255.0 * image.cpu().numpy()
-            pil_image = Image.fromarray(np.clip(image_np, 0, 255).astype(np.uint8))
+            # Convert tensor to PIL Image (first image of the batch)
+            pil_image = self.tensor_to_pil(image)
         else:
             pil_image = image
         
@@ -120,11 +120,41 @@ class GroqArtPromptGenerator(GroqNode):
             pil_image = pil_image.convert('RGB')
         
         # Convert image to base64 for API
-        buffered = BytesIO()
-        pil_image.save(buffered, format="PNG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        img_base64 = self.encode_image(pil_image, "PNG")
+        
+        # Prepare request parameters
+        request_params = {
+            "model": get_model_router().resolve(model, max_tokens, candidates=get_model_choices(ModelType.VISION), **kwargs),
+            "messages": self.build_messages(system_message, user_input, f"data:image/png;base64,{img_base64}"),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p,
+        }
         
-        # Prepare messages for API call
+        # Add stop sequence if provided
+        if stop.strip():
+            request_params["stop"] = [stop.strip()]
+        
+        # Add JSON mode if enabled
+        if json_mode:
+            request_params["response_format"] = {"type": "json_object"}
+        
+        try:
+            response = self.request_with_retries(api_key, request_params, max_retries, Deadline.from_inputs(**kwargs))
+        except Exception as e:
+            raise_if_interrupted(e)
+            return (f"Error after {max_retries} attempts: {str(e)}", False, "500")
+        
+        # Extract the response content
+        if hasattr(response, 'choices') and len(response.choices) > 0:
+            content = response.choices[0].message.content
+            return (content, True, "200")
+        
+        return ("No response generated", False, "204")
+    
+    @staticmethod
+    def build_messages(system_message, user_input, image_url):
+        """Chat messages for one image: optional system message, then the user input with the image attached"""
         messages = []
         
         # Add system message if provided
@@ -132,53 +162,31 @@ class GroqArtPromptGenerator(GroqNode):
             messages.append({"role": "system", "content": system_message})
         
         # Add user input with image
-        user_message = {
+        messages.append({
             "role": "user",
             "content": [
                 {"type": "text", "text": user_input},
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{img_base64}"
+                        "url": image_url
                     }
                 }
             ]
-        }
-        messages.append(user_message)
-        
-        # Prepare request parameters
-        request_params = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "top_p": top_p,
-        }
-        
-        # Add stop sequence if provided
-        if stop.strip():
-            request_params["stop"] = [stop.strip()]
-        
-        # Add JSON mode if enabled
-        if json_mode:
-            request_params["response_format"] = {"type": "json_object"}
-        
-        # Make API call with retries
+        })
+        return messages
+    
+    @staticmethod
+    def request_with_retries(api_key, request_params, max_retries, deadline):
+        """Make the API call with retries, all sharing one deadline; the last error is raised"""
         for attempt in range(max_retries):
             try:
-                response = client.chat.completions.create(**request_params)
-                
-                # Extract the response content
-                if hasattr(response, 'choices') and len(response.choices) > 0:
-                    content = response.choices[0].message.content
-                    return (content, True, "200")
-                
-                return ("No response generated", False, "204")
-                
+                return chat_completion(api_key, deadline=deadline, **request_params)
             except Exception as e:
-                if attempt < max_retries - 1:
+                raise_if_interrupted(e)
+                if attempt < max_retries - 1 and not deadline.expired():
                     continue
-                return (f"Error after {max_retries} attempts: {str(e)}", False, "500")
+                raise
 
 # Node class mappings
 NODE_CLASS_MAPPINGS = {
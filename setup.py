@@ -28,7 +28,8 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=[
-        "groq>=0.4.1",
+        "groq>=0.31.0",
+        "httpx>=0.23.0,<1",
         "torch>=1.9.0",
         "numpy>=1.21.0",
         "Pillow>=8.0.0",
@@ -36,6 +37,6 @@ setup(
     ],
     include_package_data=True,
     package_data={
-        "": ["*.txt", "*.md", "*.json"],
+        "": ["*.txt", "*.md", "*.json", "*.txt.gz"],
     },
 )